@@ -4,12 +4,32 @@ MasterDB Database Module
 SQLite database management for the MasterDB ontology-based survey question system.
 """
 
-from .schema import create_all_tables, SCHEMA_VERSION
-from .connection import get_connection, close_connection
+from .schema import create_all_tables
+from .migrations import migrate, get_schema_version, SCHEMA_VERSION
+from .connection import (
+    get_connection, close_connection, get_pool, get_reader, ConnectionPool,
+    apply_profile, PRAGMA_PROFILES, get_snapshot_connection, prepare_snapshot,
+)
+from .stats import get_stats, StatsService
+from .query_audit import enable_query_audit, disable_query_audit, get_auditor
 
 __all__ = [
     'create_all_tables',
     'SCHEMA_VERSION',
+    'migrate',
+    'get_schema_version',
     'get_connection',
     'close_connection',
+    'get_pool',
+    'get_reader',
+    'ConnectionPool',
+    'apply_profile',
+    'PRAGMA_PROFILES',
+    'get_snapshot_connection',
+    'prepare_snapshot',
+    'get_stats',
+    'StatsService',
+    'enable_query_audit',
+    'disable_query_audit',
+    'get_auditor',
 ]
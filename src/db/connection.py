@@ -2,56 +2,372 @@
 MasterDB Database Connection Management
 
 Provides connection management for SQLite database.
+
+Three ways to get a connection:
+- get_connection(): a private connection owned by the caller (scripts, migrations)
+- get_pool(): a shared pool with one reader connection per thread and a
+  single writer connection that serializes all writes
+- get_snapshot_connection(): a read-only, memory-mapped connection for
+  analytics/report workers
+
+Both accept a PRAGMA profile (see PRAGMA_PROFILES) tuned for the workload.
+Statements on any of these connections can be audited (query plans, full
+scans, timings) with db.query_audit.
 """
 
 import sqlite3
 import os
+import threading
+import weakref
+from contextlib import contextmanager
 from pathlib import Path
+from urllib.parse import quote
+
+from . import query_audit
 
 # Default database path
 DEFAULT_DB_PATH = Path(__file__).parent.parent.parent / "db" / "masterdb.sqlite"
 
-# Global connection instance
-_connection = None
+# Connections handed out by get_connection (closed by close_connection)
+_connections = weakref.WeakSet()
+
+# Shared pools, keyed by resolved database path
+_pools = {}
+_pools_lock = threading.Lock()
+
+# PRAGMA profiles, applied in order when a connection is opened
+PRAGMA_PROFILES = {
+    # Plain read-write connection
+    "default": [
+        ("foreign_keys", "ON"),
+    ],
+    # Bulk loads (run_migration, upload_wcp_data): loads are re-runnable
+    # from the source files, so durability is traded for throughput
+    "bulk": [
+        ("foreign_keys", "ON"),
+        ("defer_foreign_keys", "ON"),    # FK checks at COMMIT
+        ("synchronous", "OFF"),
+        ("cache_size", -262144),          # 256 MB
+        ("temp_store", "MEMORY"),
+    ],
+    # Long-running read services (search, tagging readers). The database
+    # is switched to WAL once by migrate(), so readers don't block the writer.
+    "serve": [
+        ("busy_timeout", 5000),           # ms
+        ("foreign_keys", "ON"),
+        ("mmap_size", 268435456),         # 256 MB
+        ("query_only", "ON"),
+    ],
+    # Read-only snapshots (analytics/report workers, see get_snapshot_connection)
+    "snapshot": [
+        ("query_only", "ON"),
+        ("mmap_size", 1073741824),        # 1 GB: pages come from the OS page cache
+        ("cache_size", -16384),           # 16 MB: small private cache, mmap does the rest
+        ("temp_store", "MEMORY"),
+    ],
+}
+
+# PRAGMAs that SQLite resets at the end of every transaction
+_PER_TRANSACTION_PRAGMAS = {"defer_foreign_keys"}
+
+
+class MasterDBConnection(sqlite3.Connection):
+    """sqlite3 connection used by the db layer.
+
+    Pooled connections ignore close() so that callers which close the
+    connection they were given (e.g. the demo functions) do not break
+    the pool. The pool closes them for real in close_all().
+    """
+
+    pooled = False
+    profile = "default"
+
+    def commit(self):
+        super().commit()
+        self._reapply_per_transaction()
+
+    def rollback(self):
+        super().rollback()
+        self._reapply_per_transaction()
+
+    def _reapply_per_transaction(self):
+        for name, value in PRAGMA_PROFILES[self.profile]:
+            if name in _PER_TRANSACTION_PRAGMAS:
+                self.execute(f"PRAGMA {name} = {value}")
+
+    def cursor(self, factory=None):
+        if factory is None:
+            # AuditCursor records plans/timings while query auditing is on
+            factory = query_audit.AuditCursor if query_audit.get_auditor() else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if query_audit.get_auditor() is None:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if query_audit.get_auditor() is None:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pooled:
+            return
+        super().close()
+
+    def _close_pooled(self):
+        super().close()
+
+
+def apply_profile(conn, profile="default"):
+    """Apply a named PRAGMA profile to an open connection."""
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown PRAGMA profile: {profile}")
 
+    for name, value in PRAGMA_PROFILES[profile]:
+        conn.execute(f"PRAGMA {name} = {value}")
 
-def get_connection(db_path=None, create_if_missing=True):
+    if isinstance(conn, MasterDBConnection):
+        conn.profile = profile
+    return conn
+
+
+def _open(
+    db_path,
+    create_if_missing=True,
+    check_same_thread=True,
+    profile="default",
+    uri_params=None,
+):
+    """Open a configured connection to db_path.
+
+    uri_params (e.g. {"mode": "ro"}) opens the file through a SQLite URI.
+    """
+    if db_path is None:
+        db_path = DEFAULT_DB_PATH
+
+    db_path = Path(db_path)
+
+    # Create directory if needed
+    if create_if_missing and not uri_params:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if uri_params:
+        query = "&".join(f"{key}={value}" for key, value in uri_params.items())
+        database = f"file:{quote(db_path.resolve().as_posix())}?{query}"
+    else:
+        database = str(db_path)
+
+    conn = sqlite3.connect(
+        database,
+        factory=MasterDBConnection,
+        check_same_thread=check_same_thread,
+        uri=bool(uri_params),
+    )
+    apply_profile(conn, profile)
+    conn.row_factory = sqlite3.Row  # Enable column access by name
+    return conn
+
+
+def get_connection(db_path=None, create_if_missing=True, profile="default"):
     """
     Get a database connection.
 
+    Every call opens a new connection owned by the caller. Long-lived
+    search/tagging objects should use get_pool() instead.
+
     Args:
         db_path: Path to the database file. Uses default if not specified.
         create_if_missing: If True, creates the database if it doesn't exist.
+        profile: PRAGMA profile name ("default", "bulk", "serve")
 
     Returns:
         sqlite3.Connection object
     """
-    global _connection
+    conn = _open(db_path, create_if_missing, profile=profile)
+    _connections.add(conn)
+    return conn
 
-    if db_path is None:
-        db_path = DEFAULT_DB_PATH
 
-    db_path = Path(db_path)
+def get_snapshot_connection(db_path=None, immutable=False, mmap_size=None):
+    """
+    Get a read-only connection for analytics and report workers.
 
-    # Create directory if needed
-    if create_if_missing:
-        db_path.parent.mkdir(parents=True, exist_ok=True)
+    Opens the file with URI mode=ro and the "snapshot" profile, so pages are
+    memory-mapped and shared through the OS page cache by every process
+    reading the same file.
 
-    # Create connection with foreign key support
-    conn = sqlite3.connect(str(db_path))
-    conn.execute("PRAGMA foreign_keys = ON")
-    conn.row_factory = sqlite3.Row  # Enable column access by name
+    With immutable=True SQLite also skips file locking and journal/WAL
+    checks. Only use it while nothing writes to the database; call
+    prepare_snapshot() first so the WAL is folded into the main file.
 
-    _connection = conn
+    Args:
+        db_path: Path to the database file. Uses default if not specified.
+        immutable: Open with immutable=1 (no locking, no change detection).
+        mmap_size: Override the profile's mmap_size (bytes).
+
+    Returns:
+        sqlite3.Connection object
+    """
+    db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+    if not db_path.exists():
+        raise FileNotFoundError(f"Database not found: {db_path}")
+
+    uri_params = {"mode": "ro"}
+    if immutable:
+        uri_params["immutable"] = 1
+
+    conn = _open(db_path, create_if_missing=False, profile="snapshot", uri_params=uri_params)
+    if mmap_size is not None:
+        conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+
+    _connections.add(conn)
     return conn
 
 
+def prepare_snapshot(db_path=None):
+    """Checkpoint the WAL into the main file before immutable snapshot reads."""
+    conn = _open(db_path, create_if_missing=False)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+class ConnectionPool:
+    """
+    Connection pool for one database file.
+
+    - reader(): one connection per thread, reused across calls
+    - writer(): one connection shared by all threads; use write() to
+      hold the write lock for the duration of a transaction
+
+    Readers use the "serve" profile (mmap, query_only) by default.
+    """
+
+    def __init__(
+        self,
+        db_path=None,
+        create_if_missing=True,
+        reader_profile="serve",
+        writer_profile="default",
+    ):
+        self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        self.create_if_missing = create_if_missing
+        self.reader_profile = reader_profile
+        self.writer_profile = writer_profile
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = None
+        self._write_lock = threading.RLock()
+
+    def reader(self):
+        """Get the calling thread's read connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread is off only so close_all() can close
+            # readers of other threads; each reader serves one thread.
+            conn = _open(
+                self.db_path, self.create_if_missing,
+                check_same_thread=False, profile=self.reader_profile,
+            )
+            conn.pooled = True
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def writer(self):
+        """Get the shared write connection.
+
+        Callers must hold the write lock (see write()) while using it.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                conn = _open(
+                    self.db_path, self.create_if_missing,
+                    check_same_thread=False, profile=self.writer_profile,
+                )
+                conn.execute("PRAGMA busy_timeout = 5000")
+                conn.pooled = True
+                self._writer = conn
+            return self._writer
+
+    @contextmanager
+    def write(self):
+        """
+        Run a write transaction on the shared writer connection.
+
+        Commits on success, rolls back on error. Writes from all threads
+        are serialized by the pool's write lock.
+        """
+        with self._write_lock:
+            conn = self.writer()
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def close_all(self):
+        """Close every reader and the writer."""
+        with self._readers_lock:
+            for conn in self._readers:
+                conn._close_pooled()
+            self._readers = []
+        self._local = threading.local()
+
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer._close_pooled()
+                self._writer = None
+
+
+def get_pool(db_path=None, create_if_missing=None):
+    """
+    Get the shared connection pool for a database file.
+
+    Args:
+        db_path: Database path (default: DEFAULT_DB_PATH)
+        create_if_missing: Create the database if it doesn't exist (default
+            True). Only used when the pool is created; None accepts the
+            existing pool's setting.
+
+    Raises:
+        ValueError: If the pool exists with a different create_if_missing
+    """
+    key = str(Path(db_path or DEFAULT_DB_PATH).resolve())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path, True if create_if_missing is None else create_if_missing)
+            _pools[key] = pool
+        elif create_if_missing is not None and create_if_missing != pool.create_if_missing:
+            raise ValueError(
+                f"Pool for {key} already open with create_if_missing={pool.create_if_missing}"
+            )
+        return pool
+
+
+def get_reader(db_path=None):
+    """Get the calling thread's pooled read connection."""
+    return get_pool(db_path).reader()
+
+
 def close_connection():
-    """Close the global connection if open."""
-    global _connection
-    if _connection:
-        _connection.close()
-        _connection = None
+    """Close all connections opened by get_connection and all pools."""
+    for conn in list(_connections):
+        conn.close()
+    _connections.clear()
+
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
 
 
 def get_db_path():
@@ -94,12 +410,13 @@ def get_db_info(conn):
 class DatabaseContext:
     """Context manager for database connections."""
 
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, profile="default"):
         self.db_path = db_path
+        self.profile = profile
         self.conn = None
 
     def __enter__(self):
-        self.conn = get_connection(self.db_path)
+        self.conn = get_connection(self.db_path, profile=self.profile)
         return self.conn
 
     def __exit__(self, exc_type, exc_val, exc_tb):
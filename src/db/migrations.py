@@ -0,0 +1,1891 @@
+"""
+MasterDB Schema Migrations
+
+Numbered, incremental schema upgrades. Each step runs once, in order, in
+its own transaction, and is recorded in the schema_migrations table, so an
+existing database is upgraded in place instead of being wiped and reloaded.
+
+Adding a step:
+
+    @migration(3, "Describe the change")
+    def _step_3(cursor):
+        add_column(cursor, "questions", "new_col", "INTEGER")
+        execute_script(cursor, "CREATE INDEX IF NOT EXISTS ...")
+
+Steps must be safe on databases created before versioning existed
+(use IF NOT EXISTS / add_column). A step keeps the DDL it shipped with
+and is never edited once released; this module is the only definition
+of the schema (python src/db/schema.py prints the resulting one).
+"""
+
+import re
+import sqlite3
+
+from .schema import execute_script
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,           -- 단계 번호 (1, 2, 3...)
+    description TEXT NOT NULL,             -- 변경 내용
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# (version, description, function), kept sorted by version
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration step."""
+    def register(func):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} must be greater than {MIGRATIONS[-1][0]}")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+def table_exists(cursor, table):
+    """Check if a table exists."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    )
+    return cursor.fetchone() is not None
+
+
+def column_exists(cursor, table, column):
+    """Check if a column exists in a table."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def add_column(cursor, table, column, definition):
+    """Add a column if it doesn't exist yet."""
+    if not column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_indexes(cursor, sql):
+    """
+    Create the indexes in sql whose columns already exist.
+
+    Lets a step create the indexes of an index script whose remaining
+    columns are added by later steps.
+    """
+    for statement in sql.strip().split(";"):
+        match = re.search(r"ON\s+(\w+)\s*\(([^)]*)\)", statement)
+        if not match:
+            continue
+        table = match.group(1)
+        columns = [c.strip().split()[0] for c in match.group(2).split(",")]
+        if table_exists(cursor, table) and all(column_exists(cursor, table, c) for c in columns):
+            cursor.execute(statement)
+
+
+def rebuild_table(cursor, table, create_sql, select_sql):
+    """
+    Rebuild a table with a new definition (SQLite can't ALTER a primary key).
+
+    Args:
+        cursor: Database cursor (foreign keys must be off, see migrate())
+        table: Table name
+        create_sql: CREATE TABLE IF NOT EXISTS statement of the step
+        select_sql: SELECT producing the new table's rows, in column order
+
+    The table and the tables referencing it are checked for new foreign
+    key violations when the step ends (see migrate()).
+
+    Triggers on the table are dropped with it; the step must re-create
+    them (counter, stats, embedding and tag change triggers of steps 5, 6,
+    7, 8, 10 and 12, as they currently stand).
+    """
+    _track_rebuild(cursor, table)
+    new_table = f"{table}__new"
+    cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+    cursor.execute(create_sql.replace(
+        f"CREATE TABLE IF NOT EXISTS {table} ", f"CREATE TABLE {new_table} ", 1
+    ))
+    cursor.execute(f"INSERT INTO {new_table} {select_sql}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+
+
+# ============================================================
+# MIGRATION STEPS
+# ============================================================
+# Each step carries the DDL it shipped with, so a new database and an
+# upgraded one run the same statements. Never edit a released step,
+# change the schema in a new step.
+
+
+# Step 1: the 1.1 schema, as created before versioning existed
+_V1_TABLES = [
+    ("companies", """
+CREATE TABLE IF NOT EXISTS companies (
+    company_id TEXT PRIMARY KEY,           -- 회사 코드 (예: CJG, SKH)
+    company_name TEXT NOT NULL,            -- 정식 회사명
+    company_name_short TEXT,               -- 약칭
+
+    -- 그룹 정보
+    group_name TEXT,                       -- 소속 그룹 (예: CJ그룹, SK그룹)
+
+    -- 회사 분류
+    industry TEXT,                         -- 업종 (제조, IT, 금융, 서비스 등)
+    company_size TEXT,                     -- 규모 (대기업, 중견기업, 중소기업, 스타트업)
+    employee_count_range TEXT,             -- 직원 수 범위 (예: 1000-5000)
+
+    -- 관계 정보
+    is_active BOOLEAN DEFAULT TRUE,        -- 현재 거래 여부
+    first_project_year INTEGER,            -- 첫 프로젝트 연도
+    total_project_count INTEGER,           -- 총 프로젝트 수
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""),
+    ("surveys", """
+CREATE TABLE IF NOT EXISTS surveys (
+    survey_id TEXT PRIMARY KEY,            -- 프로젝트 코드 (예: IG200601, CJG-2024-OD)
+    survey_name TEXT NOT NULL,             -- 프로젝트 전체명
+
+    -- 연결
+    company_id TEXT REFERENCES companies(company_id),
+
+    -- 설문 유형
+    diagnosis_type TEXT NOT NULL,          -- OD, LD, MA, DD, ES 등
+    survey_purpose TEXT,                   -- 진단 목적 설명
+
+    -- 일정
+    survey_year INTEGER NOT NULL,          -- 실시 연도
+    survey_month INTEGER,                  -- 실시 월
+    survey_start_date DATE,                -- 시작일
+    survey_end_date DATE,                  -- 종료일
+
+    -- 규모
+    target_respondent_count INTEGER,       -- 목표 응답자 수
+    actual_respondent_count INTEGER,       -- 실제 응답자 수
+    question_count INTEGER,                -- 문항 수
+
+    -- 상태
+    status TEXT DEFAULT 'COMPLETED',       -- PLANNED, IN_PROGRESS, COMPLETED, ARCHIVED
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""),
+    ("org_units", """
+CREATE TABLE IF NOT EXISTS org_units (
+    org_unit_id TEXT PRIMARY KEY,          -- 조직 코드 (예: CJG_HQ_HR)
+    company_id TEXT REFERENCES companies(company_id),
+
+    -- 조직 계층
+    org_name TEXT NOT NULL,                -- 조직명 (예: 인사팀)
+    org_level INTEGER,                     -- 조직 레벨 (1=본부, 2=실, 3=팀, 4=파트)
+    org_type TEXT,                         -- 조직 유형 (본부, 사업부, 실, 팀, 파트)
+    parent_org_unit_id TEXT REFERENCES org_units(org_unit_id),
+
+    -- 조직 경로 (빠른 조회용)
+    org_path TEXT,                         -- 예: /본사/경영지원본부/인사실/인사팀
+
+    -- 상태
+    is_active BOOLEAN DEFAULT TRUE,
+    valid_from DATE,                       -- 유효 시작일
+    valid_to DATE,                         -- 유효 종료일
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""),
+    ("org_unit_surveys", """
+CREATE TABLE IF NOT EXISTS org_unit_surveys (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    survey_id TEXT REFERENCES surveys(survey_id),
+    org_unit_id TEXT REFERENCES org_units(org_unit_id),
+
+    -- 참여 정보
+    respondent_count INTEGER,              -- 응답자 수
+    response_rate REAL,                    -- 응답률 (0.0 ~ 1.0)
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(survey_id, org_unit_id)
+);
+"""),
+    ("questions", """
+CREATE TABLE IF NOT EXISTS questions (
+    question_id TEXT PRIMARY KEY,          -- 문항 ID (예: Q_00001)
+    question_text TEXT NOT NULL,           -- 문항 텍스트
+
+    -- 구조적 메타데이터
+    diagnosis_type TEXT NOT NULL,          -- OD, LD, MA, DD
+    source_survey_id TEXT REFERENCES surveys(survey_id),  -- 최초 등장 설문
+    source_year INTEGER,                   -- 최초 등장 연도
+    reuse_count INTEGER DEFAULT 1,         -- 재사용 횟수
+
+    -- 문항 유형
+    question_type TEXT DEFAULT 'LIKERT',   -- LIKERT, CHOICE_SINGLE, CHOICE_MULTI, ESSAY
+    scale_min INTEGER DEFAULT 1,           -- 최소 척도값
+    scale_max INTEGER DEFAULT 5,           -- 최대 척도값 (5점, 7점 등)
+    choices TEXT,                          -- JSON: 선택지 (객관식용)
+    is_reverse BOOLEAN DEFAULT FALSE,      -- 역문항 여부
+
+    -- 클러스터 정보
+    cluster_id INTEGER,                    -- 클러스터 번호 (대분류 내)
+    master_question_id TEXT,               -- 소속 대표 문항 ID
+    is_representative BOOLEAN DEFAULT FALSE, -- 대표 문항 여부
+
+    -- 레거시 분류 (참조용)
+    legacy_mid_category TEXT,              -- 기존 중분류
+    legacy_sub_category TEXT,              -- 기존 소분류
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""),
+    ("master_questions", """
+CREATE TABLE IF NOT EXISTS master_questions (
+    master_id TEXT PRIMARY KEY,            -- 대표 문항 ID (예: OD_0001)
+    question_id TEXT REFERENCES questions(question_id),
+    diagnosis_type TEXT NOT NULL,          -- OD, LD, MA, DD
+    cluster_size INTEGER,                  -- 클러스터 내 문항 수
+
+    -- 의미론적 태그 (JSON)
+    tags TEXT,                             -- {"concepts": [...], "aspects": [...]}
+
+    -- 품질 지표
+    centroid_distance REAL,                -- 중심점과의 거리 (낮을수록 대표성 높음)
+    coherence_score REAL,                  -- 클러스터 응집도
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""),
+    ("embeddings", """
+CREATE TABLE IF NOT EXISTS embeddings (
+    question_id TEXT PRIMARY KEY REFERENCES questions(question_id),
+    embedding BLOB NOT NULL,               -- 768차원 float32 벡터 (직렬화)
+    model_name TEXT DEFAULT 'jhgan/ko-sroberta-multitask',
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""),
+    ("survey_questions", """
+CREATE TABLE IF NOT EXISTS survey_questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    survey_id TEXT REFERENCES surveys(survey_id),
+    question_id TEXT REFERENCES questions(question_id),
+
+    -- 설문 내 위치
+    section_name TEXT,                     -- 섹션명 (예: 비전/전략, 조직문화)
+    question_order INTEGER,                -- 문항 순서 (1, 2, 3...)
+
+    -- 문항 설정
+    is_required BOOLEAN DEFAULT TRUE,      -- 필수 응답 여부
+    scale_type TEXT,                       -- LIKERT_5, LIKERT_7, OPEN, CHOICE 등
+    scale_labels TEXT,                     -- JSON: 척도 라벨
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(survey_id, question_id)
+);
+"""),
+    ("taxonomy", """
+CREATE TABLE IF NOT EXISTS taxonomy (
+    term_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term TEXT UNIQUE NOT NULL,             -- 용어 (예: "비전", "리더십", "이해도")
+    term_type TEXT NOT NULL,               -- THEME, CONCEPT, ASPECT, SUBJECT, METHOD
+
+    -- 다국어/동의어
+    aliases TEXT,                          -- JSON: {"ko": [...], "en": [...]}
+
+    -- 설명
+    description TEXT,                      -- 용어 설명
+    examples TEXT,                         -- JSON: 예시 문항 ID 목록
+
+    -- 통계
+    usage_count INTEGER DEFAULT 0,         -- 태깅된 문항 수
+    first_used_year INTEGER,               -- 최초 사용 연도
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_by TEXT
+);
+"""),
+    ("taxonomy_relations", """
+CREATE TABLE IF NOT EXISTS taxonomy_relations (
+    relation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    from_term_id INTEGER REFERENCES taxonomy(term_id),
+    to_term_id INTEGER REFERENCES taxonomy(term_id),
+
+    relation_type TEXT NOT NULL,           -- PARENT, CHILD, HAS_COMPONENT, RELATED, SIMILAR, SYNONYM, OPPOSITE
+    strength REAL DEFAULT 1.0,             -- 관계 강도 (0.0 ~ 1.0)
+
+    -- 맥락 정보
+    context TEXT,                          -- JSON: 특정 맥락에서만 유효한 관계
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(from_term_id, to_term_id, relation_type)
+);
+"""),
+    ("question_tags", """
+CREATE TABLE IF NOT EXISTS question_tags (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question_id TEXT REFERENCES questions(question_id),
+    term_id INTEGER REFERENCES taxonomy(term_id),
+
+    tag_type TEXT,                         -- concepts, aspects, subjects, themes
+    confidence REAL,                       -- 태깅 신뢰도 (0.0 ~ 1.0)
+    is_auto_tagged BOOLEAN DEFAULT FALSE,  -- 자동 태깅 여부
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(question_id, term_id, tag_type)
+);
+"""),
+    ("scales", """
+CREATE TABLE IF NOT EXISTS scales (
+    scale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scale_name TEXT UNIQUE NOT NULL,       -- 척도명 (예: "조직몰입도", "리더십효과성")
+    description TEXT,                      -- 척도 설명
+
+    -- 온톨로지 연결
+    root_term_id INTEGER REFERENCES taxonomy(term_id),  -- 척도의 루트 개념
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_by TEXT
+);
+"""),
+    ("scale_questions", """
+CREATE TABLE IF NOT EXISTS scale_questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scale_id INTEGER REFERENCES scales(scale_id),
+    master_question_id TEXT REFERENCES master_questions(master_id),
+
+    sub_scale TEXT,                        -- 하위 척도 (예: "정서적몰입")
+    weight REAL DEFAULT 1.0,               -- 가중치
+    is_reverse_scored BOOLEAN DEFAULT FALSE, -- 역문항 여부
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(scale_id, master_question_id)
+);
+"""),
+]
+_V1_INDEXES = """
+-- companies
+CREATE INDEX IF NOT EXISTS idx_companies_group ON companies(group_name);
+CREATE INDEX IF NOT EXISTS idx_companies_industry ON companies(industry);
+CREATE INDEX IF NOT EXISTS idx_companies_size ON companies(company_size);
+
+-- surveys
+CREATE INDEX IF NOT EXISTS idx_surveys_company ON surveys(company_id);
+CREATE INDEX IF NOT EXISTS idx_surveys_year ON surveys(survey_year);
+CREATE INDEX IF NOT EXISTS idx_surveys_type ON surveys(diagnosis_type);
+CREATE INDEX IF NOT EXISTS idx_surveys_status ON surveys(status);
+CREATE INDEX IF NOT EXISTS idx_surveys_company_year ON surveys(company_id, survey_year);
+
+-- org_units
+CREATE INDEX IF NOT EXISTS idx_org_units_company ON org_units(company_id);
+CREATE INDEX IF NOT EXISTS idx_org_units_parent ON org_units(parent_org_unit_id);
+CREATE INDEX IF NOT EXISTS idx_org_units_level ON org_units(org_level);
+
+-- org_unit_surveys
+CREATE INDEX IF NOT EXISTS idx_org_unit_surveys_survey ON org_unit_surveys(survey_id);
+CREATE INDEX IF NOT EXISTS idx_org_unit_surveys_org ON org_unit_surveys(org_unit_id);
+
+-- survey_questions
+CREATE INDEX IF NOT EXISTS idx_survey_questions_survey ON survey_questions(survey_id);
+CREATE INDEX IF NOT EXISTS idx_survey_questions_question ON survey_questions(question_id);
+CREATE INDEX IF NOT EXISTS idx_survey_questions_section ON survey_questions(section_name);
+
+-- questions
+CREATE INDEX IF NOT EXISTS idx_questions_diagnosis ON questions(diagnosis_type);
+CREATE INDEX IF NOT EXISTS idx_questions_cluster ON questions(cluster_id);
+CREATE INDEX IF NOT EXISTS idx_questions_master ON questions(master_question_id);
+CREATE INDEX IF NOT EXISTS idx_questions_source_survey ON questions(source_survey_id);
+CREATE INDEX IF NOT EXISTS idx_questions_representative ON questions(is_representative);
+
+-- master_questions
+CREATE INDEX IF NOT EXISTS idx_master_diagnosis ON master_questions(diagnosis_type);
+CREATE INDEX IF NOT EXISTS idx_master_cluster_size ON master_questions(cluster_size);
+
+-- taxonomy
+CREATE INDEX IF NOT EXISTS idx_taxonomy_type ON taxonomy(term_type);
+CREATE INDEX IF NOT EXISTS idx_taxonomy_term ON taxonomy(term);
+CREATE INDEX IF NOT EXISTS idx_taxonomy_usage ON taxonomy(usage_count DESC);
+
+-- taxonomy_relations
+CREATE INDEX IF NOT EXISTS idx_relations_from ON taxonomy_relations(from_term_id);
+CREATE INDEX IF NOT EXISTS idx_relations_to ON taxonomy_relations(to_term_id);
+CREATE INDEX IF NOT EXISTS idx_relations_type ON taxonomy_relations(relation_type);
+
+-- question_tags
+CREATE INDEX IF NOT EXISTS idx_tags_question ON question_tags(question_id);
+CREATE INDEX IF NOT EXISTS idx_tags_term ON question_tags(term_id);
+CREATE INDEX IF NOT EXISTS idx_tags_type ON question_tags(tag_type);
+CREATE INDEX IF NOT EXISTS idx_tags_confidence ON question_tags(confidence DESC);
+
+-- scales
+CREATE INDEX IF NOT EXISTS idx_scales_root ON scales(root_term_id);
+
+-- scale_questions
+CREATE INDEX IF NOT EXISTS idx_scale_questions_scale ON scale_questions(scale_id);
+CREATE INDEX IF NOT EXISTS idx_scale_questions_master ON scale_questions(master_question_id);
+CREATE INDEX IF NOT EXISTS idx_scale_questions_subscale ON scale_questions(sub_scale);
+"""
+
+
+@migration(1, "Base tables and indexes (schema 1.1)")
+def _base_schema(cursor):
+    for table_name, table_sql in _V1_TABLES:
+        cursor.execute(table_sql)
+        print(f"  Created table: {table_name}")
+
+    execute_script(cursor, _V1_INDEXES)
+    print("  Created all indexes")
+
+
+_V2_TABLES = [
+    ("respondents", """
+CREATE TABLE IF NOT EXISTS respondents (
+    respondent_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    survey_id TEXT NOT NULL,
+    original_id TEXT,                      -- 원본 ID
+
+    -- 인구통계
+    gender TEXT,                           -- 성별
+    age INTEGER,                           -- 나이
+    tenure INTEGER,                        -- 근속연수
+    experience INTEGER,                    -- 경력연수
+    rank TEXT,                             -- 직급
+    position TEXT,                         -- 직책
+    job_group TEXT,                        -- 직군
+    job_function TEXT,                     -- 직무
+
+    -- 조직 정보
+    org_level_1 TEXT,
+    org_level_2 TEXT,
+    org_level_3 TEXT,
+    org_level_4 TEXT,
+    org_level_5 TEXT,
+
+    -- MA 전용 (피평가자 정보)
+    target_info TEXT,                      -- 피평가자 정보
+    target_name TEXT,                      -- 피평가자 이름
+    target_org TEXT,                       -- 피평가자 조직
+    target_position TEXT,                  -- 피평가자 직책
+    evaluator_type TEXT,                   -- 평가 유형 (본인/상향/하향/동료)
+
+    -- 유효성
+    is_valid INTEGER DEFAULT 1,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (survey_id) REFERENCES surveys(survey_id)
+);
+"""),
+    ("responses", """
+CREATE TABLE IF NOT EXISTS responses (
+    response_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    respondent_id INTEGER NOT NULL,
+    question_no TEXT NOT NULL,             -- r001, r002, ...
+    response_value TEXT,                   -- 응답값 (문자열로 저장)
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (respondent_id) REFERENCES respondents(respondent_id)
+);
+"""),
+]
+_V2_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_respondents_survey ON respondents(survey_id);
+CREATE INDEX IF NOT EXISTS idx_responses_respondent ON responses(respondent_id);
+CREATE INDEX IF NOT EXISTS idx_responses_question ON responses(question_no);
+"""
+
+
+@migration(2, "Response tables: respondents, responses")
+def _response_tables(cursor):
+    for table_name, table_sql in _V2_TABLES:
+        cursor.execute(table_sql)
+        print(f"  Created table: {table_name}")
+
+    execute_script(cursor, _V2_INDEXES)
+
+
+_V3_SURVEYS_TABLE = """
+CREATE TABLE IF NOT EXISTS surveys (
+    survey_idx INTEGER PRIMARY KEY,        -- 정수 대리키 (rowid, JOIN용)
+    survey_id TEXT UNIQUE NOT NULL,        -- 프로젝트 코드 (예: IG200601, CJG-2024-OD)
+    survey_name TEXT NOT NULL,             -- 프로젝트 전체명
+
+    -- 연결
+    company_id TEXT REFERENCES companies(company_id),
+
+    -- 설문 유형
+    diagnosis_type TEXT NOT NULL,          -- OD, LD, MA, DD, ES 등
+    survey_purpose TEXT,                   -- 진단 목적 설명
+
+    -- 일정
+    survey_year INTEGER NOT NULL,          -- 실시 연도
+    survey_month INTEGER,                  -- 실시 월
+    survey_start_date DATE,                -- 시작일
+    survey_end_date DATE,                  -- 종료일
+
+    -- 규모
+    target_respondent_count INTEGER,       -- 목표 응답자 수
+    actual_respondent_count INTEGER,       -- 실제 응답자 수
+    question_count INTEGER,                -- 문항 수
+
+    -- 상태
+    status TEXT DEFAULT 'COMPLETED',       -- PLANNED, IN_PROGRESS, COMPLETED, ARCHIVED
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+_V3_QUESTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS questions (
+    question_idx INTEGER PRIMARY KEY,      -- 정수 대리키 (rowid, JOIN용)
+    question_id TEXT UNIQUE NOT NULL,      -- 문항 ID (예: Q_00001)
+    question_text TEXT NOT NULL,           -- 문항 텍스트
+
+    -- 구조적 메타데이터
+    diagnosis_type TEXT NOT NULL,          -- OD, LD, MA, DD
+    source_survey_id TEXT REFERENCES surveys(survey_id),  -- 최초 등장 설문
+    source_year INTEGER,                   -- 최초 등장 연도
+    reuse_count INTEGER DEFAULT 1,         -- 재사용 횟수
+
+    -- 문항 유형
+    question_type TEXT DEFAULT 'LIKERT',   -- LIKERT, CHOICE_SINGLE, CHOICE_MULTI, ESSAY
+    scale_min INTEGER DEFAULT 1,           -- 최소 척도값
+    scale_max INTEGER DEFAULT 5,           -- 최대 척도값 (5점, 7점 등)
+    choices TEXT,                          -- JSON: 선택지 (객관식용)
+    is_reverse BOOLEAN DEFAULT FALSE,      -- 역문항 여부
+
+    -- 클러스터 정보
+    cluster_id INTEGER,                    -- 클러스터 번호 (대분류 내)
+    master_question_id TEXT,               -- 소속 대표 문항 ID
+    is_representative BOOLEAN DEFAULT FALSE, -- 대표 문항 여부
+
+    -- 레거시 분류 (참조용)
+    legacy_mid_category TEXT,              -- 기존 중분류
+    legacy_sub_category TEXT,              -- 기존 소분류
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+_V3_MASTER_QUESTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS master_questions (
+    master_id TEXT PRIMARY KEY,            -- 대표 문항 ID (예: OD_0001)
+    question_idx INTEGER REFERENCES questions(question_idx),
+    diagnosis_type TEXT NOT NULL,          -- OD, LD, MA, DD
+    cluster_size INTEGER,                  -- 클러스터 내 문항 수
+
+    -- 의미론적 태그 (JSON)
+    tags TEXT,                             -- {"concepts": [...], "aspects": [...]}
+
+    -- 품질 지표
+    centroid_distance REAL,                -- 중심점과의 거리 (낮을수록 대표성 높음)
+    coherence_score REAL,                  -- 클러스터 응집도
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+_V3_EMBEDDINGS_TABLE = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    question_idx INTEGER PRIMARY KEY REFERENCES questions(question_idx),
+    embedding BLOB NOT NULL,               -- 768차원 float32 벡터 (직렬화)
+    model_name TEXT DEFAULT 'jhgan/ko-sroberta-multitask',
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+_V3_SURVEY_QUESTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS survey_questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    survey_idx INTEGER REFERENCES surveys(survey_idx),
+    question_idx INTEGER REFERENCES questions(question_idx),
+
+    -- 설문 내 위치
+    section_name TEXT,                     -- 섹션명 (예: 비전/전략, 조직문화)
+    question_order INTEGER,                -- 문항 순서 (1, 2, 3...)
+
+    -- 문항 설정
+    is_required BOOLEAN DEFAULT TRUE,      -- 필수 응답 여부
+    scale_type TEXT,                       -- LIKERT_5, LIKERT_7, OPEN, CHOICE 등
+    scale_labels TEXT,                     -- JSON: 척도 라벨
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(survey_idx, question_idx)
+);
+"""
+_V3_QUESTION_TAGS_TABLE = """
+CREATE TABLE IF NOT EXISTS question_tags (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question_idx INTEGER REFERENCES questions(question_idx),
+    term_id INTEGER REFERENCES taxonomy(term_id),
+
+    tag_type TEXT,                         -- concepts, aspects, subjects, themes
+    confidence REAL,                       -- 태깅 신뢰도 (0.0 ~ 1.0)
+    is_auto_tagged BOOLEAN DEFAULT FALSE,  -- 자동 태깅 여부
+
+    -- 메타
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(question_idx, term_id, tag_type)
+);
+"""
+_V3_INDEXES = """
+-- companies
+CREATE INDEX IF NOT EXISTS idx_companies_group ON companies(group_name);
+CREATE INDEX IF NOT EXISTS idx_companies_industry ON companies(industry);
+CREATE INDEX IF NOT EXISTS idx_companies_size ON companies(company_size);
+
+-- surveys
+CREATE INDEX IF NOT EXISTS idx_surveys_company ON surveys(company_id);
+CREATE INDEX IF NOT EXISTS idx_surveys_year ON surveys(survey_year);
+CREATE INDEX IF NOT EXISTS idx_surveys_type ON surveys(diagnosis_type);
+CREATE INDEX IF NOT EXISTS idx_surveys_status ON surveys(status);
+CREATE INDEX IF NOT EXISTS idx_surveys_company_year ON surveys(company_id, survey_year);
+
+-- org_units
+CREATE INDEX IF NOT EXISTS idx_org_units_company ON org_units(company_id);
+CREATE INDEX IF NOT EXISTS idx_org_units_parent ON org_units(parent_org_unit_id);
+CREATE INDEX IF NOT EXISTS idx_org_units_level ON org_units(org_level);
+
+-- org_unit_surveys
+CREATE INDEX IF NOT EXISTS idx_org_unit_surveys_survey ON org_unit_surveys(survey_id);
+CREATE INDEX IF NOT EXISTS idx_org_unit_surveys_org ON org_unit_surveys(org_unit_id);
+
+-- survey_questions
+CREATE INDEX IF NOT EXISTS idx_survey_questions_survey ON survey_questions(survey_idx);
+CREATE INDEX IF NOT EXISTS idx_survey_questions_question ON survey_questions(question_idx);
+CREATE INDEX IF NOT EXISTS idx_survey_questions_section ON survey_questions(section_name);
+
+-- questions
+CREATE INDEX IF NOT EXISTS idx_questions_diagnosis ON questions(diagnosis_type);
+CREATE INDEX IF NOT EXISTS idx_questions_cluster ON questions(cluster_id);
+CREATE INDEX IF NOT EXISTS idx_questions_master ON questions(master_question_id);
+CREATE INDEX IF NOT EXISTS idx_questions_source_survey ON questions(source_survey_id);
+CREATE INDEX IF NOT EXISTS idx_questions_representative ON questions(is_representative);
+
+-- master_questions
+CREATE INDEX IF NOT EXISTS idx_master_question ON master_questions(question_idx);
+CREATE INDEX IF NOT EXISTS idx_master_diagnosis ON master_questions(diagnosis_type);
+CREATE INDEX IF NOT EXISTS idx_master_cluster_size ON master_questions(cluster_size);
+
+-- taxonomy
+CREATE INDEX IF NOT EXISTS idx_taxonomy_type ON taxonomy(term_type);
+CREATE INDEX IF NOT EXISTS idx_taxonomy_term ON taxonomy(term);
+CREATE INDEX IF NOT EXISTS idx_taxonomy_usage ON taxonomy(usage_count DESC);
+
+-- taxonomy_relations
+CREATE INDEX IF NOT EXISTS idx_relations_from ON taxonomy_relations(from_term_id);
+CREATE INDEX IF NOT EXISTS idx_relations_to ON taxonomy_relations(to_term_id);
+CREATE INDEX IF NOT EXISTS idx_relations_type ON taxonomy_relations(relation_type);
+
+-- question_tags
+CREATE INDEX IF NOT EXISTS idx_tags_question ON question_tags(question_idx);
+CREATE INDEX IF NOT EXISTS idx_tags_term ON question_tags(term_id);
+CREATE INDEX IF NOT EXISTS idx_tags_type ON question_tags(tag_type);
+CREATE INDEX IF NOT EXISTS idx_tags_confidence ON question_tags(confidence DESC);
+
+-- scales
+CREATE INDEX IF NOT EXISTS idx_scales_root ON scales(root_term_id);
+
+-- scale_questions
+CREATE INDEX IF NOT EXISTS idx_scale_questions_scale ON scale_questions(scale_id);
+CREATE INDEX IF NOT EXISTS idx_scale_questions_master ON scale_questions(master_question_id);
+CREATE INDEX IF NOT EXISTS idx_scale_questions_subscale ON scale_questions(sub_scale);
+"""
+
+
+@migration(3, "Integer surrogate keys for questions/surveys and their join tables")
+def _surrogate_keys(cursor):
+    if not column_exists(cursor, "surveys", "survey_idx"):
+        rebuild_table(cursor, "surveys", _V3_SURVEYS_TABLE, """
+            SELECT rowid, survey_id, survey_name, company_id, diagnosis_type,
+                   survey_purpose, survey_year, survey_month, survey_start_date,
+                   survey_end_date, target_respondent_count, actual_respondent_count,
+                   question_count, status, created_at, updated_at
+            FROM surveys ORDER BY rowid
+        """)
+
+    if not column_exists(cursor, "questions", "question_idx"):
+        rebuild_table(cursor, "questions", _V3_QUESTIONS_TABLE, """
+            SELECT rowid, question_id, question_text, diagnosis_type,
+                   source_survey_id, source_year, reuse_count, question_type,
+                   scale_min, scale_max, choices, is_reverse, cluster_id,
+                   master_question_id, is_representative,
+                   legacy_mid_category, legacy_sub_category, created_at, updated_at
+            FROM questions ORDER BY rowid
+        """)
+
+    if not column_exists(cursor, "master_questions", "question_idx"):
+        rebuild_table(cursor, "master_questions", _V3_MASTER_QUESTIONS_TABLE, """
+            SELECT m.master_id, q.question_idx, m.diagnosis_type, m.cluster_size,
+                   m.tags, m.centroid_distance, m.coherence_score, m.created_at
+            FROM master_questions m
+            LEFT JOIN questions q ON q.question_id = m.question_id
+        """)
+
+    if not column_exists(cursor, "embeddings", "question_idx"):
+        rebuild_table(cursor, "embeddings", _V3_EMBEDDINGS_TABLE, """
+            SELECT q.question_idx, e.embedding, e.model_name, e.created_at
+            FROM embeddings e
+            JOIN questions q ON q.question_id = e.question_id
+        """)
+
+    if not column_exists(cursor, "survey_questions", "question_idx"):
+        rebuild_table(cursor, "survey_questions", _V3_SURVEY_QUESTIONS_TABLE, """
+            SELECT sq.id, s.survey_idx, q.question_idx, sq.section_name,
+                   sq.question_order, sq.is_required, sq.scale_type,
+                   sq.scale_labels, sq.created_at
+            FROM survey_questions sq
+            JOIN surveys s ON s.survey_id = sq.survey_id
+            JOIN questions q ON q.question_id = sq.question_id
+        """)
+
+    if not column_exists(cursor, "question_tags", "question_idx"):
+        rebuild_table(cursor, "question_tags", _V3_QUESTION_TAGS_TABLE, """
+            SELECT qt.id, q.question_idx, qt.term_id, qt.tag_type,
+                   qt.confidence, qt.is_auto_tagged, qt.created_at
+            FROM question_tags qt
+            JOIN questions q ON q.question_id = qt.question_id
+        """)
+
+    create_indexes(cursor, _V3_INDEXES)
+
+
+_V4_TABLES = [
+    ("respondents", """
+CREATE TABLE IF NOT EXISTS respondents (
+    respondent_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    survey_id TEXT NOT NULL,
+    original_id TEXT,                      -- 원본 ID
+
+    -- 인구통계
+    gender TEXT,                           -- 성별
+    age INTEGER,                           -- 나이
+    tenure INTEGER,                        -- 근속연수
+    experience INTEGER,                    -- 경력연수
+    rank TEXT,                             -- 직급
+    position TEXT,                         -- 직책
+    job_group TEXT,                        -- 직군
+    job_function TEXT,                     -- 직무
+
+    -- 조직 정보
+    org_level_1 TEXT,
+    org_level_2 TEXT,
+    org_level_3 TEXT,
+    org_level_4 TEXT,
+    org_level_5 TEXT,
+
+    -- MA 전용 (피평가자 정보)
+    target_info TEXT,                      -- 피평가자 정보
+    target_name TEXT,                      -- 피평가자 이름
+    target_org TEXT,                       -- 피평가자 조직
+    target_position TEXT,                  -- 피평가자 직책
+    evaluator_type TEXT,                   -- 평가 유형 (본인/상향/하향/동료)
+
+    -- 유효성
+    is_valid INTEGER DEFAULT 1,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (survey_id) REFERENCES surveys(survey_id)
+);
+"""),
+    ("response_items", """
+CREATE TABLE IF NOT EXISTS response_items (
+    item_idx INTEGER PRIMARY KEY,          -- 문항번호 정수 ID
+    question_no TEXT UNIQUE NOT NULL       -- r001, r002, ...
+);
+"""),
+    ("response_values", """
+CREATE TABLE IF NOT EXISTS response_values (
+    respondent_id INTEGER NOT NULL REFERENCES respondents(respondent_id),
+    item_idx INTEGER NOT NULL REFERENCES response_items(item_idx),
+    value INTEGER NOT NULL,                -- 척도 응답값 (1~7 등)
+
+    PRIMARY KEY (respondent_id, item_idx)
+) WITHOUT ROWID;
+"""),
+    ("response_texts", """
+CREATE TABLE IF NOT EXISTS response_texts (
+    respondent_id INTEGER NOT NULL REFERENCES respondents(respondent_id),
+    item_idx INTEGER NOT NULL REFERENCES response_items(item_idx),
+    response_text TEXT NOT NULL,           -- 주관식/비정수 응답
+
+    PRIMARY KEY (respondent_id, item_idx)
+) WITHOUT ROWID;
+"""),
+]
+_V4_RESPONSES_VIEW = """
+CREATE VIEW IF NOT EXISTS responses AS
+SELECT v.respondent_id, i.question_no,
+       CAST(v.value AS TEXT) AS response_value, v.value AS value
+FROM response_values v
+JOIN response_items i ON i.item_idx = v.item_idx
+UNION ALL
+SELECT t.respondent_id, i.question_no,
+       t.response_text AS response_value, NULL AS value
+FROM response_texts t
+JOIN response_items i ON i.item_idx = t.item_idx;
+"""
+
+
+@migration(4, "Compact typed response storage (response_values/response_texts)")
+def _compact_responses(cursor):
+    from .responses import ResponseWriter, legacy_response_value
+
+    for table_name, table_sql in _V4_TABLES:
+        cursor.execute(table_sql)
+
+    cursor.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'responses'"
+    )
+    row = cursor.fetchone()
+    if row and row[0] == "table":
+        # Convert the old one-row-per-answer table
+        writer = ResponseWriter(cursor.connection.cursor())
+        cursor.execute("""
+            SELECT respondent_id, question_no, response_value
+            FROM responses ORDER BY response_id
+        """)
+        converted = 0
+        for respondent_id, question_no, value in cursor:
+            if writer.add(respondent_id, question_no, legacy_response_value(value)):
+                converted += 1
+        writer.flush()
+        cursor.execute("DROP TABLE responses")
+        print(f"  Converted {converted} responses")
+
+    cursor.execute("DROP INDEX IF EXISTS idx_responses_respondent")
+    cursor.execute("DROP INDEX IF EXISTS idx_responses_question")
+    cursor.execute(_V4_RESPONSES_VIEW)
+
+
+_V5_COUNTER_TRIGGERS = """
+-- taxonomy.usage_count
+CREATE TRIGGER IF NOT EXISTS trg_question_tags_usage_insert
+AFTER INSERT ON question_tags
+BEGIN
+    UPDATE taxonomy SET usage_count = COALESCE(usage_count, 0) + 1
+    WHERE term_id = NEW.term_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_question_tags_usage_delete
+AFTER DELETE ON question_tags
+BEGIN
+    UPDATE taxonomy SET usage_count = MAX(COALESCE(usage_count, 0) - 1, 0)
+    WHERE term_id = OLD.term_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_question_tags_usage_update
+AFTER UPDATE OF term_id ON question_tags
+WHEN NEW.term_id IS NOT OLD.term_id
+BEGIN
+    UPDATE taxonomy SET usage_count = MAX(COALESCE(usage_count, 0) - 1, 0)
+    WHERE term_id = OLD.term_id;
+    UPDATE taxonomy SET usage_count = COALESCE(usage_count, 0) + 1
+    WHERE term_id = NEW.term_id;
+END;
+
+-- master_questions.cluster_size
+CREATE TRIGGER IF NOT EXISTS trg_questions_cluster_insert
+AFTER INSERT ON questions
+WHEN NEW.master_question_id IS NOT NULL
+BEGIN
+    UPDATE master_questions SET cluster_size = COALESCE(cluster_size, 0) + 1
+    WHERE master_id = NEW.master_question_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_questions_cluster_delete
+AFTER DELETE ON questions
+WHEN OLD.master_question_id IS NOT NULL
+BEGIN
+    UPDATE master_questions SET cluster_size = MAX(COALESCE(cluster_size, 0) - 1, 0)
+    WHERE master_id = OLD.master_question_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_questions_cluster_update
+AFTER UPDATE OF master_question_id ON questions
+WHEN NEW.master_question_id IS NOT OLD.master_question_id
+BEGIN
+    UPDATE master_questions SET cluster_size = MAX(COALESCE(cluster_size, 0) - 1, 0)
+    WHERE master_id = OLD.master_question_id;
+    UPDATE master_questions SET cluster_size = COALESCE(cluster_size, 0) + 1
+    WHERE master_id = NEW.master_question_id;
+END;
+
+-- 대표 문항이 나중에 등록되는 경우: 이미 연결된 문항 수로 시작 (idx_questions_master)
+CREATE TRIGGER IF NOT EXISTS trg_master_questions_cluster_insert
+AFTER INSERT ON master_questions
+BEGIN
+    UPDATE master_questions SET cluster_size = (
+        SELECT COUNT(*) FROM questions WHERE master_question_id = NEW.master_id
+    )
+    WHERE master_id = NEW.master_id;
+END;
+
+-- questions.reuse_count
+CREATE TRIGGER IF NOT EXISTS trg_survey_questions_reuse_insert
+AFTER INSERT ON survey_questions
+WHEN EXISTS (
+    SELECT 1 FROM survey_questions
+    WHERE question_idx = NEW.question_idx AND id != NEW.id
+)
+BEGIN
+    UPDATE questions SET reuse_count = COALESCE(reuse_count, 1) + 1
+    WHERE question_idx = NEW.question_idx;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_survey_questions_reuse_delete
+AFTER DELETE ON survey_questions
+WHEN EXISTS (
+    SELECT 1 FROM survey_questions WHERE question_idx = OLD.question_idx
+)
+BEGIN
+    UPDATE questions SET reuse_count = MAX(COALESCE(reuse_count, 1) - 1, 1)
+    WHERE question_idx = OLD.question_idx;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_survey_questions_reuse_update
+AFTER UPDATE OF question_idx ON survey_questions
+WHEN NEW.question_idx IS NOT OLD.question_idx
+BEGIN
+    UPDATE questions SET reuse_count = MAX(COALESCE(reuse_count, 1) - 1, 1)
+    WHERE question_idx = OLD.question_idx
+      AND EXISTS (SELECT 1 FROM survey_questions WHERE question_idx = OLD.question_idx);
+    UPDATE questions SET reuse_count = COALESCE(reuse_count, 1) + 1
+    WHERE question_idx = NEW.question_idx
+      AND EXISTS (
+          SELECT 1 FROM survey_questions
+          WHERE question_idx = NEW.question_idx AND id != NEW.id
+      );
+END;
+
+-- surveys.actual_respondent_count
+CREATE TRIGGER IF NOT EXISTS trg_respondents_count_insert
+AFTER INSERT ON respondents
+BEGIN
+    UPDATE surveys SET actual_respondent_count = COALESCE(actual_respondent_count, 0) + 1
+    WHERE survey_id = NEW.survey_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_respondents_count_delete
+AFTER DELETE ON respondents
+BEGIN
+    UPDATE surveys SET actual_respondent_count = MAX(COALESCE(actual_respondent_count, 0) - 1, 0)
+    WHERE survey_id = OLD.survey_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_respondents_count_update
+AFTER UPDATE OF survey_id ON respondents
+WHEN NEW.survey_id IS NOT OLD.survey_id
+BEGIN
+    UPDATE surveys SET actual_respondent_count = MAX(COALESCE(actual_respondent_count, 0) - 1, 0)
+    WHERE survey_id = OLD.survey_id;
+    UPDATE surveys SET actual_respondent_count = COALESCE(actual_respondent_count, 0) + 1
+    WHERE survey_id = NEW.survey_id;
+END;
+"""
+
+
+@migration(5, "Counter triggers (usage_count, cluster_size, reuse_count, respondent counts)")
+def _counter_triggers(cursor):
+    # Bring the counters in line once; the triggers keep them there
+    cursor.execute("""
+        UPDATE taxonomy SET usage_count = (
+            SELECT COUNT(*) FROM question_tags WHERE question_tags.term_id = taxonomy.term_id
+        )
+    """)
+    cursor.execute("""
+        UPDATE master_questions SET cluster_size = (
+            SELECT COUNT(*) FROM questions
+            WHERE questions.master_question_id = master_questions.master_id
+        )
+    """)
+    cursor.execute("""
+        UPDATE questions SET reuse_count = MAX(1, (
+            SELECT COUNT(*) FROM survey_questions
+            WHERE survey_questions.question_idx = questions.question_idx
+        ))
+    """)
+    # Surveys without respondent rows keep their recorded count
+    cursor.execute("""
+        UPDATE surveys SET actual_respondent_count = (
+            SELECT COUNT(*) FROM respondents WHERE respondents.survey_id = surveys.survey_id
+        )
+        WHERE survey_id IN (SELECT survey_id FROM respondents)
+    """)
+
+    execute_script(cursor, _V5_COUNTER_TRIGGERS)
+
+
+_V6_TABLE_STATS_TABLE = """
+CREATE TABLE IF NOT EXISTS table_stats (
+    table_name TEXT NOT NULL,              -- 대상 테이블
+    dimension TEXT NOT NULL DEFAULT '',    -- 집계 컬럼 ('' = 테이블 전체)
+    dim_value TEXT NOT NULL DEFAULT '',    -- 컬럼 값 (NULL은 '')
+    row_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, dimension, dim_value)
+) WITHOUT ROWID;
+"""
+_V6_STATS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_stats_companies_insert
+AFTER INSERT ON companies
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('companies', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_companies_delete
+AFTER DELETE ON companies
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('companies', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_surveys_insert
+AFTER INSERT ON surveys
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('surveys', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_surveys_delete
+AFTER DELETE ON surveys
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('surveys', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_org_units_insert
+AFTER INSERT ON org_units
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('org_units', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_org_units_delete
+AFTER DELETE ON org_units
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('org_units', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_org_unit_surveys_insert
+AFTER INSERT ON org_unit_surveys
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('org_unit_surveys', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_org_unit_surveys_delete
+AFTER DELETE ON org_unit_surveys
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('org_unit_surveys', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_questions_insert
+AFTER INSERT ON questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('questions', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_questions_delete
+AFTER DELETE ON questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('questions', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_master_questions_insert
+AFTER INSERT ON master_questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('master_questions', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_master_questions_delete
+AFTER DELETE ON master_questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('master_questions', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_embeddings_insert
+AFTER INSERT ON embeddings
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('embeddings', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_embeddings_delete
+AFTER DELETE ON embeddings
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('embeddings', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_survey_questions_insert
+AFTER INSERT ON survey_questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('survey_questions', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_survey_questions_delete
+AFTER DELETE ON survey_questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('survey_questions', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_taxonomy_insert
+AFTER INSERT ON taxonomy
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('taxonomy', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_taxonomy_delete
+AFTER DELETE ON taxonomy
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('taxonomy', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_taxonomy_relations_insert
+AFTER INSERT ON taxonomy_relations
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('taxonomy_relations', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_taxonomy_relations_delete
+AFTER DELETE ON taxonomy_relations
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('taxonomy_relations', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_question_tags_insert
+AFTER INSERT ON question_tags
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('question_tags', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_question_tags_delete
+AFTER DELETE ON question_tags
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('question_tags', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_scales_insert
+AFTER INSERT ON scales
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('scales', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_scales_delete
+AFTER DELETE ON scales
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('scales', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_scale_questions_insert
+AFTER INSERT ON scale_questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('scale_questions', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_scale_questions_delete
+AFTER DELETE ON scale_questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('scale_questions', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_respondents_insert
+AFTER INSERT ON respondents
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('respondents', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_respondents_delete
+AFTER DELETE ON respondents
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('respondents', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_response_items_insert
+AFTER INSERT ON response_items
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('response_items', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_response_items_delete
+AFTER DELETE ON response_items
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('response_items', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_response_values_insert
+AFTER INSERT ON response_values
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('response_values', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_response_values_delete
+AFTER DELETE ON response_values
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('response_values', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_response_texts_insert
+AFTER INSERT ON response_texts
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('response_texts', '', '', 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_response_texts_delete
+AFTER DELETE ON response_texts
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('response_texts', '', '', -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_questions_diagnosis_type_insert
+AFTER INSERT ON questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('questions', 'diagnosis_type', COALESCE(NEW.diagnosis_type, ''), 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_questions_diagnosis_type_delete
+AFTER DELETE ON questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('questions', 'diagnosis_type', COALESCE(OLD.diagnosis_type, ''), -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_questions_diagnosis_type_update
+AFTER UPDATE OF diagnosis_type ON questions
+WHEN NEW.diagnosis_type IS NOT OLD.diagnosis_type
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('questions', 'diagnosis_type', COALESCE(OLD.diagnosis_type, ''), -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('questions', 'diagnosis_type', COALESCE(NEW.diagnosis_type, ''), 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_master_questions_diagnosis_type_insert
+AFTER INSERT ON master_questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('master_questions', 'diagnosis_type', COALESCE(NEW.diagnosis_type, ''), 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_master_questions_diagnosis_type_delete
+AFTER DELETE ON master_questions
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('master_questions', 'diagnosis_type', COALESCE(OLD.diagnosis_type, ''), -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_master_questions_diagnosis_type_update
+AFTER UPDATE OF diagnosis_type ON master_questions
+WHEN NEW.diagnosis_type IS NOT OLD.diagnosis_type
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('master_questions', 'diagnosis_type', COALESCE(OLD.diagnosis_type, ''), -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('master_questions', 'diagnosis_type', COALESCE(NEW.diagnosis_type, ''), 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_taxonomy_term_type_insert
+AFTER INSERT ON taxonomy
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('taxonomy', 'term_type', COALESCE(NEW.term_type, ''), 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_taxonomy_term_type_delete
+AFTER DELETE ON taxonomy
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('taxonomy', 'term_type', COALESCE(OLD.term_type, ''), -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_taxonomy_term_type_update
+AFTER UPDATE OF term_type ON taxonomy
+WHEN NEW.term_type IS NOT OLD.term_type
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('taxonomy', 'term_type', COALESCE(OLD.term_type, ''), -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('taxonomy', 'term_type', COALESCE(NEW.term_type, ''), 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_question_tags_tag_type_insert
+AFTER INSERT ON question_tags
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('question_tags', 'tag_type', COALESCE(NEW.tag_type, ''), 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_question_tags_tag_type_delete
+AFTER DELETE ON question_tags
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('question_tags', 'tag_type', COALESCE(OLD.tag_type, ''), -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_question_tags_tag_type_update
+AFTER UPDATE OF tag_type ON question_tags
+WHEN NEW.tag_type IS NOT OLD.tag_type
+BEGIN
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('question_tags', 'tag_type', COALESCE(OLD.tag_type, ''), -1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (-1);
+    INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+    VALUES ('question_tags', 'tag_type', COALESCE(NEW.tag_type, ''), 1)
+    ON CONFLICT (table_name, dimension, dim_value)
+    DO UPDATE SET row_count = row_count + (1);
+END;
+"""
+_V6_STATS_TABLES = [
+    "companies", "surveys", "org_units", "org_unit_surveys",
+    "questions", "master_questions", "embeddings", "survey_questions",
+    "taxonomy", "taxonomy_relations", "question_tags",
+    "scales", "scale_questions",
+    "respondents", "response_items", "response_values", "response_texts",
+]
+_V6_STATS_DIMENSIONS = [
+    ("questions", "diagnosis_type"),
+    ("master_questions", "diagnosis_type"),
+    ("taxonomy", "term_type"),
+    ("question_tags", "tag_type"),
+]
+
+
+@migration(6, "Row count statistics (table_stats)")
+def _table_stats(cursor):
+    cursor.execute(_V6_TABLE_STATS_TABLE)
+    cursor.execute("DELETE FROM table_stats")
+
+    for table in _V6_STATS_TABLES:
+        cursor.execute(f"""
+            INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+            SELECT '{table}', '', '', COUNT(*) FROM {table}
+        """)
+
+    for table, column in _V6_STATS_DIMENSIONS:
+        cursor.execute(f"""
+            INSERT INTO table_stats (table_name, dimension, dim_value, row_count)
+            SELECT '{table}', '{column}', COALESCE({column}, ''), COUNT(*)
+            FROM {table} GROUP BY COALESCE({column}, '')
+        """)
+
+    execute_script(cursor, _V6_STATS_TRIGGERS)
+
+
+_V7_EMBEDDING_CHANGES_TABLE = """
+CREATE TABLE IF NOT EXISTS embedding_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, -- 변경 순번 (= 내용 버전)
+    question_idx INTEGER NOT NULL,         -- 변경된 문항
+    change_type TEXT NOT NULL,             -- I (추가), U (수정), D (삭제)
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+_V7_EMBEDDING_CHANGE_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_embeddings_change_insert
+AFTER INSERT ON embeddings
+BEGIN
+    INSERT INTO embedding_changes (question_idx, change_type) VALUES (NEW.question_idx, 'I');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_embeddings_change_update
+AFTER UPDATE OF question_idx, embedding ON embeddings
+BEGIN
+    INSERT INTO embedding_changes (question_idx, change_type)
+    SELECT OLD.question_idx, 'D' WHERE NEW.question_idx != OLD.question_idx;
+    INSERT INTO embedding_changes (question_idx, change_type)
+    VALUES (NEW.question_idx, CASE WHEN NEW.question_idx = OLD.question_idx THEN 'U' ELSE 'I' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_embeddings_change_delete
+AFTER DELETE ON embeddings
+BEGIN
+    INSERT INTO embedding_changes (question_idx, change_type) VALUES (OLD.question_idx, 'D');
+END;
+"""
+
+
+@migration(7, "Embedding change log (embedding_changes)")
+def _embedding_changes(cursor):
+    cursor.execute(_V7_EMBEDDING_CHANGES_TABLE)
+    execute_script(cursor, _V7_EMBEDDING_CHANGE_TRIGGERS)
+
+
+_V8_EMBEDDING_QUANTIZED_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_embeddings_quantized_stale
+AFTER UPDATE OF embedding ON embeddings
+WHEN NEW.embedding_f16 IS OLD.embedding_f16 AND NEW.embedding_i8 IS OLD.embedding_i8
+BEGIN
+    UPDATE embeddings
+    SET embedding_f16 = NULL, embedding_i8 = NULL, embedding_i8_scale = NULL
+    WHERE question_idx = NEW.question_idx;
+END;
+"""
+
+
+@migration(8, "Quantized embedding copies (embedding_f16, embedding_i8)")
+def _quantized_embeddings(cursor):
+    # Filled by tagging.embedding_index.store_quantized (needs NumPy)
+    add_column(cursor, "embeddings", "embedding_f16", "BLOB")
+    add_column(cursor, "embeddings", "embedding_i8", "BLOB")
+    add_column(cursor, "embeddings", "embedding_i8_scale", "REAL")
+    execute_script(cursor, _V8_EMBEDDING_QUANTIZED_TRIGGERS)
+
+
+_V9_EMBEDDING_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    text_hash TEXT NOT NULL,               -- 정규화 텍스트의 SHA-1
+    model_name TEXT NOT NULL,              -- 인코더 모델
+    embedding BLOB NOT NULL,               -- float32 벡터 (직렬화)
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (text_hash, model_name)
+) WITHOUT ROWID;
+"""
+
+
+@migration(9, "Embedding cache by normalized text hash (embedding_cache)")
+def _embedding_cache(cursor):
+    cursor.execute(_V9_EMBEDDING_CACHE_TABLE)
+
+
+_V10_EMBEDDING_METADATA_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_questions_embedding_metadata
+AFTER UPDATE OF question_id, question_text, diagnosis_type, source_year, cluster_id,
+                is_representative ON questions
+WHEN EXISTS (SELECT 1 FROM embeddings WHERE question_idx = NEW.question_idx)
+BEGIN
+    INSERT INTO embedding_changes (question_idx, change_type) VALUES (NEW.question_idx, 'M');
+END;
+"""
+
+
+@migration(10, "Log question text/metadata changes of embedded questions")
+def _embedding_metadata_changes(cursor):
+    execute_script(cursor, _V10_EMBEDDING_METADATA_TRIGGERS)
+
+
+_V11_QUESTION_SIMILARITY_TABLE = """
+CREATE TABLE IF NOT EXISTS question_similarity (
+    question_idx_a INTEGER NOT NULL REFERENCES questions(question_idx) ON DELETE CASCADE,
+    question_idx_b INTEGER NOT NULL REFERENCES questions(question_idx) ON DELETE CASCADE,
+    similarity REAL NOT NULL,              -- 코사인 유사도
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (question_idx_a, question_idx_b),
+    CHECK (question_idx_a < question_idx_b)
+) WITHOUT ROWID;
+"""
+_V11_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_similarity_b ON question_similarity(question_idx_b);
+"""
+
+
+@migration(11, "Near-duplicate question pairs (question_similarity)")
+def _question_similarity(cursor):
+    cursor.execute(_V11_QUESTION_SIMILARITY_TABLE)
+    execute_script(cursor, _V11_INDEXES)
+
+
+_V12_QUESTION_TAG_CHANGES_TABLE = """
+CREATE TABLE IF NOT EXISTS question_tag_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, -- 변경 순번 (= 태그 버전)
+    question_idx INTEGER NOT NULL,         -- 변경된 문항
+    change_type TEXT NOT NULL,             -- I (추가), U (수정), D (삭제), C (클러스터 정보 수정)
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+_V12_QUESTION_TAG_CHANGE_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_question_tags_change_insert
+AFTER INSERT ON question_tags
+WHEN NEW.question_idx IS NOT NULL
+BEGIN
+    INSERT INTO question_tag_changes (question_idx, change_type) VALUES (NEW.question_idx, 'I');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_question_tags_change_update
+AFTER UPDATE OF question_idx, term_id, tag_type ON question_tags
+BEGIN
+    INSERT INTO question_tag_changes (question_idx, change_type)
+    SELECT OLD.question_idx, 'D'
+    WHERE OLD.question_idx IS NOT NULL AND NEW.question_idx IS NOT OLD.question_idx;
+    INSERT INTO question_tag_changes (question_idx, change_type)
+    SELECT NEW.question_idx, CASE WHEN NEW.question_idx IS OLD.question_idx THEN 'U' ELSE 'I' END
+    WHERE NEW.question_idx IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_question_tags_change_delete
+AFTER DELETE ON question_tags
+WHEN OLD.question_idx IS NOT NULL
+BEGIN
+    INSERT INTO question_tag_changes (question_idx, change_type) VALUES (OLD.question_idx, 'D');
+END;
+
+-- 대표 문항 태그를 물려받는 클러스터 구성 변경
+CREATE TRIGGER IF NOT EXISTS trg_questions_cluster_change
+AFTER UPDATE OF master_question_id, is_representative ON questions
+BEGIN
+    INSERT INTO question_tag_changes (question_idx, change_type) VALUES (NEW.question_idx, 'C');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_master_questions_change_insert
+AFTER INSERT ON master_questions
+BEGIN
+    INSERT INTO question_tag_changes (question_idx, change_type)
+    SELECT question_idx, 'C' FROM questions WHERE master_question_id = NEW.master_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_master_questions_change_update
+AFTER UPDATE OF master_id, question_idx ON master_questions
+BEGIN
+    INSERT INTO question_tag_changes (question_idx, change_type)
+    SELECT question_idx, 'C' FROM questions
+    WHERE master_question_id IN (OLD.master_id, NEW.master_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_master_questions_change_delete
+AFTER DELETE ON master_questions
+BEGIN
+    INSERT INTO question_tag_changes (question_idx, change_type)
+    SELECT question_idx, 'C' FROM questions WHERE master_question_id = OLD.master_id;
+END;
+"""
+_V12_TAG_SUGGESTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS tag_suggestions (
+    question_idx INTEGER PRIMARY KEY REFERENCES questions(question_idx) ON DELETE CASCADE,
+    suggestions TEXT NOT NULL,             -- AutoTagger.suggest_tags 결과 (JSON)
+    neighbours TEXT NOT NULL,              -- 유사 문항 [[question_id, 유사도], ...] (JSON)
+    settings TEXT NOT NULL,                -- 계산 설정 (유사 문항 수, 최소 유사도)
+    embedding_seq INTEGER NOT NULL,        -- 계산 시점의 임베딩 버전 (embedding_changes.seq)
+    tag_seq INTEGER NOT NULL,              -- 계산 시점의 태그 버전 (question_tag_changes.seq)
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+_V12_TAG_SUGGESTION_INPUTS_TABLE = """
+CREATE TABLE IF NOT EXISTS tag_suggestion_inputs (
+    question_idx INTEGER NOT NULL REFERENCES tag_suggestions(question_idx) ON DELETE CASCADE,
+    input_idx INTEGER NOT NULL,            -- 결과에 영향을 주는 문항 (자신, 대표 문항, 유사 문항)
+    PRIMARY KEY (question_idx, input_idx)
+) WITHOUT ROWID;
+"""
+_V12_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_suggestion_inputs_input ON tag_suggestion_inputs(input_idx);
+"""
+
+
+@migration(12, "Tag change log and tag suggestion cache")
+def _tag_suggestion_cache(cursor):
+    cursor.execute(_V12_QUESTION_TAG_CHANGES_TABLE)
+    execute_script(cursor, _V12_QUESTION_TAG_CHANGE_TRIGGERS)
+    cursor.execute(_V12_TAG_SUGGESTIONS_TABLE)
+    cursor.execute(_V12_TAG_SUGGESTION_INPUTS_TABLE)
+    execute_script(cursor, _V12_INDEXES)
+
+
+# Schema version of this code: the highest registered step
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ============================================================
+# RUNNER
+# ============================================================
+
+def set_wal_mode(cursor):
+    """Switch a file database to WAL journaling (readers don't block the writer)."""
+    db_file = cursor.execute("PRAGMA database_list").fetchone()[2]
+    if not db_file:
+        return
+    if cursor.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+        cursor.execute("PRAGMA journal_mode = WAL")
+
+
+def foreign_key_violations(cursor, tables=None) -> list:
+    """
+    Rows whose foreign keys point nowhere.
+
+    Args:
+        cursor: Database cursor
+        tables: Tables to check (default: the whole database)
+
+    Returns:
+        List of (table, rowid, parent table)
+    """
+    if tables is None:
+        cursor.execute("PRAGMA foreign_key_check")
+        return [(table, rowid, parent) for table, rowid, parent, _ in cursor.fetchall()]
+    violations = []
+    for table in tables:
+        if table_exists(cursor, table):
+            cursor.execute(f"PRAGMA foreign_key_check({table})")
+            violations.extend((t, rowid, parent) for t, rowid, parent, _ in cursor.fetchall())
+    return violations
+
+
+def _violation_counts(violations) -> dict:
+    counts = {}
+    for table, _, parent in violations:
+        counts[(table, parent)] = counts.get((table, parent), 0) + 1
+    return counts
+
+
+# Tables rebuilt by the running step (and tables referencing them), with
+# their foreign key violation counts before the rebuild
+_rebuilt = {}
+
+
+def _track_rebuild(cursor, table):
+    """Record the violations of a table about to be rebuilt and of its referencing tables."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    names = [row[0] for row in cursor.fetchall()]
+    affected = [table] + [
+        name for name in names
+        if any(fk[2] == table for fk in cursor.execute(f"PRAGMA foreign_key_list({name})").fetchall())
+    ]
+    for name in affected:
+        if name not in _rebuilt:
+            _rebuilt[name] = _violation_counts(foreign_key_violations(cursor, [name]))
+
+
+def _check_rebuilt(cursor, version):
+    """Raise if the step's rebuilds left more foreign key violations than before."""
+    before = {}
+    for counts in _rebuilt.values():
+        before.update(counts)
+    violations = foreign_key_violations(cursor, list(_rebuilt))
+    grown = {
+        key for key, count in _violation_counts(violations).items()
+        if count > before.get(key, 0)
+    }
+    new = [v for v in violations if (v[0], v[2]) in grown]
+    if new:
+        shown = ", ".join(f"{table} rowid {rowid} -> {parent}" for table, rowid, parent in new[:20])
+        raise sqlite3.IntegrityError(
+            f"Migration {version} left foreign key violations in {len(grown)} tables: {shown}"
+        )
+
+
+def get_schema_version(conn):
+    """Get the latest applied migration version (0 if none)."""
+    cursor = conn.cursor()
+    if not table_exists(cursor, "schema_migrations"):
+        return 0
+    cursor.execute("SELECT MAX(version) FROM schema_migrations")
+    return cursor.fetchone()[0] or 0
+
+
+def get_latest_version():
+    """Get the version the code expects."""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def migrate(conn, target=None):
+    """
+    Apply all pending migration steps up to target (default: latest).
+
+    File databases are switched to WAL journaling first (the mode is stored
+    in the file, so every later connection uses it). Foreign keys are
+    switched off while steps run so tables can be rebuilt; before a step
+    commits, the tables it rebuilt and the tables referencing them are
+    checked, and a step that leaves rows with dangling foreign keys
+    (beyond those already there) is rolled back.
+
+    Args:
+        conn: Database connection
+        target: Highest version to apply
+
+    Returns:
+        List of applied versions
+
+    Raises:
+        sqlite3.IntegrityError: A step left foreign key violations
+    """
+    if target is None:
+        target = get_latest_version()
+
+    if conn.in_transaction:
+        conn.commit()
+
+    cursor = conn.cursor()
+    set_wal_mode(cursor)
+    cursor.execute(MIGRATIONS_TABLE)
+    conn.commit()
+
+    current = get_schema_version(conn)
+    pending = [m for m in MIGRATIONS if current < m[0] <= target]
+    if not pending:
+        return []
+
+    fk_enabled = cursor.execute("PRAGMA foreign_keys").fetchone()[0]
+    cursor.execute("PRAGMA foreign_keys = OFF")
+
+    applied = []
+    try:
+        for version, description, func in pending:
+            print(f"  Migration {version}: {description}")
+            cursor.execute("BEGIN")
+            try:
+                _rebuilt.clear()
+                func(cursor)
+                _check_rebuilt(cursor, version)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                    (version, description),
+                )
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+            applied.append(version)
+    finally:
+        if fk_enabled:
+            cursor.execute("PRAGMA foreign_keys = ON")
+
+    return applied
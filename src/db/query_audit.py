@@ -0,0 +1,313 @@
+"""
+MasterDB Query Plan Audit
+
+Opt-in auditing of every statement issued through db.connection
+connections (get_connection, pools, snapshots). For each distinct SQL
+statement it records:
+- call count and execution time (execute() until the first row)
+- the EXPLAIN QUERY PLAN output, captured once
+- full scans of large tables (SCAN without an index)
+- indexes used, so unused ones can be spotted
+
+Enable in code:
+
+    from db.query_audit import enable_query_audit
+    auditor = enable_query_audit()
+    ...  # run searches / tagging
+    print(auditor.format_report())
+
+or for a whole script run (report printed at exit):
+
+    MASTERDB_QUERY_AUDIT=1 python src/query/question_search.py
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import atexit
+import itertools
+
+ENV_VAR = "MASTERDB_QUERY_AUDIT"
+
+# Tables with at least this many rows are "large" for scan reporting
+DEFAULT_LARGE_TABLE_ROWS = 1000
+
+# Statements that have a query plan worth capturing
+_PLANNED = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE
+)
+_SCAN = re.compile(r"^SCAN (\w+)(?: USING (COVERING )?INDEX (\w+))?")
+_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+_SQL_KEYWORDS = {
+    "where", "on", "join", "left", "inner", "cross", "group", "order", "limit",
+    "select", "values", "set", "using", "natural", "union", "having", "default",
+}
+
+_auditor = None
+
+
+def normalize_sql(sql):
+    """Collapse whitespace so the same statement is recorded once."""
+    return " ".join(sql.split())
+
+
+def _table_aliases(sql):
+    """Map aliases (and table names) used in sql to table names."""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+class StatementStats:
+    """Audit record of one distinct statement."""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.plan = None          # list of EXPLAIN QUERY PLAN details
+        self.full_scans = []      # large tables scanned without an index
+        self.indexes = set()      # indexes used by the plan
+
+    def as_dict(self):
+        return {
+            "sql": self.sql,
+            "calls": self.calls,
+            "total_ms": round(self.total_time * 1000, 3),
+            "max_ms": round(self.max_time * 1000, 3),
+            "avg_ms": round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+            "plan": self.plan or [],
+            "full_scans": self.full_scans,
+            "indexes": sorted(self.indexes),
+        }
+
+
+class QueryAuditor:
+    """Collects query plans and timings of audited connections."""
+
+    def __init__(self, large_table_rows=DEFAULT_LARGE_TABLE_ROWS):
+        self.large_table_rows = large_table_rows
+        self._stats = {}
+        self._defined_indexes = {}
+        self._lock = threading.Lock()
+
+    def _row_count(self, conn, table):
+        """Rows of a table: from table_stats, or COUNT(*) if it isn't tracked there."""
+        # Plain cursor: an audited one would re-enter record()
+        cursor = sqlite3.Cursor(conn)
+        try:
+            row = cursor.execute("""
+                SELECT row_count FROM table_stats
+                WHERE table_name = ? AND dimension = '' AND dim_value = ''
+            """, (table,)).fetchone()
+        except sqlite3.Error:
+            row = None  # database without table_stats
+        if row is not None:
+            return row[0]
+        try:
+            return cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def _explain(self, conn, sql, parameters, stats):
+        """Capture the plan of a statement (once per distinct SQL)."""
+        stats.plan = []
+        if not _PLANNED.match(sql):
+            return
+        try:
+            rows = sqlite3.Cursor(conn).execute(
+                f"EXPLAIN QUERY PLAN {sql}", parameters
+            ).fetchall()
+        except sqlite3.Error:
+            return
+
+        if not self._defined_indexes:
+            # Indexes of the schema (sql is NULL for automatic ones)
+            self._defined_indexes = dict(sqlite3.Cursor(conn).execute(
+                "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+            ).fetchall())
+
+        aliases = _table_aliases(sql)
+        for row in rows:
+            detail = row[3]
+            stats.plan.append(detail)
+            stats.indexes.update(_INDEX.findall(detail))
+
+            match = _SCAN.match(detail)
+            if match and not match.group(3):
+                table = aliases.get(match.group(1), match.group(1))
+                rows_in_table = self._row_count(conn, table)
+                if rows_in_table >= self.large_table_rows:
+                    stats.full_scans.append({"table": table, "rows": rows_in_table})
+
+    def record(self, conn, sql, parameters, elapsed):
+        """Record one execution of sql."""
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats(key)
+                self._explain(conn, sql, parameters, stats)
+            stats.calls += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+
+    def reset(self):
+        """Forget all recorded statements."""
+        with self._lock:
+            self._stats = {}
+            self._defined_indexes = {}
+
+    def statements(self):
+        """Recorded statements, slowest (total time) first."""
+        with self._lock:
+            stats = list(self._stats.values())
+        return sorted(stats, key=lambda s: s.total_time, reverse=True)
+
+    def full_scans(self):
+        """Statements that scan a large table without an index."""
+        return [s for s in self.statements() if s.full_scans]
+
+    def unused_indexes(self):
+        """
+        Indexes of the audited database that no recorded plan used.
+
+        Only indexes of tables the recorded statements touched are listed,
+        so a short audit doesn't flag every index of unrelated tables.
+        """
+        touched = set()
+        used = set()
+        for stats in self.statements():
+            touched.update(_table_aliases(stats.sql).values())
+            used.update(stats.indexes)
+
+        return [
+            {"index": name, "table": table}
+            for name, table in sorted(self._defined_indexes.items())
+            if table in touched and name not in used
+        ]
+
+    def report(self):
+        """Audit results as a dict."""
+        statements = self.statements()
+        return {
+            "statement_count": len(statements),
+            "total_ms": round(sum(s.total_time for s in statements) * 1000, 3),
+            "statements": [s.as_dict() for s in statements],
+            "full_scans": [s.as_dict() for s in statements if s.full_scans],
+            "unused_indexes": self.unused_indexes(),
+        }
+
+    def format_report(self, limit=20):
+        """Audit results as text (slowest statements first)."""
+        report = self.report()
+        lines = [
+            "=" * 60,
+            "  Query Plan Audit",
+            "=" * 60,
+            f"  Statements: {report['statement_count']}, total {report['total_ms']:.1f} ms",
+        ]
+
+        lines.append(f"\n[Full scans on large tables (>= {self.large_table_rows:,} rows)]")
+        if not report["full_scans"]:
+            lines.append("  (none)")
+        for s in report["full_scans"]:
+            tables = ", ".join(f"{t['table']} ({t['rows']:,})" for t in s["full_scans"])
+            lines.append(f"  {s['calls']}x {s['total_ms']:.1f} ms  SCAN {tables}")
+            lines.append(f"    {s['sql'][:120]}")
+
+        lines.append(f"\n[Slowest statements (top {limit})]")
+        for s in report["statements"][:limit]:
+            lines.append(
+                f"  {s['calls']}x total {s['total_ms']:.1f} ms, "
+                f"avg {s['avg_ms']:.2f} ms, max {s['max_ms']:.2f} ms"
+            )
+            lines.append(f"    {s['sql'][:120]}")
+            for detail in s["plan"]:
+                lines.append(f"      - {detail}")
+
+        lines.append("\n[Indexes not used by any audited statement]")
+        if not report["unused_indexes"]:
+            lines.append("  (none)")
+        for item in report["unused_indexes"]:
+            lines.append(f"  {item['index']} ON {item['table']}")
+
+        return "\n".join(lines)
+
+
+class AuditCursor(sqlite3.Cursor):
+    """Cursor that reports executed statements to the active auditor."""
+
+    def execute(self, sql, parameters=()):
+        auditor = _auditor
+        if auditor is None:
+            return super().execute(sql, parameters)
+
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            auditor.record(self.connection, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        auditor = _auditor
+        if auditor is None:
+            return super().executemany(sql, seq_of_parameters)
+
+        # Peek at the first parameters (for the plan) without materializing a stream
+        parameters = iter(seq_of_parameters)
+        first = next(parameters, None)
+        if first is not None:
+            parameters = itertools.chain((first,), parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            auditor.record(
+                self.connection, sql, first if first is not None else (), time.perf_counter() - start
+            )
+
+
+def get_auditor():
+    """Get the active auditor (None if auditing is off)."""
+    return _auditor
+
+
+def enable_query_audit(large_table_rows=DEFAULT_LARGE_TABLE_ROWS):
+    """
+    Start auditing statements of all db-layer connections.
+
+    Args:
+        large_table_rows: Row count from which a table scan is reported
+
+    Returns:
+        QueryAuditor collecting the results
+    """
+    global _auditor
+    _auditor = QueryAuditor(large_table_rows)
+    return _auditor
+
+
+def disable_query_audit():
+    """Stop auditing. Returns the auditor that was active."""
+    global _auditor
+    auditor, _auditor = _auditor, None
+    return auditor
+
+
+def _print_report_at_exit():
+    if _auditor is not None:
+        print(_auditor.format_report())
+
+
+if os.environ.get(ENV_VAR, "").lower() in ("1", "true", "yes", "on"):
+    enable_query_audit(int(os.environ.get(f"{ENV_VAR}_LARGE_ROWS", DEFAULT_LARGE_TABLE_ROWS)))
+    atexit.register(_print_report_at_exit)
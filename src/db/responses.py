@@ -0,0 +1,152 @@
+"""
+MasterDB Response Storage
+
+Compact storage for survey answers (see migrations.py, step 4):
+- response_items: question numbers (r001, r002, ...) interned to integers
+- response_values: integer answers keyed by (respondent_id, item_idx)
+- response_texts: essay and other non-integer answers
+
+The `responses` view keeps the old long-format columns for ad-hoc queries.
+"""
+
+import re
+
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+# Integer literals stored as integers; "007", "-0", "1e3", "5.0" stay text
+INTEGER_LITERAL = re.compile(r"0|-?[1-9]\d*")
+
+
+def split_response_value(value):
+    """
+    Split a raw answer into (integer value, text).
+
+    Integers that fit SQLite's INTEGER (64-bit) become integers: ints,
+    integral floats (5.0 from a spreadsheet column with blanks) and
+    canonical integer literals ("5", "-3"). Anything else is kept as text,
+    unchanged. Empty answers return (None, None).
+    """
+    if value is None:
+        return None, None
+
+    if isinstance(value, bool):
+        return int(value), None
+
+    if isinstance(value, int):
+        if INT64_MIN <= value <= INT64_MAX:
+            return value, None
+        return None, str(value)
+
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None, None
+        if value.is_integer() and INT64_MIN <= value < INT64_MAX:
+            return int(value), None
+        return None, str(value)
+
+    text = str(value)
+    stripped = text.strip()
+    if not stripped:
+        return None, None
+    if INTEGER_LITERAL.fullmatch(stripped):
+        number = int(stripped)
+        if INT64_MIN <= number <= INT64_MAX:
+            return number, None
+    return None, text
+
+
+# Answers of the legacy responses table were stored as str() of a pandas
+# value; columns with blanks are float, so Likert answers read "3.0"
+LEGACY_INTEGRAL_DECIMAL = re.compile(r"(0|-?[1-9]\d*)\.0+")
+
+
+def legacy_response_value(value):
+    """
+    Raw answer of a legacy responses row, for split_response_value.
+
+    Integral decimals ("3.0") become ints; only used when converting the
+    old table (migration 4), where they were written from float columns.
+    """
+    if isinstance(value, str):
+        match = LEGACY_INTEGRAL_DECIMAL.fullmatch(value.strip())
+        if match:
+            number = int(match.group(1))
+            if INT64_MIN <= number <= INT64_MAX:
+                return number
+    return value
+
+
+class ResponseWriter:
+    """Buffered writer for response_values / response_texts."""
+
+    def __init__(self, cursor, batch_size=10000):
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self._items = {}
+        self._values = []
+        self._texts = []
+
+    def item_idx(self, question_no):
+        """Get (or create) the interned integer for a question number."""
+        question_no = str(question_no)
+        idx = self._items.get(question_no)
+        if idx is None:
+            self.cursor.execute(
+                "INSERT OR IGNORE INTO response_items (question_no) VALUES (?)",
+                (question_no,),
+            )
+            self.cursor.execute(
+                "SELECT item_idx FROM response_items WHERE question_no = ?",
+                (question_no,),
+            )
+            idx = self.cursor.fetchone()[0]
+            self._items[question_no] = idx
+        return idx
+
+    def add(self, respondent_id, question_no, value):
+        """Queue one answer. Returns False if the answer was empty."""
+        number, text = split_response_value(value)
+        if number is None and text is None:
+            return False
+
+        item = self.item_idx(question_no)
+        if number is not None:
+            self._values.append((respondent_id, item, number))
+        else:
+            self._texts.append((respondent_id, item, text))
+
+        if len(self._values) + len(self._texts) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write queued answers.
+
+        Uses ON CONFLICT DO UPDATE rather than INSERT OR REPLACE: REPLACE
+        deletes without firing delete triggers, which would skew table_stats.
+        """
+        if self._values:
+            self.cursor.executemany("""
+                INSERT INTO response_values (respondent_id, item_idx, value)
+                VALUES (?, ?, ?)
+                ON CONFLICT (respondent_id, item_idx) DO UPDATE SET value = excluded.value
+            """, self._values)
+            self._values = []
+        if self._texts:
+            self.cursor.executemany("""
+                INSERT INTO response_texts (respondent_id, item_idx, response_text)
+                VALUES (?, ?, ?)
+                ON CONFLICT (respondent_id, item_idx) DO UPDATE SET response_text = excluded.response_text
+            """, self._texts)
+            self._texts = []
+
+
+def delete_survey_responses(cursor, survey_id):
+    """Delete all answers of a survey's respondents (respondents are kept)."""
+    for table in ("response_values", "response_texts"):
+        cursor.execute(f"""
+            DELETE FROM {table} WHERE respondent_id IN (
+                SELECT respondent_id FROM respondents WHERE survey_id = ?
+            )
+        """, (survey_id,))
@@ -0,0 +1,83 @@
+"""
+MasterDB Statistics
+
+Row counts per table and per dimension (e.g. questions by diagnosis_type)
+come from the table_stats table, which triggers keep current (see
+migrations.py, step 6). Reads are cached per connection
+and only re-read when the database changed:
+- PRAGMA data_version changes when another connection commits
+- total_changes changes when this connection writes
+
+so a stats call on an unchanged database is a constant-time lookup.
+"""
+
+import weakref
+
+# StatsService per connection
+_services = weakref.WeakKeyDictionary()
+
+
+class StatsService:
+    """Cached reader of table_stats for one connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._stamp = None
+        self._counts = None
+
+    def _current_stamp(self):
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self.conn.total_changes
+
+    def _load(self):
+        """Get {(table, dimension): {value: count}}, re-reading if stale."""
+        stamp = self._current_stamp()
+        if self._counts is None or stamp != self._stamp:
+            counts = {}
+            rows = self.conn.execute("""
+                SELECT table_name, dimension, dim_value, row_count
+                FROM table_stats WHERE row_count != 0
+            """).fetchall()
+            for table, dimension, value, count in rows:
+                counts.setdefault((table, dimension), {})[value] = count
+            self._counts = counts
+            self._stamp = stamp
+        return self._counts
+
+    def invalidate(self):
+        """Force the next call to re-read table_stats."""
+        self._counts = None
+
+    def count(self, table: str) -> int:
+        """Row count of a table."""
+        return self._load().get((table, ""), {}).get("", 0)
+
+    def table_counts(self, tables=None) -> dict:
+        """Row counts of tables (default: all tracked tables)."""
+        if tables is None:
+            # Tables with stats triggers, including empty ones
+            tables = [row[0] for row in self.conn.execute("""
+                SELECT table_name FROM table_stats
+                WHERE dimension = '' ORDER BY table_name
+            """)]
+        return {table: self.count(table) for table in tables}
+
+    def counts_by(self, table: str, dimension: str) -> dict:
+        """Row counts per value of a tracked column, largest first.
+
+        NULL values are counted under None, like a GROUP BY (table_stats
+        stores them as '', so empty strings are counted there too).
+        """
+        counts = self._load().get((table, dimension), {})
+        return {
+            value if value != "" else None: count
+            for value, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        }
+
+
+def get_stats(conn) -> StatsService:
+    """Get the cached StatsService of a connection."""
+    service = _services.get(conn)
+    if service is None:
+        service = _services[conn] = StatsService(conn)
+    return service
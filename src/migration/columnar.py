@@ -0,0 +1,571 @@
+"""
+Columnar Export/Import of Survey Data
+
+Exports surveys to Parquet files partitioned by company, year and survey:
+
+    {root}/{table}/company_id=WCP/survey_year=2025/survey_id=IG202512WCPOD/part-0.parquet
+
+Tables (partition columns live in the path, not in the files):
+- surveys:          survey metadata (+ company_name, to recreate the company)
+- questions:        questions linked to the survey
+- survey_questions: survey ↔ question links (by question_id)
+- respondents:      respondent attributes (respondent_id is the source id)
+- responses:        long format (respondent_id, question_no, value, response_text)
+
+Export streams rows from SQLite in batches and import streams record
+batches back, so memory stays bounded by batch_size. read_table() /
+iter_batches() give analysts column projection and partition filters
+without going through the database.
+
+Usage:
+    python src/migration/columnar.py export data/columnar --company WCP
+    python src/migration/columnar.py import data/columnar --survey IG202512WCPOD
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from db.connection import get_connection
+from db.migrations import migrate
+from db.responses import ResponseWriter, delete_survey_responses
+from query.response_matrix import ResponseMatrixCache
+
+DEFAULT_BATCH_SIZE = 50000
+
+PARTITIONING = ds.partitioning(
+    pa.schema([
+        ("company_id", pa.string()),
+        ("survey_year", pa.int32()),
+        ("survey_id", pa.string()),
+    ]),
+    flavor="hive",
+)
+
+# File schema per table, and the query producing its rows for one survey
+# (columns in schema order, survey_id as the only parameter)
+TABLES = {
+    "surveys": (
+        pa.schema([
+            ("survey_name", pa.string()),
+            ("company_name", pa.string()),
+            ("diagnosis_type", pa.string()),
+            ("survey_purpose", pa.string()),
+            ("survey_month", pa.int32()),
+            ("survey_start_date", pa.string()),
+            ("survey_end_date", pa.string()),
+            ("target_respondent_count", pa.int32()),
+            ("actual_respondent_count", pa.int32()),
+            ("question_count", pa.int32()),
+            ("status", pa.string()),
+        ]),
+        """
+        SELECT s.survey_name, c.company_name, s.diagnosis_type, s.survey_purpose,
+               s.survey_month, s.survey_start_date, s.survey_end_date,
+               s.target_respondent_count, s.actual_respondent_count,
+               s.question_count, s.status
+        FROM surveys s
+        LEFT JOIN companies c ON c.company_id = s.company_id
+        WHERE s.survey_id = ?
+        """,
+    ),
+    "questions": (
+        pa.schema([
+            ("question_id", pa.string()),
+            ("question_text", pa.string()),
+            ("diagnosis_type", pa.string()),
+            ("source_survey_id", pa.string()),
+            ("source_year", pa.int32()),
+            ("question_type", pa.string()),
+            ("scale_min", pa.int32()),
+            ("scale_max", pa.int32()),
+            ("choices", pa.string()),
+            ("is_reverse", pa.int8()),
+            ("legacy_mid_category", pa.string()),
+            ("legacy_sub_category", pa.string()),
+        ]),
+        """
+        SELECT q.question_id, q.question_text, q.diagnosis_type, q.source_survey_id,
+               q.source_year, q.question_type, q.scale_min, q.scale_max, q.choices,
+               q.is_reverse, q.legacy_mid_category, q.legacy_sub_category
+        FROM surveys s
+        JOIN survey_questions sq ON sq.survey_idx = s.survey_idx
+        JOIN questions q ON q.question_idx = sq.question_idx
+        WHERE s.survey_id = ?
+        ORDER BY sq.question_order
+        """,
+    ),
+    "survey_questions": (
+        pa.schema([
+            ("question_id", pa.string()),
+            ("section_name", pa.string()),
+            ("question_order", pa.int32()),
+            ("is_required", pa.int8()),
+            ("scale_type", pa.string()),
+            ("scale_labels", pa.string()),
+        ]),
+        """
+        SELECT q.question_id, sq.section_name, sq.question_order,
+               sq.is_required, sq.scale_type, sq.scale_labels
+        FROM surveys s
+        JOIN survey_questions sq ON sq.survey_idx = s.survey_idx
+        JOIN questions q ON q.question_idx = sq.question_idx
+        WHERE s.survey_id = ?
+        ORDER BY sq.question_order
+        """,
+    ),
+    "respondents": (
+        pa.schema([
+            ("respondent_id", pa.int64()),
+            ("original_id", pa.string()),
+            ("gender", pa.string()),
+            ("age", pa.int32()),
+            ("tenure", pa.int32()),
+            ("experience", pa.int32()),
+            ("rank", pa.string()),
+            ("position", pa.string()),
+            ("job_group", pa.string()),
+            ("job_function", pa.string()),
+            ("org_level_1", pa.string()),
+            ("org_level_2", pa.string()),
+            ("org_level_3", pa.string()),
+            ("org_level_4", pa.string()),
+            ("org_level_5", pa.string()),
+            ("target_info", pa.string()),
+            ("target_name", pa.string()),
+            ("target_org", pa.string()),
+            ("target_position", pa.string()),
+            ("evaluator_type", pa.string()),
+            ("is_valid", pa.int8()),
+        ]),
+        """
+        SELECT respondent_id, original_id, gender, age, tenure, experience,
+               rank, position, job_group, job_function,
+               org_level_1, org_level_2, org_level_3, org_level_4, org_level_5,
+               target_info, target_name, target_org, target_position, evaluator_type,
+               is_valid
+        FROM respondents
+        WHERE survey_id = ?
+        ORDER BY respondent_id
+        """,
+    ),
+    "responses": (
+        pa.schema([
+            ("respondent_id", pa.int64()),
+            ("question_no", pa.string()),
+            ("value", pa.int64()),
+            ("response_text", pa.string()),
+        ]),
+        """
+        SELECT v.respondent_id, i.question_no, v.value, NULL
+        FROM respondents r
+        JOIN response_values v ON v.respondent_id = r.respondent_id
+        JOIN response_items i ON i.item_idx = v.item_idx
+        WHERE r.survey_id = ?1
+        UNION ALL
+        SELECT t.respondent_id, i.question_no, NULL, t.response_text
+        FROM respondents r
+        JOIN response_texts t ON t.respondent_id = r.respondent_id
+        JOIN response_items i ON i.item_idx = t.item_idx
+        WHERE r.survey_id = ?1
+        """,
+    ),
+}
+
+
+def partition_path(root, table, company_id, survey_year, survey_id):
+    """Hive-style partition directory of one survey's table."""
+    def segment(name, value):
+        value = "__HIVE_DEFAULT_PARTITION__" if value is None else str(value)
+        return f"{name}={quote(value, safe='')}"
+
+    return (
+        Path(root) / table
+        / segment("company_id", company_id)
+        / segment("survey_year", survey_year)
+        / segment("survey_id", survey_id)
+    )
+
+
+def _select_surveys(cursor, survey_ids=None, company_id=None, survey_year=None):
+    """Find (survey_id, company_id, survey_year) of the surveys to export."""
+    sql = "SELECT survey_id, company_id, survey_year FROM surveys WHERE 1=1"
+    params = []
+    if survey_ids:
+        sql += f" AND survey_id IN ({','.join('?' * len(survey_ids))})"
+        params.extend(survey_ids)
+    if company_id:
+        sql += " AND company_id = ?"
+        params.append(company_id)
+    if survey_year:
+        sql += " AND survey_year = ?"
+        params.append(survey_year)
+    cursor.execute(sql + " ORDER BY survey_id", params)
+    return cursor.fetchall()
+
+
+def export_table(conn, root, table, survey, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Export one table of one survey.
+
+    Args:
+        conn: Database connection
+        root: Output directory
+        table: Table name (see TABLES)
+        survey: (survey_id, company_id, survey_year)
+        batch_size: Rows fetched and written per batch
+
+    Returns:
+        Number of rows written
+    """
+    schema, sql = TABLES[table]
+    survey_id, company_id, survey_year = survey
+
+    out_dir = partition_path(root, table, company_id, survey_year, survey_id)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("*.parquet"):
+        old.unlink()
+
+    cursor = conn.cursor()
+    cursor.execute(sql, (survey_id,))
+
+    rows_written = 0
+    with pq.ParquetWriter(out_dir / "part-0.parquet", schema) as writer:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_batch(batch)
+            rows_written += len(rows)
+
+    if rows_written == 0:
+        # Keep the partition readable with an empty, typed file
+        pq.write_table(schema.empty_table(), out_dir / "part-0.parquet")
+    return rows_written
+
+
+def export_surveys(
+    conn,
+    root,
+    survey_ids=None,
+    company_id=None,
+    survey_year=None,
+    tables=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """
+    Export surveys to partitioned Parquet files.
+
+    Args:
+        conn: Database connection
+        root: Output directory
+        survey_ids: Only these surveys
+        company_id: Only this company's surveys
+        survey_year: Only surveys of this year
+        tables: Subset of TABLES to export (default: all)
+        batch_size: Rows per batch
+
+    Returns:
+        Dict of table -> rows written
+    """
+    tables = tables or list(TABLES)
+    surveys = _select_surveys(conn.cursor(), survey_ids, company_id, survey_year)
+
+    counts = {table: 0 for table in tables}
+    for survey in surveys:
+        for table in tables:
+            counts[table] += export_table(conn, root, table, tuple(survey), batch_size)
+        print(f"  Exported {survey[0]}")
+    return counts
+
+
+def open_dataset(root, table):
+    """Open one exported table as a pyarrow dataset."""
+    return ds.dataset(Path(root) / table, format="parquet", partitioning=PARTITIONING)
+
+
+def _partition_filter(survey_ids=None, company_id=None, survey_year=None):
+    expr = None
+    for condition in (
+        ds.field("survey_id").isin(survey_ids) if survey_ids else None,
+        ds.field("company_id") == company_id if company_id else None,
+        ds.field("survey_year") == survey_year if survey_year else None,
+    ):
+        if condition is not None:
+            expr = condition if expr is None else expr & condition
+    return expr
+
+
+def iter_batches(
+    root,
+    table,
+    columns=None,
+    survey_ids=None,
+    company_id=None,
+    survey_year=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """
+    Stream record batches of an exported table.
+
+    Only the requested columns are read from disk, and partitions that
+    don't match the filters are skipped without being opened.
+
+    Args:
+        root: Export directory
+        table: Table name (see TABLES)
+        columns: Columns to read (partition columns included); default all
+        survey_ids / company_id / survey_year: Partition filters
+        batch_size: Max rows per batch
+
+    Yields:
+        pyarrow.RecordBatch
+    """
+    dataset = open_dataset(root, table)
+    yield from dataset.to_batches(
+        columns=columns,
+        filter=_partition_filter(survey_ids, company_id, survey_year),
+        batch_size=batch_size,
+    )
+
+
+def read_table(root, table, columns=None, survey_ids=None, company_id=None, survey_year=None):
+    """Read an exported table (or a projection of it) into memory.
+
+    Returns:
+        pyarrow.Table (use .to_pandas() for a DataFrame)
+    """
+    dataset = open_dataset(root, table)
+    return dataset.to_table(
+        columns=columns,
+        filter=_partition_filter(survey_ids, company_id, survey_year),
+    )
+
+
+def _rows(batch):
+    """Rows of a record batch as tuples, in column order."""
+    return zip(*(col.to_pylist() for col in batch.columns))
+
+
+def import_survey(conn, root, survey_id, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import one exported survey, replacing its existing respondents/responses.
+
+    Questions are matched by question_id (existing questions are kept),
+    respondents get new respondent_ids.
+
+    Args:
+        conn: Database connection
+        root: Export directory
+        survey_id: Survey to import
+        batch_size: Rows per batch
+
+    Returns:
+        Dict of table -> rows imported
+    """
+    cursor = conn.cursor()
+    filters = {"survey_ids": [survey_id]}
+    counts = {}
+
+    # surveys (+ company)
+    meta = read_table(root, "surveys", **filters).to_pylist()
+    if not meta:
+        raise ValueError(f"Survey not found in export: {survey_id}")
+    meta = meta[0]
+
+    if meta["company_id"] is not None:
+        cursor.execute("""
+            INSERT OR IGNORE INTO companies (company_id, company_name)
+            VALUES (?, ?)
+        """, (meta["company_id"], meta["company_name"] or meta["company_id"]))
+
+    cursor.execute("""
+        INSERT INTO surveys (
+            survey_id, survey_name, company_id, diagnosis_type, survey_purpose,
+            survey_year, survey_month, survey_start_date, survey_end_date,
+            target_respondent_count, question_count, status
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(survey_id) DO UPDATE SET
+            survey_name = excluded.survey_name,
+            company_id = excluded.company_id,
+            diagnosis_type = excluded.diagnosis_type,
+            survey_purpose = excluded.survey_purpose,
+            survey_year = excluded.survey_year,
+            survey_month = excluded.survey_month,
+            survey_start_date = excluded.survey_start_date,
+            survey_end_date = excluded.survey_end_date,
+            target_respondent_count = excluded.target_respondent_count,
+            question_count = excluded.question_count,
+            status = excluded.status,
+            updated_at = CURRENT_TIMESTAMP
+    """, (
+        survey_id, meta["survey_name"], meta["company_id"], meta["diagnosis_type"],
+        meta["survey_purpose"], meta["survey_year"], meta["survey_month"],
+        meta["survey_start_date"], meta["survey_end_date"],
+        meta["target_respondent_count"], meta["question_count"], meta["status"],
+    ))
+    counts["surveys"] = 1
+
+    # questions
+    schema, _ = TABLES["questions"]
+    columns = schema.names
+    counts["questions"] = 0
+    for batch in iter_batches(root, "questions", columns, batch_size=batch_size, **filters):
+        cursor.executemany(f"""
+            INSERT OR IGNORE INTO questions ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+        """, _rows(batch))
+        counts["questions"] += batch.num_rows
+
+    # survey_questions
+    cursor.execute("""
+        DELETE FROM survey_questions
+        WHERE survey_idx = (SELECT survey_idx FROM surveys WHERE survey_id = ?)
+    """, (survey_id,))
+    schema, _ = TABLES["survey_questions"]
+    counts["survey_questions"] = 0
+    for batch in iter_batches(root, "survey_questions", schema.names, batch_size=batch_size, **filters):
+        cursor.executemany("""
+            INSERT OR IGNORE INTO survey_questions (
+                survey_idx, question_idx, section_name, question_order,
+                is_required, scale_type, scale_labels
+            )
+            SELECT s.survey_idx, q.question_idx, ?2, ?3, ?4, ?5, ?6
+            FROM surveys s, questions q
+            WHERE s.survey_id = ?7 AND q.question_id = ?1
+        """, ((*row, survey_id) for row in _rows(batch)))
+        counts["survey_questions"] += batch.num_rows
+
+    # respondents (source respondent_id -> new respondent_id;
+    # surveys.actual_respondent_count follows by trigger)
+    delete_survey_responses(cursor, survey_id)
+    cursor.execute("DELETE FROM respondents WHERE survey_id = ?", (survey_id,))
+
+    schema, _ = TABLES["respondents"]
+    columns = schema.names[1:]
+    insert_sql = f"""
+        INSERT INTO respondents (survey_id, {', '.join(columns)})
+        VALUES (?, {', '.join('?' * len(columns))})
+    """
+    source_ids = []
+    for batch in iter_batches(root, "respondents", schema.names, batch_size=batch_size, **filters):
+        rows = list(_rows(batch))
+        cursor.executemany(insert_sql, ((survey_id, *values) for _, *values in rows))
+        source_ids.extend(row[0] for row in rows)
+
+    # respondent_id is AUTOINCREMENT and the survey had no respondents left,
+    # so its new ids ascend in insertion order
+    cursor.execute(
+        "SELECT respondent_id FROM respondents WHERE survey_id = ? ORDER BY respondent_id",
+        (survey_id,),
+    )
+    id_map = dict(zip(source_ids, (row[0] for row in cursor.fetchall())))
+    counts["respondents"] = len(source_ids)
+
+    # responses
+    writer = ResponseWriter(conn.cursor(), batch_size=batch_size)
+    schema, _ = TABLES["responses"]
+    counts["responses"] = 0
+    for batch in iter_batches(root, "responses", schema.names, batch_size=batch_size, **filters):
+        for source_id, question_no, value, text in _rows(batch):
+            if writer.add(id_map[source_id], question_no, value if value is not None else text):
+                counts["responses"] += 1
+    writer.flush()
+
+    return counts
+
+
+def import_surveys(
+    conn,
+    root,
+    survey_ids=None,
+    company_id=None,
+    survey_year=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """
+    Import exported surveys (one transaction per survey).
+
+    Args:
+        conn: Database connection
+        root: Export directory
+        survey_ids / company_id / survey_year: Partition filters
+        batch_size: Rows per batch
+
+    Returns:
+        Dict of table -> rows imported
+    """
+    migrate(conn)
+
+    found = read_table(
+        root, "surveys", columns=["survey_id"],
+        survey_ids=survey_ids, company_id=company_id, survey_year=survey_year,
+    )
+    found = sorted(set(found.column("survey_id").to_pylist()))
+
+    totals = {}
+    for survey_id in found:
+        try:
+            counts = import_survey(conn, root, survey_id, batch_size)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        for table, count in counts.items():
+            totals[table] = totals.get(table, 0) + count
+        print(f"  Imported {survey_id}: {counts.get('respondents', 0)} respondents, "
+              f"{counts.get('responses', 0)} responses")
+
+    # Cached response matrices of re-imported surveys are stale
+    matrix_cache = ResponseMatrixCache(conn)
+    for survey_id in found:
+        matrix_cache.invalidate(survey_id)
+
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar export/import of survey data")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("root", help="Export directory")
+    parser.add_argument("--db", help="Database path (default: db/masterdb.sqlite)")
+    parser.add_argument("--survey", action="append", dest="survey_ids", help="Survey ID (repeatable)")
+    parser.add_argument("--company", help="Company ID")
+    parser.add_argument("--year", type=int, help="Survey year")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        conn = get_connection(args.db, create_if_missing=False)
+        counts = export_surveys(
+            conn, args.root, args.survey_ids, args.company, args.year,
+            batch_size=args.batch_size,
+        )
+    else:
+        conn = get_connection(args.db, profile="bulk")
+        counts = import_surveys(
+            conn, args.root, args.survey_ids, args.company, args.year,
+            batch_size=args.batch_size,
+        )
+
+    for table, count in counts.items():
+        print(f"  {table}: {count:,} rows")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
 from db.connection import get_connection
+from db.migrations import migrate
 
 
 # Taxonomy term types
@@ -200,7 +201,7 @@ def create_question_tags(conn, term_id_map):
 
     # Get all questions with legacy categories
     cursor.execute("""
-        SELECT question_id, diagnosis_type, legacy_mid_category, legacy_sub_category
+        SELECT question_idx, diagnosis_type, legacy_mid_category, legacy_sub_category
         FROM questions
         WHERE legacy_mid_category IS NOT NULL OR legacy_sub_category IS NOT NULL
     """)
@@ -209,16 +210,16 @@ def create_question_tags(conn, term_id_map):
     tags_created = 0
 
     for q in questions:
-        question_id, diag_type, mid_cat, sub_cat = q
+        question_idx, diag_type, mid_cat, sub_cat = q
 
         # Tag with theme (diagnosis type)
         theme_id = term_id_map.get(f"THEME_{diag_type}")
         if theme_id:
             cursor.execute("""
                 INSERT OR IGNORE INTO question_tags
-                (question_id, term_id, tag_type, confidence, is_auto_tagged)
+                (question_idx, term_id, tag_type, confidence, is_auto_tagged)
                 VALUES (?, ?, 'themes', 1.0, 0)
-            """, (question_id, theme_id))
+            """, (question_idx, theme_id))
             tags_created += 1
 
         # Tag with concept (mid category)
@@ -227,9 +228,9 @@ def create_question_tags(conn, term_id_map):
             if concept_id:
                 cursor.execute("""
                     INSERT OR IGNORE INTO question_tags
-                    (question_id, term_id, tag_type, confidence, is_auto_tagged)
+                    (question_idx, term_id, tag_type, confidence, is_auto_tagged)
                     VALUES (?, ?, 'concepts', 1.0, 0)
-                """, (question_id, concept_id))
+                """, (question_idx, concept_id))
                 tags_created += 1
 
         # Tag with aspect (sub category)
@@ -238,23 +239,15 @@ def create_question_tags(conn, term_id_map):
             if aspect_id:
                 cursor.execute("""
                     INSERT OR IGNORE INTO question_tags
-                    (question_id, term_id, tag_type, confidence, is_auto_tagged)
+                    (question_idx, term_id, tag_type, confidence, is_auto_tagged)
                     VALUES (?, ?, 'aspects', 1.0, 0)
-                """, (question_id, aspect_id))
+                """, (question_idx, aspect_id))
                 tags_created += 1
 
+    # taxonomy.usage_count is maintained by trigger (migration step 5)
     conn.commit()
     print(f"  Created {tags_created} question tags")
 
-    # Update usage counts
-    print("\n[6] Updating Usage Counts...")
-    cursor.execute("""
-        UPDATE taxonomy SET usage_count = (
-            SELECT COUNT(*) FROM question_tags WHERE question_tags.term_id = taxonomy.term_id
-        )
-    """)
-    conn.commit()
-
     return tags_created
 
 
@@ -265,6 +258,7 @@ def run_taxonomy_init():
     print("=" * 60)
 
     conn = get_connection()
+    migrate(conn)  # counter triggers maintain taxonomy.usage_count
 
     # Initialize taxonomy
     term_id_map = init_taxonomy(conn)
@@ -18,6 +18,8 @@ import pandas as pd
 import numpy as np
 
 from db.connection import get_connection
+from db.migrations import migrate
+from tagging.embedding_index import store_quantized
 
 
 def load_questions_df():
@@ -86,7 +88,7 @@ def migrate_questions(conn, df):
                 "master_id": master_id,
                 "question_id": question_id,
                 "diagnosis_type": diagnosis_type,
-                "cluster_size": 1,  # Will be updated later
+                "cluster_size": 1,  # Set by trigger
             })
 
     # Insert questions
@@ -106,10 +108,9 @@ def migrate_questions(conn, df):
     # Insert master questions
     cursor.executemany("""
         INSERT INTO master_questions (
-            master_id, question_id, diagnosis_type, cluster_size
-        ) VALUES (
-            :master_id, :question_id, :diagnosis_type, :cluster_size
-        )
+            master_id, question_idx, diagnosis_type, cluster_size
+        ) SELECT :master_id, question_idx, :diagnosis_type, :cluster_size
+        FROM questions WHERE question_id = :question_id
     """, master_questions_data)
     print(f"  Inserted {len(master_questions_data)} master questions")
 
@@ -137,8 +138,8 @@ def update_master_references(conn, df, questions_data, master_questions_data):
                     break
 
     # Update questions with master_question_id
+    # (master_questions.cluster_size follows by trigger, see migration step 5)
     updates = []
-    cluster_sizes = {}  # master_id -> count
 
     for i, row in df.iterrows():
         key = (row["대분류"], row.get("cluster_id"))
@@ -147,21 +148,11 @@ def update_master_references(conn, df, questions_data, master_questions_data):
             question_id = questions_data[i]["question_id"]
             updates.append((master_id, question_id))
 
-            # Count cluster sizes
-            cluster_sizes[master_id] = cluster_sizes.get(master_id, 0) + 1
-
     cursor.executemany("""
         UPDATE questions SET master_question_id = ? WHERE question_id = ?
     """, updates)
     print(f"  Updated {len(updates)} master_question_id references")
 
-    # Update cluster sizes in master_questions
-    for master_id, size in cluster_sizes.items():
-        cursor.execute("""
-            UPDATE master_questions SET cluster_size = ? WHERE master_id = ?
-        """, (size, master_id))
-    print(f"  Updated cluster sizes for {len(cluster_sizes)} master questions")
-
 
 def migrate_embeddings(conn, df):
     """Migrate embeddings to database."""
@@ -181,15 +172,16 @@ def migrate_embeddings(conn, df):
     for idx in range(len(df)):
         question_id = generate_question_id(idx + 1)
         embedding_blob = embeddings[idx].astype(np.float32).tobytes()
-        data.append((question_id, embedding_blob))
+        data.append((embedding_blob, question_id))
 
     cursor.executemany("""
-        INSERT INTO embeddings (question_id, embedding)
-        VALUES (?, ?)
+        INSERT INTO embeddings (question_idx, embedding)
+        SELECT question_idx, ? FROM questions WHERE question_id = ?
     """, data)
     print(f"  Inserted {len(data)} embeddings")
 
     conn.commit()
+    print(f"  Quantized {store_quantized(conn)} embeddings (float16/int8)")
     return len(data)
 
 
@@ -206,6 +198,7 @@ def run_migration():
     # Connect to database
     print("\n2. Connecting to database...")
     conn = get_connection()
+    migrate(conn)
 
     # Check if already migrated
     cursor = conn.cursor()
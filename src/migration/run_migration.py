@@ -18,7 +18,9 @@ import pandas as pd
 import numpy as np
 
 from db.connection import get_connection, get_db_info
-from db.schema import create_all_tables, get_table_counts
+from db.schema import get_table_counts
+from db.migrations import migrate, get_schema_version
+from tagging.embedding_index import store_quantized
 
 
 def migrate_questions_and_embeddings(conn):
@@ -83,7 +85,7 @@ def migrate_questions_and_embeddings(conn):
                 master_id,
                 question_id,
                 diagnosis_type,
-                1,  # cluster_size placeholder
+                1,  # cluster_size placeholder (set by trigger)
             ))
 
     # Insert questions
@@ -100,25 +102,12 @@ def migrate_questions_and_embeddings(conn):
     # Insert master questions
     cursor.executemany("""
         INSERT INTO master_questions (
-            master_id, question_id, diagnosis_type, cluster_size
-        ) VALUES (?, ?, ?, ?)
-    """, master_questions_data)
+            master_id, question_idx, diagnosis_type, cluster_size
+        ) SELECT ?, question_idx, ?, ? FROM questions WHERE question_id = ?
+    """, [(m_id, dtype, size, qid) for m_id, qid, dtype, size in master_questions_data])
     print(f"  Inserted {len(master_questions_data)} master questions")
 
-    # Update cluster sizes
-    cluster_sizes = {}
-    for idx, row in df.iterrows():
-        key = (row.get("대분류", "OD"), row.get("cluster_id"))
-        master_id = cluster_to_master.get(key)
-        if master_id:
-            cluster_sizes[master_id] = cluster_sizes.get(master_id, 0) + 1
-
-    for master_id, size in cluster_sizes.items():
-        cursor.execute(
-            "UPDATE master_questions SET cluster_size = ? WHERE master_id = ?",
-            (size, master_id)
-        )
-    print(f"  Updated cluster sizes")
+    # cluster_size is set from the linked questions by trigger (migration step 5)
 
     # Migrate embeddings
     embeddings_count = 0
@@ -130,11 +119,11 @@ def migrate_questions_and_embeddings(conn):
         for idx in range(len(df)):
             question_id = f"Q_{idx + 1:05d}"
             embedding_blob = embeddings[idx].astype(np.float32).tobytes()
-            embeddings_data.append((question_id, embedding_blob))
+            embeddings_data.append((embedding_blob, question_id))
 
         cursor.executemany("""
-            INSERT INTO embeddings (question_id, embedding)
-            VALUES (?, ?)
+            INSERT INTO embeddings (question_idx, embedding)
+            SELECT question_idx, ? FROM questions WHERE question_id = ?
         """, embeddings_data)
         embeddings_count = len(embeddings_data)
         print(f"  Inserted {embeddings_count} embeddings")
@@ -142,6 +131,8 @@ def migrate_questions_and_embeddings(conn):
         print(f"  Warning: {npy_path} not found, skipping embeddings")
 
     conn.commit()
+    if embeddings_count:
+        print(f"  Quantized {store_quantized(conn)} embeddings (float16/int8)")
     return len(questions_data), len(master_questions_data), embeddings_count
 
 
@@ -251,10 +242,11 @@ def run_full_migration():
 
     # Get connection
     print("\n[1/4] Initializing database...")
-    conn = get_connection()
+    conn = get_connection(profile="bulk")
 
-    # Create tables (if not exist)
-    create_all_tables(conn)
+    # Create or upgrade tables in place
+    applied = migrate(conn)
+    print(f"  Schema version: {get_schema_version(conn)} ({len(applied)} steps applied)")
 
     # Check existing data
     counts = get_table_counts(conn)
@@ -279,6 +271,7 @@ def run_full_migration():
             cursor = conn.cursor()
             # Clear in reverse dependency order
             tables_to_clear = [
+                "response_values", "response_texts", "response_items", "respondents",
                 "scale_questions", "scales",
                 "question_tags", "taxonomy_relations", "taxonomy",
                 "embeddings", "survey_questions", "master_questions", "questions",
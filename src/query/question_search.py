@@ -15,7 +15,8 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
-from db.connection import get_connection
+from db.connection import get_reader
+from db.stats import get_stats
 from tagging.embedding_search import EmbeddingSearch
 
 
@@ -23,7 +24,7 @@ class QuestionSearch:
     """Search interface for questions."""
 
     def __init__(self, conn=None):
-        self.conn = conn or get_connection()
+        self.conn = conn or get_reader()
         self.embedding_search = EmbeddingSearch(self.conn)
 
     def search_by_text(
@@ -101,7 +102,7 @@ class QuestionSearch:
             SELECT DISTINCT q.question_id, q.question_text, q.diagnosis_type,
                    t.term, t.term_type, qt.confidence
             FROM questions q
-            JOIN question_tags qt ON q.question_id = qt.question_id
+            JOIN question_tags qt ON q.question_idx = qt.question_idx
             JOIN taxonomy t ON qt.term_id = t.term_id
             WHERE 1=1
         """
@@ -153,7 +154,7 @@ class QuestionSearch:
             SELECT m.master_id, m.diagnosis_type, m.cluster_size,
                    q.question_id, q.question_text
             FROM master_questions m
-            JOIN questions q ON m.question_id = q.question_id
+            JOIN questions q ON m.question_idx = q.question_idx
             WHERE m.master_id = ?
         """, (master_id,))
 
@@ -267,45 +268,19 @@ class QuestionSearch:
         return tree
 
     def get_statistics(self) -> dict:
-        """Get database statistics."""
-        cursor = self.conn.cursor()
-
-        stats = {}
+        """Get database statistics (cached counts, see db/stats.py)."""
+        stats_service = get_stats(self.conn)
 
         # Table counts
         tables = ["companies", "surveys", "questions", "master_questions",
                   "embeddings", "taxonomy", "question_tags"]
-        for table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            stats[table] = cursor.fetchone()[0]
+        stats = stats_service.table_counts(tables)
 
-        # Questions by diagnosis type
-        cursor.execute("""
-            SELECT diagnosis_type, COUNT(*) FROM questions
-            GROUP BY diagnosis_type ORDER BY COUNT(*) DESC
-        """)
-        stats["questions_by_type"] = dict(cursor.fetchall())
-
-        # Master questions by type
-        cursor.execute("""
-            SELECT diagnosis_type, COUNT(*) FROM master_questions
-            GROUP BY diagnosis_type ORDER BY COUNT(*) DESC
-        """)
-        stats["masters_by_type"] = dict(cursor.fetchall())
-
-        # Taxonomy terms by type
-        cursor.execute("""
-            SELECT term_type, COUNT(*) FROM taxonomy
-            GROUP BY term_type
-        """)
-        stats["taxonomy_by_type"] = dict(cursor.fetchall())
-
-        # Tags by type
-        cursor.execute("""
-            SELECT tag_type, COUNT(*) FROM question_tags
-            GROUP BY tag_type
-        """)
-        stats["tags_by_type"] = dict(cursor.fetchall())
+        # Questions / master questions by diagnosis type, terms and tags by type
+        stats["questions_by_type"] = stats_service.counts_by("questions", "diagnosis_type")
+        stats["masters_by_type"] = stats_service.counts_by("master_questions", "diagnosis_type")
+        stats["taxonomy_by_type"] = stats_service.counts_by("taxonomy", "term_type")
+        stats["tags_by_type"] = stats_service.counts_by("question_tags", "tag_type")
 
         return stats
 
@@ -0,0 +1,286 @@
+"""
+Survey Response Matrix Cache
+
+Keeps each survey's answers as a dense respondent × question int8 matrix
+on disk, next to masterdb.sqlite (db/response_matrix/), and memory-maps it.
+Survey-level means, distributions and correlations then become NumPy
+reductions instead of SQL joins and pandas pivots.
+
+Files per survey:
+- {survey_id}.{build}.int8       raw matrix (rows: respondents, cols: question_no)
+- {survey_id}.{build}.rows.npy   respondent_id of each row
+- {survey_id}.json               current build's files, columns, shape and the
+                                 stamp it was built from
+
+A cached matrix is rebuilt when the survey's respondents change (stamp
+mismatch, e.g. after a re-upload) or after invalidate(). A rebuild writes
+new files and replaces the .json last, so readers see either the old or
+the new matrix; the previous build is kept for readers that have just
+read the old .json.
+"""
+
+import sys
+import os
+import re
+import glob
+import json
+import itertools
+from pathlib import Path
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from db.connection import get_reader
+
+# Marks a missing answer (no row in response_values)
+MISSING = -128
+
+CACHE_DIR_NAME = "response_matrix"
+
+_build_numbers = itertools.count()
+
+
+class ResponseMatrix:
+    """Dense respondent × question matrix for one survey."""
+
+    def __init__(self, survey_id, values, respondent_ids, question_nos):
+        self.survey_id = survey_id
+        self.values = values                    # int8 (n_respondents, n_questions)
+        self.respondent_ids = respondent_ids    # int64 (n_respondents,)
+        self.question_nos = question_nos        # list of str
+        self._col_index = {q: i for i, q in enumerate(question_nos)}
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def mask(self) -> np.ndarray:
+        """True where an answer exists."""
+        return self.values != MISSING
+
+    def column(self, question_no: str) -> np.ndarray:
+        """Answers to one question (missing answers dropped)."""
+        col = self.values[:, self._col_index[question_no]]
+        return col[col != MISSING]
+
+    def as_float(self) -> np.ndarray:
+        """float32 copy with NaN for missing answers."""
+        out = self.values.astype(np.float32)
+        out[~self.mask] = np.nan
+        return out
+
+    def counts(self) -> dict:
+        """Number of answers per question."""
+        counts = self.mask.sum(axis=0)
+        return dict(zip(self.question_nos, counts.tolist()))
+
+    def means(self) -> dict:
+        """Mean answer per question."""
+        mask = self.mask
+        n = mask.sum(axis=0)
+        sums = np.where(mask, self.values, 0).sum(axis=0, dtype=np.int64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / n
+        return dict(zip(self.question_nos, means.tolist()))
+
+    def distributions(self, scale_min: int = 1, scale_max: int = 5) -> dict:
+        """Answer counts per scale point, per question."""
+        result = {}
+        for i, question_no in enumerate(self.question_nos):
+            col = self.values[:, i]
+            col = col[(col >= scale_min) & (col <= scale_max)].astype(np.int64)
+            counts = np.bincount(col - scale_min, minlength=scale_max - scale_min + 1)
+            result[question_no] = {
+                scale_min + k: int(c) for k, c in enumerate(counts)
+            }
+        return result
+
+    def correlations(self) -> np.ndarray:
+        """
+        Pearson correlation between questions (pairwise-complete).
+
+        Returns:
+            (n_questions, n_questions) float64 array, NaN where undefined
+        """
+        mask = self.mask.astype(np.float64)
+        x = np.where(self.mask, self.values, 0).astype(np.float64)
+
+        n = mask.T @ mask
+        sx = x.T @ mask              # sum of x_i over rows where j also answered
+        sxx = (x * x).T @ mask
+        sxy = x.T @ x
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = sxy - sx * sx.T / n
+            var_i = sxx - sx * sx / n
+            corr = cov / np.sqrt(var_i * var_i.T)
+        return corr
+
+
+class ResponseMatrixCache:
+    """On-disk cache of ResponseMatrix per survey."""
+
+    def __init__(self, conn=None, cache_dir=None):
+        self.conn = conn or get_reader()
+        if cache_dir is None:
+            db_file = self.conn.execute("PRAGMA database_list").fetchone()[2]
+            cache_dir = Path(db_file).parent / CACHE_DIR_NAME
+        self.cache_dir = Path(cache_dir)
+
+    def _meta_path(self, survey_id):
+        return self.cache_dir / f"{survey_id}.json"
+
+    def _stamp(self, survey_id) -> list:
+        """Identify the survey's current respondent set.
+
+        respondent_id is AUTOINCREMENT, so a re-upload always changes it.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*), MIN(respondent_id), MAX(respondent_id)
+            FROM respondents WHERE survey_id = ?
+        """, (survey_id,))
+        return list(cursor.fetchone())
+
+    def get(self, survey_id: str) -> ResponseMatrix:
+        """Get a survey's matrix, rebuilding it if missing or stale."""
+        meta = self._read_meta(survey_id)
+        if meta is not None and meta["stamp"] == self._stamp(survey_id):
+            try:
+                return self._open(survey_id, meta)
+            except FileNotFoundError:
+                # Two rebuilds since the meta was read; ours is gone
+                pass
+
+        return self.build(survey_id)
+
+    def _open(self, survey_id, meta) -> ResponseMatrix:
+        shape = tuple(meta["shape"])
+        if shape[0] * shape[1] == 0:
+            values = np.full(shape, MISSING, dtype=np.int8)
+        else:
+            values = np.memmap(self.cache_dir / meta["values"], dtype=np.int8, mode="r", shape=shape)
+        respondent_ids = np.load(self.cache_dir / meta["rows"])
+        return ResponseMatrix(survey_id, values, respondent_ids, meta["question_nos"])
+
+    def build(self, survey_id: str) -> ResponseMatrix:
+        """Build (or rebuild) the cached matrix for a survey."""
+        cursor = self.conn.cursor()
+        stamp = self._stamp(survey_id)
+
+        cursor.execute("""
+            SELECT respondent_id FROM respondents
+            WHERE survey_id = ? ORDER BY respondent_id
+        """, (survey_id,))
+        respondent_ids = np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+
+        cursor.execute("""
+            SELECT DISTINCT i.item_idx, i.question_no
+            FROM respondents r
+            JOIN response_values v ON v.respondent_id = r.respondent_id
+            JOIN response_items i ON i.item_idx = v.item_idx
+            WHERE r.survey_id = ?
+            ORDER BY i.question_no
+        """, (survey_id,))
+        items = cursor.fetchall()
+        item_ids = np.array([row[0] for row in items], dtype=np.int64)
+        question_nos = [row[1] for row in items]
+
+        values = np.full((len(respondent_ids), len(item_ids)), MISSING, dtype=np.int8)
+        if len(item_ids):
+            item_order = np.argsort(item_ids)
+            sorted_items = item_ids[item_order]
+
+            cursor.execute("""
+                SELECT v.respondent_id, v.item_idx, v.value
+                FROM respondents r
+                JOIN response_values v ON v.respondent_id = r.respondent_id
+                WHERE r.survey_id = ?
+            """, (survey_id,))
+            while True:
+                chunk = cursor.fetchmany(100000)
+                if not chunk:
+                    break
+                arr = np.array(chunk, dtype=np.int64)
+                # Values outside int8 are not scale answers; leave them missing
+                arr = arr[(arr[:, 2] > MISSING) & (arr[:, 2] <= 127)]
+                rows = np.searchsorted(respondent_ids, arr[:, 0])
+                cols = item_order[np.searchsorted(sorted_items, arr[:, 1])]
+                values[rows, cols] = arr[:, 2]
+
+        meta = self._write(survey_id, values, respondent_ids, question_nos, stamp)
+        return self._open(survey_id, meta)
+
+    def _read_meta(self, survey_id):
+        """The survey's current meta, or None if missing or in an older format."""
+        try:
+            with open(self._meta_path(survey_id), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        return meta if "values" in meta else None
+
+    def _builds(self, survey_id) -> list:
+        """Data and rows files of all builds of a survey."""
+        pattern = re.compile(re.escape(survey_id) + r"\.[\w-]+\.(int8|rows\.npy)")
+        return [
+            path for path in self.cache_dir.glob(f"{glob.escape(survey_id)}.*")
+            if pattern.fullmatch(path.name)
+        ]
+
+    def _write(self, survey_id, values, respondent_ids, question_nos, stamp) -> dict:
+        """
+        Write a new build and switch the meta to it.
+
+        Data and rows go to files named after the build, so a reader that
+        loaded the previous meta still finds matching files; the meta is
+        replaced last.
+
+        Returns:
+            The new meta
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Unique per writer, so concurrent builds never share a file
+        build = "-".join(str(part or 0) for part in stamp) + f"-{os.getpid()}-{next(_build_numbers)}"
+        previous = self._read_meta(survey_id)
+
+        meta = {
+            "survey_id": survey_id,
+            "values": f"{survey_id}.{build}.int8",
+            "rows": f"{survey_id}.{build}.rows.npy",
+            "shape": list(values.shape),
+            "question_nos": question_nos,
+            "missing": MISSING,
+            "stamp": stamp,
+        }
+        values.tofile(self.cache_dir / meta["values"])
+        with open(self.cache_dir / meta["rows"], "wb") as f:
+            np.save(f, respondent_ids)
+
+        meta_path = self._meta_path(survey_id)
+        tmp_meta = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_meta, meta_path)
+
+        # Keep this build and the previous one, drop older ones
+        keep = {meta["values"], meta["rows"]}
+        if previous is not None:
+            keep |= {previous["values"], previous["rows"]}
+        self._remove([path for path in self._builds(survey_id) if path.name not in keep])
+        return meta
+
+    @staticmethod
+    def _remove(paths):
+        for path in paths:
+            try:
+                path.unlink(missing_ok=True)
+            except PermissionError:
+                # Still mapped by a reader (Windows); a later build removes it
+                pass
+
+    def invalidate(self, survey_id: str):
+        """Drop a survey's cached matrix (e.g. after a re-upload)."""
+        self._remove([self._meta_path(survey_id)] + self._builds(survey_id))
@@ -0,0 +1,320 @@
+"""
+Approximate Nearest-Neighbour Index (IVF)
+
+Inverted-file index over the unit-normalized embedding matrix, for
+corpora where scoring every row per query gets too slow:
+
+- train: spherical k-means splits the vectors into n_lists cells
+- search: a query scores the centroids, then only the rows of the
+  nprobe closest cells (more cells probed = higher recall, slower)
+
+Rows are identified by their position in the embedding matrix, so the
+index is just the centroids plus the cell of each row. It is saved next
+to the embedding sidecar (ivf.npz) and kept while the centroids still
+fit the data: when the embeddings change, rows are re-assigned to the
+existing cells, and only a corpus that grew past RETRAIN_GROWTH times
+the training size is re-trained.
+
+Benchmark recall@k against exact search:
+
+    python src/tagging/ann_index.py --queries 200 --top-k 10
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from tagging.embedding_index import normalize_rows
+
+IVF_FILE_NAME = "ivf.npz"
+
+# k-means settings
+DEFAULT_TRAIN_ITER = 10
+TRAIN_POINTS_PER_LIST = 64
+
+# Re-train once the corpus is this many times the size trained on
+RETRAIN_GROWTH = 2.0
+
+# Rows scored per block when assigning rows to cells
+ASSIGN_BLOCK = 8192
+
+
+def default_n_lists(n: int) -> int:
+    """Number of cells for n vectors (~4 sqrt(n))."""
+    return max(1, int(round(4 * np.sqrt(n))))
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Cell (highest cosine centroid) of each vector."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+class IVFIndex:
+    """Inverted-file ANN index over the rows of an embedding matrix."""
+
+    def __init__(self, centroids, assignments, trained_rows=None, version=None):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)   # cell of each row
+        self.trained_rows = len(self.assignments) if trained_rows is None else trained_rows
+        self.version = version      # embedding version the rows were assigned at
+        self._lists = None          # (rows sorted by cell, cell offsets)
+
+    def __len__(self):
+        return len(self.assignments)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, vectors, n_lists=None, n_iter=DEFAULT_TRAIN_ITER, seed=0, version=None):
+        """
+        Train cells with spherical k-means and assign every row.
+
+        Args:
+            vectors: Unit-normalized (n, dim) matrix
+            n_lists: Number of cells (default: default_n_lists(n))
+            n_iter: k-means iterations
+            seed: Random seed (sampling and initial centroids)
+            version: Embedding version to record
+
+        Returns:
+            IVFIndex
+        """
+        n = len(vectors)
+        if n == 0:
+            dim = vectors.shape[1] if vectors.ndim == 2 else 0
+            return cls(np.empty((0, dim), dtype=np.float32), [], 0, version)
+
+        n_lists = min(n_lists or default_n_lists(n), n)
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, n_lists * TRAIN_POINTS_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            labels = nearest_centroids(sample, centroids)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=n_lists)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+            # Empty cells restart from random sample points
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+            centroids = normalize_rows(sums)
+
+        return cls(centroids, nearest_centroids(vectors, centroids), n, version)
+
+    def add(self, vectors) -> np.ndarray:
+        """
+        Append rows (e.g. new embeddings at the end of the matrix).
+
+        Returns:
+            Cells the new rows were assigned to
+        """
+        labels = nearest_centroids(vectors, self.centroids)
+        self.assignments = np.concatenate((self.assignments, labels))
+        self._lists = None
+        return labels
+
+    def update(self, rows, vectors):
+        """Re-assign existing rows whose vectors changed."""
+        self.assignments[np.asarray(rows, dtype=np.int64)] = nearest_centroids(vectors, self.centroids)
+        self._lists = None
+
+    def reassign(self, vectors):
+        """Re-assign every row of a changed matrix to the existing cells."""
+        self.assignments = nearest_centroids(vectors, self.centroids)
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            rows = np.argsort(self.assignments, kind="stable")
+            counts = np.bincount(self.assignments, minlength=self.n_lists)
+            self._lists = rows, np.concatenate(([0], np.cumsum(counts)))
+        return self._lists
+
+    def probe(self, queries: np.ndarray, nprobe: int) -> list:
+        """
+        Candidate rows of each query.
+
+        Args:
+            queries: Unit-normalized (m, dim) query matrix
+            nprobe: Number of closest cells to scan per query
+
+        Returns:
+            One ascending int64 array of row numbers per query
+        """
+        if self.n_lists == 0:
+            return [np.empty(0, dtype=np.int64) for _ in range(len(queries))]
+
+        rows, offsets = self._inverted_lists()
+        nprobe = min(nprobe, self.n_lists)
+        cell_scores = np.asarray(queries, dtype=np.float32) @ self.centroids.T
+        if nprobe < self.n_lists:
+            cells = np.argpartition(-cell_scores, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            cells = np.broadcast_to(np.arange(self.n_lists), cell_scores.shape)
+
+        candidates = []
+        for query_cells in cells:
+            parts = [rows[offsets[c]:offsets[c + 1]] for c in query_cells]
+            candidates.append(np.sort(np.concatenate(parts)))
+        return candidates
+
+    def save(self, path):
+        """Write the index atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                assignments=self.assignments,
+                trained_rows=np.int64(self.trained_rows),
+                version=np.array(json.dumps(self.version)),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a saved index (None if missing)."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(
+                data["centroids"],
+                data["assignments"],
+                int(data["trained_rows"]),
+                json.loads(str(data["version"])),
+            )
+
+    @classmethod
+    def open_or_train(cls, vectors, path=None, version=None, n_lists=None):
+        """
+        Load the saved index for vectors, refreshing or re-training it as needed.
+
+        Args:
+            vectors: Unit-normalized (n, dim) matrix the index covers
+            path: Saved index file (None = in memory only)
+            version: Current embedding version (see embedding_index)
+            n_lists: Number of cells when training
+
+        Returns:
+            IVFIndex
+        """
+        index = cls.load(path) if path is not None else None
+        if index is not None:
+            if (index.centroids.shape[1:] != vectors.shape[1:]
+                    or len(vectors) > RETRAIN_GROWTH * max(index.trained_rows, 1)):
+                index = None
+            elif index.version != version or len(index) != len(vectors):
+                index.reassign(vectors)
+                index.version = version
+                index.save(path)
+
+        if index is None:
+            index = cls.train(vectors, n_lists=n_lists, version=version)
+            if path is not None:
+                index.save(path)
+        return index
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def benchmark(searcher, n_queries=200, top_k=10, nprobes=(1, 2, 4, 8, 16, 32, 64), seed=0):
+    """
+    Measure recall@k and latency of IVF search against exact search.
+
+    Queries are corpus questions (searching for their neighbours).
+
+    Args:
+        searcher: EmbeddingSearch
+        n_queries: Number of sampled query questions
+        top_k: k of recall@k
+        nprobes: nprobe values to measure
+
+    Returns:
+        List of dicts (nprobe, recall, ms_per_query), first entry exact search
+    """
+    searcher._load_embeddings()
+    question_ids = searcher._question_ids_cache
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(question_ids), min(n_queries, len(question_ids)), replace=False)
+    queries = [question_ids[i] for i in picked]
+
+    saved = searcher.ann, searcher.nprobe
+    try:
+        searcher.ann = False
+        start = time.perf_counter()
+        exact = searcher.search_similar_many(queries, top_k)
+        results = [{
+            "nprobe": None,
+            "recall": 1.0,
+            "ms_per_query": (time.perf_counter() - start) * 1000 / len(queries),
+        }]
+
+        searcher.ann = True
+        searcher.load_ann_index()
+        for nprobe in nprobes:
+            searcher.nprobe = nprobe
+            start = time.perf_counter()
+            approx = searcher.search_similar_many(queries, top_k)
+            elapsed = time.perf_counter() - start
+
+            hits = total = 0
+            for truth, found in zip(exact, approx):
+                truth_ids = {qid for qid, _ in truth}
+                hits += len(truth_ids & {qid for qid, _ in found})
+                total += len(truth_ids)
+            results.append({
+                "nprobe": nprobe,
+                "recall": hits / total if total else 1.0,
+                "ms_per_query": elapsed * 1000 / len(queries),
+            })
+    finally:
+        searcher.ann, searcher.nprobe = saved
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF recall@k benchmark against exact search")
+    parser.add_argument("--queries", type=int, default=200, help="Number of query questions")
+    parser.add_argument("--top-k", type=int, default=10, help="k of recall@k")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    from tagging.embedding_search import EmbeddingSearch
+
+    searcher = EmbeddingSearch()
+    results = benchmark(searcher, args.queries, args.top_k, args.nprobe)
+
+    index = searcher.load_ann_index()
+    print(f"\n[IVF] {len(index):,} rows, {index.n_lists} cells")
+    print(f"  {'nprobe':>8}  {'recall@' + str(args.top_k):>10}  {'ms/query':>9}")
+    for r in results:
+        label = "exact" if r["nprobe"] is None else str(r["nprobe"])
+        print(f"  {label:>8}  {r['recall']:>10.3f}  {r['ms_per_query']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,23 +8,86 @@ Automatically suggests taxonomy tags for questions based on:
 """
 
 import sys
+import json
 from pathlib import Path
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
-from db.connection import get_connection
+from db.connection import get_pool, get_snapshot_connection
 from tagging.embedding_search import EmbeddingSearch
+from tagging.tag_matrix import TagMatrix, TAG_TYPES
+from tagging.suggestion_cache import SuggestionCache
+
+# suggest_from_similar defaults (used by suggest_tags)
+SIMILAR_TOP_K = 5
+SIMILAR_MIN_SIMILARITY = 0.7
+
+# Target questions voted on together (dense scores: block x terms per tag type)
+VOTE_BLOCK = 1024
+
+# Target questions per task (and per write transaction) in bulk tagging
+SHARD_SIZE = 2048
+
+# AutoTagger of a worker process (set by _init_worker)
+_worker_tagger = None
+
+
+def _init_worker(db_path):
+    global _worker_tagger
+    _worker_tagger = AutoTagger(get_snapshot_connection(db_path))
+
+
+def _shard_votes(question_ids):
+    return _worker_tagger._similar_votes(question_ids)
+
+
+def empty_tags() -> dict:
+    """Tags by type, as returned by get_question_tags."""
+    return {"themes": [], "concepts": [], "aspects": []}
+
+
+def _add_tag(tags: dict, term_id, term, term_type, tag_type, confidence):
+    if tag_type in tags:
+        tags[tag_type].append({
+            "term_id": term_id,
+            "term": term,
+            "term_type": term_type,
+            "confidence": confidence,
+        })
 
 
 class AutoTagger:
     """Automatic taxonomy tagging for questions."""
 
     def __init__(self, conn=None):
-        self.conn = conn or get_connection()
+        # Without an explicit connection, read through the calling thread's
+        # pooled reader and write through the pool's single writer.
+        self._pool = None if conn else get_pool()
+        self.conn = conn or self._pool.reader()
         self.searcher = EmbeddingSearch(self.conn)
         self._term_cache = None
+        self._tag_matrix = None
+        self.suggestion_cache = SuggestionCache(self.conn, SIMILAR_TOP_K, SIMILAR_MIN_SIMILARITY)
+
+    @contextmanager
+    def _write(self):
+        """Write transaction on the writer connection."""
+        if self._pool is None:
+            try:
+                yield self.conn
+            except Exception:
+                self.conn.rollback()
+                raise
+            else:
+                self.conn.commit()
+        else:
+            with self._pool.write() as conn:
+                yield conn
 
     def _load_terms(self):
         """Load taxonomy terms into cache."""
@@ -49,28 +112,23 @@ class AutoTagger:
         cursor = self.conn.cursor()
         cursor.execute("""
             SELECT t.term_id, t.term, t.term_type, qt.tag_type, qt.confidence
-            FROM question_tags qt
+            FROM questions q
+            JOIN question_tags qt ON qt.question_idx = q.question_idx
             JOIN taxonomy t ON qt.term_id = t.term_id
-            WHERE qt.question_id = ?
+            WHERE q.question_id = ?
+            ORDER BY qt.id
         """, (question_id,))
 
-        tags = {"themes": [], "concepts": [], "aspects": []}
+        tags = empty_tags()
         for row in cursor.fetchall():
-            tag_type = row[3]
-            if tag_type in tags:
-                tags[tag_type].append({
-                    "term_id": row[0],
-                    "term": row[1],
-                    "term_type": row[2],
-                    "confidence": row[4],
-                })
+            _add_tag(tags, *row)
         return tags
 
     def suggest_from_similar(
         self,
         question_id: str,
-        top_k: int = 5,
-        min_similarity: float = 0.7,
+        top_k: int = SIMILAR_TOP_K,
+        min_similarity: float = SIMILAR_MIN_SIMILARITY,
     ) -> dict:
         """
         Suggest tags based on similar questions' tags.
@@ -90,6 +148,18 @@ class AutoTagger:
             same_diagnosis_only=True,
         )
 
+        return self._similar_suggestions(similar, self.get_question_tags, top_k, min_similarity)
+
+    @staticmethod
+    def _similar_suggestions(similar, get_tags, top_k, min_similarity) -> dict:
+        """
+        Vote similar questions' tags into suggestions.
+
+        Args:
+            similar: search_by_question results, most similar first
+            get_tags: question_id -> tags (as for get_question_tags)
+            top_k / min_similarity: As for suggest_from_similar
+        """
         # Collect tags from similar questions
         tag_votes = {
             "themes": Counter(),
@@ -102,7 +172,7 @@ class AutoTagger:
             if similarity < min_similarity:
                 continue
 
-            sim_tags = self.get_question_tags(sim_qid)
+            sim_tags = get_tags(sim_qid)
             for tag_type, tags in sim_tags.items():
                 for tag in tags:
                     key = (tag["term_id"], tag["term"])
@@ -155,7 +225,10 @@ class AutoTagger:
 
         # Get representative question
         cursor.execute("""
-            SELECT question_id FROM master_questions WHERE master_id = ?
+            SELECT q.question_id
+            FROM master_questions m
+            JOIN questions q ON q.question_idx = m.question_idx
+            WHERE m.master_id = ?
         """, (master_id,))
         rep_row = cursor.fetchone()
 
@@ -165,9 +238,11 @@ class AutoTagger:
         rep_question_id = rep_row[0]
 
         # Get representative's tags
-        rep_tags = self.get_question_tags(rep_question_id)
+        return self._cluster_suggestions(self.get_question_tags(rep_question_id))
 
-        # Convert to suggestions
+    @staticmethod
+    def _cluster_suggestions(rep_tags: dict) -> dict:
+        """Convert a cluster representative's tags to suggestions."""
         suggestions = {}
         for tag_type, tags in rep_tags.items():
             suggestions[tag_type] = []
@@ -194,6 +269,14 @@ class AutoTagger:
         - Similar questions (embedding-based)
         - Cluster representative
         """
+        existing = self.get_question_tags(question_id)
+        cluster_suggestions = self.suggest_from_cluster(question_id) if include_cluster else {}
+        similar_suggestions = self.suggest_from_similar(question_id) if include_similar else {}
+        return self._merge_suggestions(existing, cluster_suggestions, similar_suggestions)
+
+    @staticmethod
+    def _merge_suggestions(existing, cluster_suggestions, similar_suggestions) -> dict:
+        """Combine cluster and similarity suggestions, skipping terms already used."""
         all_suggestions = {
             "themes": [],
             "concepts": [],
@@ -201,34 +284,291 @@ class AutoTagger:
         }
 
         # Existing tags
-        existing = self.get_question_tags(question_id)
         existing_ids = set()
         for tag_type in existing:
             for tag in existing[tag_type]:
                 existing_ids.add(tag["term_id"])
 
         # Cluster-based suggestions
-        if include_cluster:
-            cluster_suggestions = self.suggest_from_cluster(question_id)
-            for tag_type, tags in cluster_suggestions.items():
-                for tag in tags:
-                    if tag["term_id"] not in existing_ids:
-                        tag["source"] = "cluster"
-                        all_suggestions[tag_type].append(tag)
-                        existing_ids.add(tag["term_id"])
+        for tag_type, tags in cluster_suggestions.items():
+            for tag in tags:
+                if tag["term_id"] not in existing_ids:
+                    tag["source"] = "cluster"
+                    all_suggestions[tag_type].append(tag)
+                    existing_ids.add(tag["term_id"])
 
         # Similarity-based suggestions
-        if include_similar:
-            similar_suggestions = self.suggest_from_similar(question_id)
-            for tag_type, tags in similar_suggestions.items():
-                for tag in tags:
-                    if tag["term_id"] not in existing_ids:
-                        tag["source"] = "similar"
-                        all_suggestions[tag_type].append(tag)
-                        existing_ids.add(tag["term_id"])
+        for tag_type, tags in similar_suggestions.items():
+            for tag in tags:
+                if tag["term_id"] not in existing_ids:
+                    tag["source"] = "similar"
+                    all_suggestions[tag_type].append(tag)
+                    existing_ids.add(tag["term_id"])
 
         return all_suggestions
 
+    # ============================================================
+    # BULK TAGGING
+    # ============================================================
+
+    def _cluster_representatives(self, question_ids: list) -> dict:
+        """
+        Representatives whose tags suggest_from_cluster would use.
+
+        Returns:
+            {question_id: representative question_id}
+        """
+        cursor = self.conn.cursor()
+        representatives = {}
+        for start in range(0, len(question_ids), 500):
+            chunk = question_ids[start:start + 500]
+            cursor.execute(f"""
+                SELECT q.question_id, rep.question_id
+                FROM questions q
+                JOIN master_questions m ON m.master_id = q.master_question_id
+                JOIN questions rep ON rep.question_idx = m.question_idx
+                WHERE q.question_id IN ({', '.join('?' * len(chunk))})
+                AND q.master_question_id != ''
+                AND NOT COALESCE(q.is_representative, 0)
+            """, chunk)
+            representatives.update(cursor.fetchall())
+        return representatives
+
+    def load_tag_matrix(self) -> TagMatrix:
+        """Get the in-memory tag matrix, reloaded if question_tags changed elsewhere."""
+        if self._tag_matrix is None:
+            self._tag_matrix = TagMatrix(self.conn)
+        self._tag_matrix.refresh()
+        return self._tag_matrix
+
+    def _similar_suggestions_many(self, similar: list, top_k, min_similarity) -> list:
+        """
+        _similar_suggestions for many questions from the tag matrix.
+
+        Args:
+            similar: search_by_question results of each question
+
+        Returns:
+            One suggestions dict (as for suggest_from_similar) per question
+        """
+        matrix = self._tag_matrix
+        matrix.ensure_rows(qid for results in similar for qid, *_ in results)
+        k = max([len(results) for results in similar] + [1])
+        results = []
+
+        for start in range(0, len(similar), VOTE_BLOCK):
+            block = similar[start:start + VOTE_BLOCK]
+            neighbours = np.full((len(block), k), -1, dtype=np.int64)
+            similarities = np.zeros((len(block), k))
+            for i, found in enumerate(block):
+                for rank, (sim_qid, _, similarity, _) in enumerate(found):
+                    if similarity >= min_similarity:
+                        neighbours[i, rank] = matrix.row(sim_qid)
+                        similarities[i, rank] = similarity
+
+            votes = matrix.neighbour_votes(neighbours, similarities)
+            block_results = [{} for _ in block]
+            weights = similarities.tolist()
+            for tag_type in TAG_TYPES:
+                scores = votes["scores"][tag_type]
+                first_rank, first_order = votes["first"][tag_type]
+                rows, cols = np.nonzero(votes["votes"][tag_type])
+                # Per question: highest score first, ties in order of first
+                # vote (as Counter.most_common); the best 5 are kept
+                order = np.lexsort((
+                    first_order[rows, cols], first_rank[rows, cols], -scores[rows, cols], rows,
+                ))
+                rows, cols = rows[order], cols[order]
+                group_start = np.searchsorted(rows, rows)
+                keep = np.arange(len(rows)) - group_start < 5
+                rows, cols = rows[keep], cols[keep]
+                rank_votes = votes["rank_votes"][:, rows, cols].T.tolist()
+
+                for suggestions in block_results:
+                    suggestions[tag_type] = []
+                for i, col, score, per_rank in zip(
+                    rows.tolist(), cols.tolist(), scores[rows, cols].tolist(), rank_votes
+                ):
+                    term_weights = [
+                        weight for weight, n in zip(weights[i], per_rank) for _ in range(n)
+                    ]
+                    block_results[i][tag_type].append({
+                        "term_id": matrix.term_ids[col],
+                        "term": matrix.terms[col][0],
+                        "confidence": min(score / top_k, 1.0),
+                        "avg_similarity": sum(term_weights) / len(term_weights),
+                        "vote_count": len(term_weights),
+                    })
+            results.extend(block_results)
+        return results
+
+    def _similar_votes(self, question_ids: list):
+        """
+        Similar questions and similarity suggestions of questions.
+
+        Returns:
+            (search_by_question results, suggest_from_similar results),
+            one per question
+        """
+        self.load_tag_matrix()
+        found = self.searcher.search_by_questions(
+            question_ids, top_k=SIMILAR_TOP_K, same_diagnosis_only=True,
+        )
+        return found, self._similar_suggestions_many(found, SIMILAR_TOP_K, SIMILAR_MIN_SIMILARITY)
+
+    def _similar_shards(self, question_ids: list, workers: int = 1):
+        """
+        Yield (question_ids, similar, votes) per shard of SHARD_SIZE questions, in order.
+
+        With workers > 1 shards are computed in a process pool. Workers
+        read the database through snapshot connections and memory-map the
+        embedding sidecar; only this process writes.
+        """
+        shards = [question_ids[i:i + SHARD_SIZE] for i in range(0, len(question_ids), SHARD_SIZE)]
+        db_file = self.conn.execute("PRAGMA database_list").fetchone()[2]
+
+        if workers <= 1 or len(shards) <= 1 or not db_file:
+            for shard in shards:
+                yield (shard, *self._similar_votes(shard))
+            return
+
+        # Build the sidecar here, so workers only open it
+        self.searcher._load_embeddings()
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(shards)),
+            initializer=_init_worker,
+            initargs=(db_file,),
+        ) as pool:
+            for shard, (found, votes) in zip(shards, pool.map(_shard_votes, shards)):
+                yield shard, found, votes
+
+    def _bulk_state(
+        self, question_ids: list, include_similar=True, include_cluster=True, use_cache=False,
+    ) -> dict:
+        """
+        Load what suggest_tags reads for many questions, except similar
+        questions and their votes (filled in per shard, see _similar_shards).
+
+        With use_cache (and all suggestion sources), stored suggestions that
+        are still valid are loaded too (see suggestion_cache); only the
+        other questions need a search.
+
+        Returns:
+            Dict of the tag matrix, cluster representatives, similar
+            questions and similarity suggestions of each question, and
+            stored suggestions (JSON) of the cached questions
+        """
+        use_cache = use_cache and include_similar and include_cluster
+        # Versions first: whatever is read next is at least this recent
+        versions = self.suggestion_cache.versions() if use_cache else None
+
+        matrix = self.load_tag_matrix()
+        matrix.ensure_rows(question_ids)
+        state = {
+            "matrix": matrix,
+            "representatives": self._cluster_representatives(question_ids) if include_cluster else {},
+            "similar": {},
+            "votes": {},
+            "cached": {},
+            "versions": versions,
+            "include_similar": include_similar,
+            "include_cluster": include_cluster,
+        }
+        if use_cache:
+            entries = self.suggestion_cache.load(question_ids, self.searcher)
+            for qid, entry in entries.items():
+                state["cached"][qid] = entry["suggestions"]
+                state["similar"][qid] = [(sim_qid, None, sim, None) for sim_qid, sim in entry["neighbours"]]
+            if entries:
+                with self._write() as conn:
+                    self.suggestion_cache.restamp(conn, list(entries.values()), versions)
+        return state
+
+    def _store_suggestions(self, state: dict, results: list):
+        """Store (question_id, suggestions) computed from a _bulk_state using the cache."""
+        if state["versions"] is None or not results:
+            return
+        with self._write() as conn:
+            self.suggestion_cache.store(conn, [
+                (
+                    qid, suggestions,
+                    [(sim_qid, similarity) for sim_qid, _, similarity, _ in state["similar"][qid]],
+                    state["representatives"].get(qid),
+                )
+                for qid, suggestions in results
+            ], state["versions"])
+
+    def _bulk_suggest(self, state: dict, question_id: str, changed=()) -> dict:
+        """
+        suggest_tags for one question from a _bulk_state.
+
+        Args:
+            changed: Questions tagged since the state was loaded; votes of
+                their neighbours are recounted
+        """
+        matrix = state["matrix"]
+        rep_question_id = state["representatives"].get(question_id)
+
+        cached = state["cached"].get(question_id)
+        if cached is not None:
+            inputs = [question_id, rep_question_id] + [sim_qid for sim_qid, *_ in state["similar"][question_id]]
+            if not any(qid in changed for qid in inputs):
+                return json.loads(cached)
+
+        cluster_suggestions = {}
+        if state["include_cluster"] and rep_question_id is not None:
+            cluster_suggestions = self._cluster_suggestions(matrix.question_tags(rep_question_id))
+
+        similar_suggestions = {}
+        if state["include_similar"]:
+            similar = state["similar"][question_id]
+            if question_id not in state["votes"] or any(sim_qid in changed for sim_qid, *_ in similar):
+                similar_suggestions = self._similar_suggestions(
+                    similar, matrix.question_tags, SIMILAR_TOP_K, SIMILAR_MIN_SIMILARITY,
+                )
+            else:
+                similar_suggestions = state["votes"][question_id]
+        return self._merge_suggestions(
+            matrix.question_tags(question_id), cluster_suggestions, similar_suggestions
+        )
+
+    def suggest_tags_many(
+        self,
+        question_ids: list,
+        include_similar: bool = True,
+        include_cluster: bool = True,
+        workers: int = 1,
+        use_cache: bool = True,
+    ) -> list:
+        """
+        suggest_tags for many questions.
+
+        Tags come from the in-memory tag matrix, cluster representatives
+        and similar questions from a few queries and batched searches, and
+        neighbour votes are counted with sparse matrix products.
+
+        Args:
+            workers: Processes computing similar questions and votes
+            use_cache: Reuse stored suggestions whose inputs didn't change,
+                and store the recomputed ones (see suggestion_cache)
+
+        Returns:
+            One suggestions dict (as for suggest_tags) per question ID
+        """
+        state = self._bulk_state(question_ids, include_similar, include_cluster, use_cache)
+        if include_similar:
+            missing = list(dict.fromkeys(qid for qid in question_ids if qid not in state["cached"]))
+            for shard, found, votes in self._similar_shards(missing, workers):
+                state["similar"].update(zip(shard, found))
+                state["votes"].update(zip(shard, votes))
+
+        results = [self._bulk_suggest(state, qid) for qid in question_ids]
+        self._store_suggestions(state, [
+            (qid, suggestions) for qid, suggestions in zip(question_ids, results)
+            if qid not in state["cached"]
+        ])
+        return results
+
     def apply_tag(
         self,
         question_id: str,
@@ -237,32 +577,51 @@ class AutoTagger:
         confidence: float = 1.0,
         is_auto: bool = True,
     ):
-        """Apply a single tag to a question."""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO question_tags
-            (question_id, term_id, tag_type, confidence, is_auto_tagged)
-            VALUES (?, ?, ?, ?, ?)
-        """, (question_id, term_id, tag_type, confidence, is_auto))
-        self.conn.commit()
+        """Apply a single tag to a question.
 
-        # Update usage count
-        cursor.execute("""
-            UPDATE taxonomy SET usage_count = (
-                SELECT COUNT(*) FROM question_tags WHERE term_id = ?
-            ) WHERE term_id = ?
-        """, (term_id, term_id))
-        self.conn.commit()
+        taxonomy.usage_count is kept up to date by trigger (migration step 5).
+        """
+        self.apply_tags([(question_id, term_id, tag_type, confidence, is_auto)])
+
+    def apply_tags(self, tags: list):
+        """Apply (question_id, term_id, tag_type, confidence, is_auto) tags in one transaction."""
+        with self._write() as conn:
+            conn.executemany("""
+                INSERT INTO question_tags
+                (question_idx, term_id, tag_type, confidence, is_auto_tagged)
+                SELECT question_idx, ?, ?, ?, ? FROM questions WHERE question_id = ?
+                ON CONFLICT(question_idx, term_id, tag_type) DO UPDATE SET
+                    confidence = excluded.confidence,
+                    is_auto_tagged = excluded.is_auto_tagged
+            """, [
+                (term_id, tag_type, confidence, is_auto, question_id)
+                for question_id, term_id, tag_type, confidence, is_auto in tags
+            ])
+
+        if self._tag_matrix is not None:
+            recorded = [self._tag_matrix.add(*tag[:4]) for tag in tags]
+            if all(recorded):
+                self._tag_matrix.sync_stamp()
+            else:
+                self._tag_matrix.invalidate()
 
     def auto_tag_untagged(
         self,
         tag_type: str = "aspects",
         min_confidence: float = 0.8,
         limit: int = 100,
+        workers: int = 1,
+        use_cache: bool = True,
     ) -> int:
         """
         Automatically tag questions missing specific tag type.
 
+        With workers > 1, similar questions and votes are computed in a
+        process pool (see _similar_shards); the result doesn't depend on
+        the number of workers. With use_cache, only questions whose stored
+        suggestions are out of date are searched and voted on (see
+        suggestion_cache); the recomputed suggestions are stored.
+
         Returns number of questions tagged.
         """
         cursor = self.conn.cursor()
@@ -271,29 +630,56 @@ class AutoTagger:
         cursor.execute(f"""
             SELECT q.question_id
             FROM questions q
-            WHERE q.question_id NOT IN (
-                SELECT question_id FROM question_tags WHERE tag_type = ?
+            WHERE q.question_idx NOT IN (
+                SELECT question_idx FROM question_tags WHERE tag_type = ?
             )
             LIMIT ?
         """, (tag_type, limit))
 
         questions = [row[0] for row in cursor.fetchall()]
+        if not questions:
+            return 0
+
+        # Suggestions are made in order, each seeing the tags applied before
+        # it (as when tagging one question at a time). Votes computed or
+        # stored before a neighbour got tagged are recounted (changed), so
+        # it doesn't matter when a shard's votes were computed. Each shard's
+        # tags are written in one transaction, by this process only.
+        state = self._bulk_state(questions, use_cache=use_cache)
+        matrix = state["matrix"]
+        shards = self._similar_shards([qid for qid in questions if qid not in state["cached"]], workers)
+        changed = set()
         tagged_count = 0
+        new_tags, computed = [], []
 
         for qid in questions:
-            suggestions = self.suggest_tags(qid)
+            if qid not in state["similar"]:
+                # Write the previous shard before starting the next
+                if new_tags:
+                    self.apply_tags(new_tags)
+                    tagged_count += len(new_tags)
+                self._store_suggestions(state, computed)
+                new_tags, computed = [], []
+
+                shard, found, votes = next(shards)
+                state["similar"].update(zip(shard, found))
+                state["votes"].update(zip(shard, votes))
+
+            suggestions = self._bulk_suggest(state, qid, changed)
+            if qid not in state["cached"]:
+                computed.append((qid, suggestions))
             if tag_type in suggestions and suggestions[tag_type]:
                 best = suggestions[tag_type][0]
                 if best["confidence"] >= min_confidence:
-                    self.apply_tag(
-                        qid,
-                        best["term_id"],
-                        tag_type,
-                        best["confidence"],
-                        is_auto=True,
-                    )
-                    tagged_count += 1
-
+                    new_tags.append((qid, best["term_id"], tag_type, best["confidence"], True))
+                    matrix.add(qid, best["term_id"], tag_type, best["confidence"])
+                    changed.add(qid)
+
+        shards.close()
+        if new_tags:
+            self.apply_tags(new_tags)
+            tagged_count += len(new_tags)
+        self._store_suggestions(state, computed)
         return tagged_count
 
 
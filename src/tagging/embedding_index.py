@@ -0,0 +1,374 @@
+"""
+Persistent Embedding Index
+
+A sidecar copy of the embeddings table that processes memory-map instead
+of decoding every BLOB on start-up. Stored next to masterdb.sqlite:
+
+    db/embedding_index/
+        vectors-{v}.f32        unit-normalized float32 matrix (n, dim), row-major
+        vectors-{v}.f16        the same in float16
+        vectors-{v}.i8         the same in int8, scaled per row by
+        scales-{v}.f32         ... these factors
+        rows-{v}.json          question_idx / question_id of each row
+        index.json             current files, shape and content version
+
+The version is the last embedding_changes seq plus the embeddings row
+count (see migration step 7), so any insert, update or
+delete of an embedding makes the sidecar stale and it is rebuilt on the
+next open. Data files are written under new names and index.json is
+switched atomically, so readers never mix files of two builds; they map
+the vectors read-only, so N worker processes share one copy through the
+OS page cache. A rebuild keeps the previous build's files for readers
+that read index.json just before the switch and removes older ones.
+
+The float16 / int8 copies (PRECISIONS) let a search scan 2x / 4x less
+memory and re-rank its best candidates from the float32 rows. The same
+copies are kept in the embeddings table (embedding_f16, embedding_i8,
+embedding_i8_scale; see store_quantized).
+"""
+
+import sys
+import os
+import json
+import itertools
+from pathlib import Path
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from db.stats import get_stats
+
+INDEX_DIR_NAME = "embedding_index"
+
+# Sidecar layout version (older sidecars are rebuilt)
+INDEX_FORMAT = 3
+
+# Times open() re-reads index.json when a concurrent rebuild removed its files
+OPEN_ATTEMPTS = 3
+
+_build_numbers = itertools.count()
+
+# Scan representations of the unit-normalized vectors
+PRECISIONS = ("float32", "float16", "int8")
+
+
+def default_index_dir(conn):
+    """Sidecar directory next to the connection's database file (None for :memory:)."""
+    db_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not db_file:
+        return None
+    return Path(db_file).parent / INDEX_DIR_NAME
+
+
+def get_embedding_version(conn) -> dict:
+    """Current content version of the embeddings table."""
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'embedding_changes'"
+    ).fetchone()
+    return {
+        "seq": row[0] if row else 0,
+        "count": get_stats(conn).count("embeddings"),
+    }
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length as a C-contiguous float32 array (zero rows stay zero)."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize_rows(matrix: np.ndarray, precision: str):
+    """
+    Quantize unit-normalized rows.
+
+    Args:
+        matrix: Unit-normalized float32 (n, dim) matrix
+        precision: One of PRECISIONS
+
+    Returns:
+        (values, scales): scales is None except for int8, where
+        row i is approximately values[i] * scales[i]
+    """
+    if precision == "float32":
+        return matrix, None
+    if precision == "float16":
+        return matrix.astype(np.float16), None
+    if precision == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127 if len(matrix) else np.empty(0)
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        values = np.rint(matrix / scales[:, None]).astype(np.int8)
+        return values, scales
+    raise ValueError(f"Unknown precision: {precision}")
+
+
+def store_quantized(conn, batch_size: int = 1000) -> int:
+    """
+    Fill the quantized columns of embeddings rows that lack them.
+
+    Args:
+        conn: Writable database connection
+        batch_size: Rows per UPDATE batch
+
+    Returns:
+        Number of rows filled
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT question_idx, embedding FROM embeddings
+        WHERE embedding_f16 IS NULL OR embedding_i8 IS NULL OR embedding_i8_scale IS NULL
+    """)
+    rows = cursor.fetchall()
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        matrix = normalize_rows(np.stack([np.frombuffer(r[1], dtype=np.float32) for r in batch]))
+        f16, _ = quantize_rows(matrix, "float16")
+        i8, scales = quantize_rows(matrix, "int8")
+        cursor.executemany("""
+            UPDATE embeddings
+            SET embedding_f16 = ?, embedding_i8 = ?, embedding_i8_scale = ?
+            WHERE question_idx = ?
+        """, [
+            (f16[i].tobytes(), i8[i].tobytes(), float(scales[i]), row[0])
+            for i, row in enumerate(batch)
+        ])
+
+    conn.commit()
+    return len(rows)
+
+
+def read_quantized(conn, precision: str):
+    """
+    Read the quantized copies from the embeddings table, ordered by question_id.
+
+    Rows whose copies are missing are quantized from the float32 BLOB.
+
+    Returns:
+        (question_ids, values, scales) as for quantize_rows
+    """
+    if precision == "float32":
+        _, question_ids, matrix = read_embeddings(conn)
+        return question_ids, matrix, None
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    column = "embedding_f16" if precision == "float16" else "embedding_i8"
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT q.question_id, e.{column}, e.embedding_i8_scale,
+               CASE WHEN e.{column} IS NULL OR e.embedding_i8_scale IS NULL
+                    THEN e.embedding END
+        FROM embeddings e
+        JOIN questions q ON q.question_idx = e.question_idx
+        ORDER BY q.question_id
+    """)
+    rows = cursor.fetchall()
+    question_ids = [row[0] for row in rows]
+
+    dtype = np.float16 if precision == "float16" else np.int8
+    stale = [i for i, row in enumerate(rows) if row[3] is not None]
+    fresh, fresh_scales = None, None
+    if stale:
+        fresh, fresh_scales = quantize_rows(
+            normalize_rows(np.stack([np.frombuffer(rows[i][3], dtype=np.float32) for i in stale])),
+            precision,
+        )
+    blobs = [row[1] for row in rows]
+    scales = np.array([row[2] or 0.0 for row in rows], dtype=np.float32)
+    for j, i in enumerate(stale):
+        blobs[i] = fresh[j].tobytes()
+        if fresh_scales is not None:
+            scales[i] = fresh_scales[j]
+
+    if not rows:
+        return question_ids, np.empty((0, 0), dtype=dtype), None
+    values = np.frombuffer(b"".join(blobs), dtype=dtype).reshape(len(rows), -1)
+    return question_ids, values, scales if precision == "int8" else None
+
+
+def read_embeddings(conn):
+    """
+    Read the embeddings table, ordered by question_id.
+
+    Returns:
+        (question_idxs, question_ids, unit-normalized float32 matrix)
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT e.question_idx, q.question_id, e.embedding
+        FROM embeddings e
+        JOIN questions q ON q.question_idx = e.question_idx
+        ORDER BY q.question_id
+    """)
+    rows = cursor.fetchall()
+
+    question_idxs = [row[0] for row in rows]
+    question_ids = [row[1] for row in rows]
+    if not rows:
+        return question_idxs, question_ids, np.empty((0, 0), dtype=np.float32)
+
+    # Deserialize all BLOBs (768 float32 values each) in one pass
+    matrix = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32)
+    return question_idxs, question_ids, normalize_rows(matrix.reshape(len(rows), -1))
+
+
+class EmbeddingIndex:
+    """Memory-mapped sidecar of the embeddings table."""
+
+    def __init__(self, index_dir, question_idxs, question_ids, vectors, version, meta=None,
+                 representations=None):
+        self.index_dir = Path(index_dir)
+        self.question_idxs = question_idxs
+        self.question_ids = question_ids
+        self.vectors = vectors      # read-only np.memmap (n, dim)
+        self.version = version
+        self.meta = meta or {}
+        # {precision: (values, scales)}, mapped by open()
+        self.representations = representations or {"float32": (vectors, None)}
+
+    def quantized(self, precision: str):
+        """
+        Get a scan representation of the vectors.
+
+        Returns:
+            (values, scales) as for quantize_rows
+        """
+        if precision not in self.representations:
+            raise ValueError(f"Unknown precision: {precision}")
+        return self.representations[precision]
+
+    @staticmethod
+    def _map(index_dir, meta) -> dict:
+        """Map every representation of a build: {precision: (values, scales)}."""
+        shape = tuple(meta["shape"])
+        if shape[0] == 0:
+            return {
+                "float32": (np.empty(shape, dtype=np.float32), None),
+                "float16": (np.empty(shape, dtype=np.float16), None),
+                "int8": (np.empty(shape, dtype=np.int8), np.empty(0, dtype=np.float32)),
+            }
+
+        def mapped(key, dtype, file_shape):
+            return np.memmap(index_dir / meta[key], dtype=dtype, mode="r", shape=file_shape)
+
+        return {
+            "float32": (mapped("vectors", np.float32, shape), None),
+            "float16": (mapped("float16", np.float16, shape), None),
+            "int8": (mapped("int8", np.int8, shape), mapped("int8_scales", np.float32, shape[:1])),
+        }
+
+    @classmethod
+    def open(cls, index_dir, version=None):
+        """
+        Open an existing sidecar.
+
+        Args:
+            index_dir: Sidecar directory
+            version: Required content version (None = any)
+
+        Returns:
+            EmbeddingIndex, or None if missing or stale
+        """
+        index_dir = Path(index_dir)
+
+        # All files are mapped here, so switching precision later never needs
+        # files a rebuild may have removed meanwhile
+        for _ in range(OPEN_ATTEMPTS):
+            meta = cls._read_meta(index_dir)
+            if meta is None or meta.get("format") != INDEX_FORMAT:
+                return None
+            if version is not None and meta["version"] != version:
+                return None
+            try:
+                with open(index_dir / meta["rows"], encoding="utf-8") as f:
+                    rows = json.load(f)
+                representations = cls._map(index_dir, meta)
+            except FileNotFoundError:
+                # Removed by concurrent rebuilds after index.json was read; read it again
+                continue
+            return cls(
+                index_dir, rows["question_idx"], rows["question_id"],
+                representations["float32"][0], meta["version"], meta, representations,
+            )
+        return None
+
+    @staticmethod
+    def _read_meta(index_dir):
+        try:
+            with open(Path(index_dir) / "index.json", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def build(cls, conn, index_dir):
+        """Build (or rebuild) the sidecar from the embeddings table."""
+        # Read the version first: changes made while reading make it stale
+        version = get_embedding_version(conn)
+        question_idxs, question_ids, matrix = read_embeddings(conn)
+
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        # Unique per build, so a rebuild never rewrites files a reader has mapped
+        tag = f"{version['seq']}-{version['count']}-{os.getpid()}-{next(_build_numbers)}"
+        meta = {
+            "format": INDEX_FORMAT,
+            "vectors": f"vectors-{tag}.f32",
+            "float16": f"vectors-{tag}.f16",
+            "int8": f"vectors-{tag}.i8",
+            "int8_scales": f"scales-{tag}.f32",
+            "rows": f"rows-{tag}.json",
+            "shape": list(matrix.shape),
+            "version": version,
+        }
+
+        matrix.tofile(index_dir / meta["vectors"])
+        quantize_rows(matrix, "float16")[0].tofile(index_dir / meta["float16"])
+        values, scales = quantize_rows(matrix, "int8")
+        values.tofile(index_dir / meta["int8"])
+        scales.tofile(index_dir / meta["int8_scales"])
+        with open(index_dir / meta["rows"], "w", encoding="utf-8") as f:
+            json.dump({"question_idx": question_idxs, "question_id": question_ids}, f)
+
+        # Switch readers to the new files
+        previous = cls._read_meta(index_dir)
+        tmp = index_dir / f"index.json.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, index_dir / "index.json")
+
+        # Keep this build and the previous one (readers that read index.json
+        # just before the switch still open it); processes that mapped older
+        # builds keep their open copy
+        file_keys = ("vectors", "float16", "int8", "int8_scales", "rows")
+        keep = {meta[key] for key in file_keys}
+        if previous is not None:
+            keep |= {previous[key] for key in file_keys if key in previous}
+        for pattern in ("vectors-*", "scales-*", "rows-*", "question_ids-*"):
+            for path in index_dir.glob(pattern):
+                if path.name not in keep:
+                    try:
+                        path.unlink(missing_ok=True)
+                    except PermissionError:
+                        # Still mapped (Windows); removed by a later build
+                        pass
+
+        return cls.open(index_dir)
+
+    @classmethod
+    def open_or_build(cls, conn, index_dir=None):
+        """Open the sidecar for the current embeddings, rebuilding it if stale.
+
+        Returns None for in-memory databases.
+        """
+        index_dir = index_dir or default_index_dir(conn)
+        if index_dir is None:
+            return None
+        index = cls.open(index_dir, version=get_embedding_version(conn))
+        if index is None:
+            index = cls.build(conn, index_dir)
+        return index
@@ -0,0 +1,231 @@
+"""
+Embedding Generation Pipeline
+
+Creates embeddings for questions that don't have one yet (e.g. questions
+added by upload_wcp_data.py), so new surveys become searchable without
+re-encoding the whole question bank:
+
+1. find questions without an embeddings row
+2. normalize their text and hash it; identical texts are encoded once
+3. reuse cached vectors from embedding_cache (same text hash and model)
+4. encode the rest in batches and store them in embedding_cache and
+   embeddings (with the float16 / int8 copies, see embedding_index)
+
+The encoder is pluggable: anything with a model_name attribute and an
+encode(texts) method returning a (n, dim) float32 array.
+SentenceTransformerEncoder is the production model; HashingEncoder is a
+deterministic local encoder for offline runs and tests.
+
+Usage:
+    python src/tagging/embedding_pipeline.py
+    python src/tagging/embedding_pipeline.py --encoder hashing
+"""
+
+import sys
+import re
+import hashlib
+import argparse
+import unicodedata
+from pathlib import Path
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from db.connection import get_connection
+from tagging.embedding_index import normalize_rows, quantize_rows
+
+DEFAULT_MODEL = "jhgan/ko-sroberta-multitask"
+
+DEFAULT_BATCH_SIZE = 256
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a question text (NFKC, lower case, single spaces)."""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def text_hash(text: str) -> str:
+    """Cache key of a question text (SHA-1 of its normalized form)."""
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# ENCODERS
+# ============================================================
+
+class SentenceTransformerEncoder:
+    """KoSBERT sentence encoder (model loaded on first use)."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = 64):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+
+    def encode(self, texts: list) -> np.ndarray:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(self.model_name)
+        embeddings = self._model.encode(texts, batch_size=self.batch_size)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class HashingEncoder:
+    """
+    Deterministic bag-of-n-grams encoder (no model download).
+
+    Words and character 2/3-grams of the normalized text are hashed into
+    dim signed buckets, so similar wording gives similar vectors. Only for
+    offline runs and tests: its vectors aren't comparable to KoSBERT's.
+    """
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def _features(self, text):
+        words = normalize_text(text).split()
+        features = list(words)
+        for word in words:
+            padded = f" {word} "
+            for n in (2, 3):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def encode(self, texts: list) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                embeddings[row, (value >> 1) % self.dim] += sign
+        return embeddings
+
+
+ENCODERS = {
+    "sentence-transformer": SentenceTransformerEncoder,
+    "hashing": HashingEncoder,
+}
+
+
+# ============================================================
+# PIPELINE
+# ============================================================
+
+def find_missing(conn) -> list:
+    """(question_idx, question_text) of questions without an embedding."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT q.question_idx, q.question_text
+        FROM questions q
+        LEFT JOIN embeddings e ON e.question_idx = q.question_idx
+        WHERE e.question_idx IS NULL AND q.question_text IS NOT NULL
+        ORDER BY q.question_idx
+    """)
+    return cursor.fetchall()
+
+
+def get_cached(conn, hashes: list, model_name: str) -> dict:
+    """Cached vectors of text hashes: {text_hash: embedding BLOB}."""
+    cursor = conn.cursor()
+    cached = {}
+    for start in range(0, len(hashes), 500):
+        chunk = hashes[start:start + 500]
+        cursor.execute(f"""
+            SELECT text_hash, embedding FROM embedding_cache
+            WHERE model_name = ? AND text_hash IN ({', '.join('?' * len(chunk))})
+        """, [model_name, *chunk])
+        cached.update(cursor.fetchall())
+    return cached
+
+
+def embed_missing(conn, encoder=None, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Create embeddings for all questions that don't have one.
+
+    Args:
+        conn: Writable database connection
+        encoder: Text encoder (default: SentenceTransformerEncoder)
+        batch_size: Texts encoded (and rows committed) per batch
+
+    Returns:
+        Counts: questions embedded, texts encoded, texts served from cache
+    """
+    encoder = encoder or SentenceTransformerEncoder()
+    missing = find_missing(conn)
+    result = {"questions": len(missing), "encoded": 0, "cached": 0}
+    if not missing:
+        return result
+
+    # Questions per distinct normalized text
+    by_hash = {}
+    texts = {}
+    for question_idx, question_text in missing:
+        key = text_hash(question_text)
+        by_hash.setdefault(key, []).append(question_idx)
+        texts.setdefault(key, question_text)
+
+    hashes = list(by_hash)
+    cached = get_cached(conn, hashes, encoder.model_name)
+    result["cached"] = len(cached)
+    cursor = conn.cursor()
+
+    for start in range(0, len(hashes), batch_size):
+        batch = hashes[start:start + batch_size]
+
+        to_encode = [key for key in batch if key not in cached]
+        if to_encode:
+            encoded = np.asarray(encoder.encode([texts[key] for key in to_encode]), dtype=np.float32)
+            blobs = [vector.tobytes() for vector in encoded]
+            cursor.executemany("""
+                INSERT OR IGNORE INTO embedding_cache (text_hash, model_name, embedding)
+                VALUES (?, ?, ?)
+            """, [(key, encoder.model_name, blob) for key, blob in zip(to_encode, blobs)])
+            cached.update(zip(to_encode, blobs))
+            result["encoded"] += len(to_encode)
+
+        vectors = np.stack([np.frombuffer(cached[key], dtype=np.float32) for key in batch])
+        unit = normalize_rows(vectors)
+        f16, _ = quantize_rows(unit, "float16")
+        i8, scales = quantize_rows(unit, "int8")
+
+        rows = []
+        for i, key in enumerate(batch):
+            for question_idx in by_hash[key]:
+                rows.append((
+                    question_idx, cached[key], encoder.model_name,
+                    f16[i].tobytes(), i8[i].tobytes(), float(scales[i]),
+                ))
+        cursor.executemany("""
+            INSERT INTO embeddings (
+                question_idx, embedding, model_name,
+                embedding_f16, embedding_i8, embedding_i8_scale
+            ) VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed questions that have no embedding yet")
+    parser.add_argument("--db", help="Database path (default: db/masterdb.sqlite)")
+    parser.add_argument("--encoder", choices=sorted(ENCODERS), default="sentence-transformer")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    conn = get_connection(args.db)
+    result = embed_missing(conn, ENCODERS[args.encoder](), batch_size=args.batch_size)
+
+    print(f"Questions embedded: {result['questions']}")
+    print(f"  Texts encoded: {result['encoded']}")
+    print(f"  Texts from cache: {result['cached']}")
+
+
+if __name__ == "__main__":
+    main()
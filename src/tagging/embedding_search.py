@@ -12,59 +12,465 @@ import numpy as np
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
-from db.connection import get_connection
+from db.connection import get_reader
+from tagging.embedding_index import (
+    EmbeddingIndex, PRECISIONS, get_embedding_version, normalize_rows,
+    read_embeddings, read_quantized,
+)
+from tagging.ann_index import IVFIndex, IVF_FILE_NAME
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, highest first.
+
+    Partial selection (argpartition) picks the candidates; only those k
+    are sorted.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
 
 
 class EmbeddingSearch:
     """Search questions by embedding similarity."""
 
-    def __init__(self, conn=None):
-        self.conn = conn or get_connection()
-        self._embeddings_cache = None
+    # questions columns loaded with the embeddings, usable as search filters
+    METADATA_COLUMNS = ("diagnosis_type", "source_year", "cluster_id", "is_representative")
+
+    # Extra float32 candidates re-scored exactly before cutting to top_k
+    RESCORE_MARGIN = 8
+
+    # Bytes of similarity scores computed per block in search_similar_many
+    DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+    # Searchable rows from which the IVF index is used (ann=None)
+    ANN_MIN_ROWS = 50_000
+
+    # IVF cells scanned per query (recall/latency trade-off)
+    DEFAULT_NPROBE = 16
+
+    # Candidates per result re-ranked in float32 after a float16/int8 scan
+    QUANTIZED_RERANK_FACTOR = 4
+
+    # Rows of a quantized matrix converted to float32 at a time while scanning
+    SCAN_CHUNK_ROWS = 16384
+
+    # refresh() reloads instead once appended rows exceed this share of the matrix
+    REFRESH_RELOAD_FRACTION = 0.25
+
+    def __init__(
+        self, conn=None, index_dir=None, use_index=True, ann=None, nprobe=None,
+        precision="float32", auto_refresh=True,
+    ):
+        """
+        Args:
+            conn: Database connection (default: shared reader)
+            index_dir: Embedding sidecar directory (default: next to the DB)
+            use_index: Memory-map the persistent sidecar instead of reading BLOBs
+            ann: Approximate IVF search: True, False, or None for corpora of
+                at least ANN_MIN_ROWS searchable rows
+            nprobe: IVF cells scanned per query (default DEFAULT_NPROBE)
+            precision: Matrix scanned by exact search: float32, or float16 /
+                int8 copies (2x / 4x less memory) whose best candidates are
+                re-ranked in float32
+            auto_refresh: Apply embedding changes (refresh()) before each search
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.conn = conn or get_reader()
+        self.index_dir = index_dir
+        self.use_index = use_index
+        self.ann = ann
+        self.nprobe = nprobe or self.DEFAULT_NPROBE
+        self.precision = precision
+        self.auto_refresh = auto_refresh
+        self.index = None               # EmbeddingIndex when the sidecar is used
+        self.ann_index = None           # IVFIndex, loaded on first ANN search
+        self._embeddings_cache = None   # unit-normalized float32 (n, dim)
+        self._scan_matrix = None        # ... in self.precision
+        self._scan_scales = None        # per-row scales of an int8 scan matrix
         self._question_ids_cache = None
+        self._question_idxs = None      # question_idx of each row
+        self._row_index = None          # question_id -> row
+        self._row_by_idx = None         # question_idx -> row
+        self._metadata = None           # column -> (values, per-row codes)
+        self._texts = None              # question_text of each row
+        self._mask_cache = {}           # (column, value) -> bool mask
+
+        # Delta applied by refresh(): rows appended after the loaded matrix
+        # (float32, scanned as is) and rows replaced or deleted since
+        self._delta_vectors = None
+        self._deleted = None            # bool per row, None if nothing deleted
+        self._version = None            # embedding version the cache reflects
+        self._stamp = None              # (data_version, total_changes) last checked
 
     def _load_embeddings(self):
-        """Load all embeddings into memory for fast search."""
+        """Load all embeddings for fast search.
+
+        Vectors come from the memory-mapped sidecar (rebuilt if the
+        embeddings changed), or straight from the table for in-memory
+        databases / use_index=False.
+        """
         if self._embeddings_cache is not None:
             return
 
+        self._stamp = self._db_stamp()
+        if self.use_index:
+            self.index = EmbeddingIndex.open_or_build(self.conn, self.index_dir)
+        if self.index is not None:
+            self._version = self.index.version
+            self._question_idxs = self.index.question_idxs
+            self._question_ids_cache = self.index.question_ids
+            self._embeddings_cache = self.index.vectors
+            self._scan_matrix, self._scan_scales = self.index.quantized(self.precision)
+        else:
+            # Read the version first: changes made while reading are re-applied
+            self._version = get_embedding_version(self.conn)
+            self._question_idxs, self._question_ids_cache, self._embeddings_cache = (
+                read_embeddings(self.conn)
+            )
+            if self.precision == "float32":
+                self._scan_matrix = self._embeddings_cache
+            else:
+                _, self._scan_matrix, self._scan_scales = read_quantized(self.conn, self.precision)
+
+        self._row_index = {qid: i for i, qid in enumerate(self._question_ids_cache)}
+        self._row_by_idx = {idx: i for i, idx in enumerate(self._question_idxs)}
+        self._delta_vectors = None
+        self._deleted = None
+        self._load_metadata()
+        print(f"Loaded {len(self._question_ids_cache)} embeddings")
+
+    def _load_metadata(self):
+        """Load text and filter columns of the embedded questions, aligned to rows."""
         cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT question_id, embedding FROM embeddings
-            ORDER BY question_id
+        cursor.execute(f"""
+            SELECT question_id, question_text, {', '.join(self.METADATA_COLUMNS)}
+            FROM questions
+            WHERE question_idx IN (SELECT question_idx FROM embeddings)
         """)
-        rows = cursor.fetchall()
+        n = len(self._question_ids_cache)
+        metadata = {column: [None] * n for column in self.METADATA_COLUMNS}
+        self._texts = [None] * n
+        for row in cursor.fetchall():
+            i = self._row_index.get(row[0])
+            if i is None:
+                continue
+            self._texts[i] = row[1]
+            for column, value in zip(self.METADATA_COLUMNS, tuple(row)[2:]):
+                metadata[column][i] = value
+
+        self._metadata = {
+            column: self._encode_column(values) for column, values in metadata.items()
+        }
+        self._mask_cache = {}
+
+    def load_ann_index(self) -> IVFIndex:
+        """Get the IVF index of the loaded embeddings (saved with the sidecar)."""
+        self._load_embeddings()
+        if self.ann_index is None:
+            if self.index is not None:
+                self.ann_index = IVFIndex.open_or_train(
+                    self._embeddings_cache,
+                    self.index.index_dir / IVF_FILE_NAME,
+                    version=self.index.version,
+                )
+            else:
+                self.ann_index = IVFIndex.open_or_train(self._embeddings_cache)
+            if self._delta_vectors is not None:
+                self.ann_index.add(self._delta_vectors)
+        return self.ann_index
+
+    def _db_stamp(self):
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self.conn.total_changes
+
+    def _reset_cache(self):
+        """Drop the loaded embeddings (the next search reloads them)."""
+        self.index = None
+        self.ann_index = None
+        self._embeddings_cache = None
+        self._scan_matrix = None
+        self._scan_scales = None
 
-        self._question_ids_cache = []
-        embeddings_list = []
+    def refresh(self) -> dict:
+        """
+        Apply embedding changes made since the cache was loaded.
 
-        for row in rows:
-            self._question_ids_cache.append(row[0])
-            # Deserialize from BLOB (768 float32 values)
-            embedding = np.frombuffer(row[1], dtype=np.float32)
-            embeddings_list.append(embedding)
+        Changed question_idx values come from the embedding_changes log
+        (see migration steps 7 and 10). New embeddings are appended,
+        changed ones are appended and their old row tombstoned, and deleted
+        ones are tombstoned, so the loaded matrix is never re-read. Once the
+        appended rows exceed REFRESH_RELOAD_FRACTION of it, the cache is
+        reloaded instead (rebuilding the sidecar).
 
-        self._embeddings_cache = np.array(embeddings_list)
-        print(f"Loaded {len(self._question_ids_cache)} embeddings")
+        Returns:
+            Counts of added / updated / deleted embeddings
+        """
+        counts = {"added": 0, "updated": 0, "deleted": 0}
+        if self._embeddings_cache is None:
+            return counts
+
+        # Nothing committed since the last check: no query needed
+        stamp = self._db_stamp()
+        if stamp == self._stamp:
+            return counts
+        self._stamp = stamp
+
+        version = get_embedding_version(self.conn)
+        if version == self._version:
+            return counts
 
-    def get_embedding(self, question_id: str) -> np.ndarray:
-        """Get embedding for a specific question."""
         cursor = self.conn.cursor()
         cursor.execute(
-            "SELECT embedding FROM embeddings WHERE question_id = ?",
-            (question_id,)
+            "SELECT DISTINCT question_idx FROM embedding_changes WHERE seq > ?",
+            (self._version["seq"],),
         )
+        changed = [row[0] for row in cursor.fetchall()]
+
+        current = []
+        for start in range(0, len(changed), 500):
+            chunk = changed[start:start + 500]
+            cursor.execute(f"""
+                SELECT e.question_idx, q.question_id, e.embedding, q.question_text,
+                       {', '.join('q.' + c for c in self.METADATA_COLUMNS)}
+                FROM embeddings e
+                JOIN questions q ON q.question_idx = e.question_idx
+                WHERE e.question_idx IN ({', '.join('?' * len(chunk))})
+                ORDER BY q.question_id
+            """, chunk)
+            current.extend(cursor.fetchall())
+
+        current_idxs = {row[0] for row in current}
+        for idx in changed:
+            if idx not in self._row_by_idx:
+                counts["added"] += idx in current_idxs
+            else:
+                counts["updated" if idx in current_idxs else "deleted"] += 1
+
+        appended = len(current) + (0 if self._delta_vectors is None else len(self._delta_vectors))
+        if appended > self.REFRESH_RELOAD_FRACTION * max(len(self._embeddings_cache), 1):
+            self._reset_cache()
+            self._load_embeddings()
+            return counts
+
+        # Tombstone the old row of every changed embedding
+        n = len(self._question_ids_cache)
+        deleted = np.zeros(n, dtype=bool) if self._deleted is None else self._deleted.copy()
+        for idx in changed:
+            row = self._row_by_idx.pop(idx, None)
+            if row is None:
+                continue
+            deleted[row] = True
+            question_id = self._question_ids_cache[row]
+            if self._row_index.get(question_id) == row:
+                del self._row_index[question_id]
+
+        if current:
+            new_vectors = normalize_rows(
+                np.stack([np.frombuffer(row[2], dtype=np.float32) for row in current])
+            )
+            self._delta_vectors = (
+                new_vectors if self._delta_vectors is None
+                else np.concatenate((self._delta_vectors, new_vectors))
+            )
+            self._question_ids_cache = self._question_ids_cache + [row[1] for row in current]
+            self._question_idxs = self._question_idxs + [row[0] for row in current]
+            self._texts = self._texts + [row[3] for row in current]
+            for i, row in enumerate(current):
+                self._row_index[row[1]] = n + i
+                self._row_by_idx[row[0]] = n + i
+            for j, column in enumerate(self.METADATA_COLUMNS):
+                values, codes = self._metadata[column]
+                self._metadata[column] = self._append_codes(
+                    values, codes, [row[4 + j] for row in current]
+                )
+            deleted = np.concatenate((deleted, np.zeros(len(current), dtype=bool)))
+            if self.ann_index is not None:
+                self.ann_index.add(new_vectors)
+
+        self._deleted = deleted if deleted.any() else None
+        self._mask_cache = {}
+        self._version = version
+        return counts
+
+    def _use_ann(self, searchable_rows: int) -> bool:
+        if self.ann is None:
+            return searchable_rows >= self.ANN_MIN_ROWS
+        return bool(self.ann)
+
+    @staticmethod
+    def _encode_column(values):
+        """Dictionary-encode a metadata column: (distinct values, per-row codes)."""
+        distinct = {}
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            codes[i] = distinct.setdefault(value, len(distinct))
+        return list(distinct), codes
+
+    @staticmethod
+    def _append_codes(values, codes, new_values):
+        """Extend a dictionary-encoded column with the values of appended rows."""
+        values = list(values)
+        distinct = {value: i for i, value in enumerate(values)}
+        new_codes = np.empty(len(new_values), dtype=np.int32)
+        for i, value in enumerate(new_values):
+            if value not in distinct:
+                distinct[value] = len(values)
+                values.append(value)
+            new_codes[i] = distinct[value]
+        return values, np.concatenate((codes, new_codes))
+
+    def _column_value(self, column: str, row: int):
+        """Metadata column value of a row."""
+        values, codes = self._metadata[column]
+        return values[codes[row]]
+
+    def _value_mask(self, column: str, value) -> np.ndarray:
+        """Rows whose metadata column equals value (cached per load)."""
+        key = (column, value)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            if column not in self._metadata:
+                raise ValueError(f"Unknown filter column: {column}")
+            values, codes = self._metadata[column]
+            if column == "is_representative":
+                value = bool(value)
+                matching = [i for i, v in enumerate(values) if bool(v) == value]
+            else:
+                matching = [i for i, v in enumerate(values) if v == value]
+            mask = np.isin(codes, matching)
+            mask.flags.writeable = False
+            self._mask_cache[key] = mask
+        return mask
+
+    def get_embedding(self, question_id: str) -> np.ndarray:
+        """Get embedding for a specific question."""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT e.embedding
+            FROM questions q
+            JOIN embeddings e ON e.question_idx = q.question_idx
+            WHERE q.question_id = ?
+        """, (question_id,))
         row = cursor.fetchone()
         if row:
             return np.frombuffer(row[0], dtype=np.float32)
         return None
 
+    def _filter_mask(self, exclude_ids=None, **filters):
+        """
+        Boolean mask of rows allowed by the filters (None if unfiltered).
+
+        Args:
+            exclude_ids: Question IDs to leave out
+            **filters: Metadata column -> required value (None = no filter),
+                see METADATA_COLUMNS
+        """
+        mask = None
+        for column, value in filters.items():
+            if value is None:
+                continue
+            value_mask = self._value_mask(column, value)
+            mask = value_mask.copy() if mask is None else mask & value_mask
+
+        if exclude_ids:
+            rows = [self._row_index[qid] for qid in exclude_ids if qid in self._row_index]
+            if rows:
+                if mask is None:
+                    mask = np.ones(len(self._question_ids_cache), dtype=bool)
+                mask[rows] = False
+
+        if self._deleted is not None:
+            mask = ~self._deleted if mask is None else mask & ~self._deleted
+
+        return mask
+
+    def _vectors(self, rows) -> np.ndarray:
+        """float32 vectors of rows (loaded matrix or rows appended by refresh())."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self._delta_vectors is None:
+            return self._embeddings_cache[rows]
+
+        base_rows = len(self._embeddings_cache)
+        in_base = rows < base_rows
+        out = np.empty((len(rows), self._delta_vectors.shape[1]), dtype=np.float32)
+        out[in_base] = self._embeddings_cache[rows[in_base]]
+        out[~in_base] = self._delta_vectors[rows[~in_base] - base_rows]
+        return out
+
+    def _scan_scores(self, block_queries: np.ndarray) -> np.ndarray:
+        """float32 similarities of a block of queries to every row (scan matrix)."""
+        matrix = self._scan_matrix
+        if matrix.dtype == np.float32 and self._delta_vectors is None:
+            return block_queries @ matrix.T
+
+        n = len(self._question_ids_cache)
+        scores = np.empty((len(block_queries), n), dtype=np.float32)
+        if matrix.dtype == np.float32:
+            scores[:, :len(matrix)] = block_queries @ matrix.T
+        else:
+            for start in range(0, len(matrix), self.SCAN_CHUNK_ROWS):
+                chunk = np.asarray(matrix[start:start + self.SCAN_CHUNK_ROWS], dtype=np.float32)
+                scores[:, start:start + len(chunk)] = block_queries @ chunk.T
+            if self._scan_scales is not None:
+                scores[:, :len(matrix)] *= self._scan_scales
+        if self._delta_vectors is not None:
+            scores[:, len(matrix):] = block_queries @ self._delta_vectors.T
+        return scores
+
+    def _rank(self, query: np.ndarray, scores: np.ndarray, mask, top_k: int, rows=None) -> list:
+        """
+        Exact top-k for one query from its float32 scores.
+
+        The top_k + RESCORE_MARGIN best float32 scores (QUANTIZED_RERANK_FACTOR
+        x top_k after a float16/int8 scan) are re-scored in float64 from the
+        float32 rows, so single and batched searches (GEMV vs GEMM rounding)
+        return the same results.
+
+        Args:
+            query: Unit-length query vector (float64)
+            scores: float32 similarities to rows, excluded rows at -inf
+            mask: Allowed rows (None = all)
+            top_k: Number of results
+            rows: Row numbers scores refer to (None = every row)
+
+        Returns:
+            List of (question_id, similarity) tuples, best first
+        """
+        n_candidates = top_k + self.RESCORE_MARGIN
+        if rows is None and self._scan_matrix.dtype != np.float32:
+            n_candidates = max(n_candidates, top_k * self.QUANTIZED_RERANK_FACTOR)
+        picked = top_k_indices(scores, n_candidates)
+        picked = picked[np.isfinite(scores[picked])]
+        candidates = picked if rows is None else rows[picked]
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+
+        exact = self._vectors(candidates).astype(np.float64) @ query
+        # Best first; equal scores in row order
+        order = np.lexsort((candidates, -exact))[:top_k]
+
+        results = []
+        for i in order:
+            if exact[i] > 0:  # Valid result
+                results.append((self._question_ids_cache[candidates[i]], float(exact[i])))
+        return results
+
     def search_similar(
         self,
         query_embedding: np.ndarray,
         top_k: int = 10,
         exclude_ids: list = None,
         diagnosis_type: str = None,
+        source_year: int = None,
+        cluster_id: int = None,
+        is_representative: bool = None,
     ) -> list:
         """
         Find most similar questions by cosine similarity.
@@ -74,57 +480,124 @@ class EmbeddingSearch:
             top_k: Number of results to return
             exclude_ids: Question IDs to exclude from results
             diagnosis_type: Filter by diagnosis type (OD, LD, MA, DD)
+            source_year: Filter by source year
+            cluster_id: Filter by cluster number
+            is_representative: Only representative (True) / other (False) questions
 
         Returns:
             List of (question_id, similarity_score) tuples
         """
-        self._load_embeddings()
-
-        # Normalize query
-        query_norm = query_embedding / np.linalg.norm(query_embedding)
-
-        # Normalize all embeddings
-        norms = np.linalg.norm(self._embeddings_cache, axis=1, keepdims=True)
-        normalized = self._embeddings_cache / norms
-
-        # Compute cosine similarities
-        similarities = np.dot(normalized, query_norm)
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        return self.search_similar_many(
+            query, top_k=top_k, exclude_ids=exclude_ids, diagnosis_type=diagnosis_type,
+            source_year=source_year, cluster_id=cluster_id,
+            is_representative=is_representative,
+        )[0]
+
+    def search_similar_many(
+        self,
+        queries,
+        top_k: int = 10,
+        exclude_ids: list = None,
+        diagnosis_type: str = None,
+        source_year: int = None,
+        cluster_id: int = None,
+        is_representative: bool = None,
+        exclude_self: bool = True,
+        memory_budget: int = None,
+    ) -> list:
+        """
+        Find the most similar questions for a batch of queries.
 
-        # Build mask for filtering
-        mask = np.ones(len(similarities), dtype=bool)
+        Similarities are computed as matrix products over blocks of queries,
+        sized so a block's score matrix stays within memory_budget bytes.
+        With ANN search (see ann / ANN_MIN_ROWS) each query only scores the
+        rows of its nprobe closest IVF cells; very selective filters can
+        then return fewer than top_k results.
 
-        if exclude_ids:
-            exclude_set = set(exclude_ids)
-            for i, qid in enumerate(self._question_ids_cache):
-                if qid in exclude_set:
-                    mask[i] = False
-
-        if diagnosis_type:
-            # Get question IDs for this diagnosis type
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "SELECT question_id FROM questions WHERE diagnosis_type = ?",
-                (diagnosis_type,)
-            )
-            valid_ids = set(row[0] for row in cursor.fetchall())
-            for i, qid in enumerate(self._question_ids_cache):
-                if qid not in valid_ids:
-                    mask[i] = False
+        Args:
+            queries: (m, dim) array of query vectors, or list of question IDs
+            top_k: Number of results per query
+            exclude_ids: Question IDs to exclude from all results
+            diagnosis_type: Filter by diagnosis type (OD, LD, MA, DD)
+            source_year / cluster_id / is_representative: Metadata filters
+            exclude_self: For question ID queries, leave out the query itself
+            memory_budget: Bytes for one block's score matrix
+                (default DEFAULT_MEMORY_BUDGET)
 
-        # Apply mask
-        similarities[~mask] = -1
+        Returns:
+            One list of (question_id, similarity_score) tuples per query
+            ([] for question IDs without an embedding)
+        """
+        if len(queries) == 0:
+            return []
 
-        # Get top-k indices
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        self._load_embeddings()
+        if self.auto_refresh:
+            self.refresh()
+        n = len(self._question_ids_cache)
+
+        if isinstance(queries[0], str):
+            rows = np.array([self._row_index.get(qid, -1) for qid in queries], dtype=np.int64)
+            found = rows >= 0
+            query_matrix = self._vectors(rows[found])
+            self_rows = rows[found] if exclude_self else None
+        else:
+            query_matrix = normalize_rows(np.atleast_2d(queries))
+            found = np.ones(len(query_matrix), dtype=bool)
+            self_rows = None
+
+        mask = self._filter_mask(
+            exclude_ids, diagnosis_type=diagnosis_type, source_year=source_year,
+            cluster_id=cluster_id, is_representative=is_representative,
+        )
+        excluded_rows = np.flatnonzero(~mask) if mask is not None else None
+        use_ann = self._use_ann(n if mask is None else int(mask.sum()))
+        found_results = []
+
+        if n and len(query_matrix):
+            # scores (float32) + argpartition work arrays (~16 bytes per score)
+            budget = memory_budget or self.DEFAULT_MEMORY_BUDGET
+            block = max(1, budget // (16 * n))
+
+            for start in range(0, len(query_matrix), block):
+                block_queries = query_matrix[start:start + block]
+                block_self = self_rows[start:start + block] if self_rows is not None else None
+                if use_ann:
+                    found_results.extend(
+                        self._search_block_ann(block_queries, block_self, mask, top_k)
+                    )
+                    continue
+
+                scores = self._scan_scores(block_queries)
+                if excluded_rows is not None:
+                    scores[:, excluded_rows] = -np.inf
+                if block_self is not None:
+                    scores[np.arange(len(block_self)), block_self] = -np.inf
+
+                exact_queries = block_queries.astype(np.float64)
+                for i in range(len(block_queries)):
+                    found_results.append(self._rank(exact_queries[i], scores[i], mask, top_k))
+        else:
+            found_results = [[] for _ in range(len(query_matrix))]
+
+        results = iter(found_results)
+        return [next(results) if ok else [] for ok in found]
+
+    def _search_block_ann(self, block_queries, block_self, mask, top_k) -> list:
+        """Rank a block of queries over the rows of their probed IVF cells."""
+        candidate_rows = self.load_ann_index().probe(block_queries, self.nprobe)
 
         results = []
-        for idx in top_indices:
-            if similarities[idx] > 0:  # Valid result
-                results.append((
-                    self._question_ids_cache[idx],
-                    float(similarities[idx])
-                ))
-
+        for i, rows in enumerate(candidate_rows):
+            scores = self._vectors(rows) @ block_queries[i]
+            if mask is not None:
+                scores[~mask[rows]] = -np.inf
+            if block_self is not None:
+                scores[rows == block_self[i]] = -np.inf
+            results.append(
+                self._rank(block_queries[i].astype(np.float64), scores, None, top_k, rows=rows)
+            )
         return results
 
     def search_by_question(
@@ -136,6 +609,9 @@ class EmbeddingSearch:
         """
         Find questions similar to a given question.
 
+        Text and diagnosis type come from the columns loaded with the
+        embeddings, so no per-result query is needed.
+
         Args:
             question_id: Source question ID
             top_k: Number of results
@@ -144,45 +620,94 @@ class EmbeddingSearch:
         Returns:
             List of (question_id, question_text, similarity, diagnosis_type)
         """
-        # Get query embedding
-        query_emb = self.get_embedding(question_id)
-        if query_emb is None:
-            return []
+        return self.search_by_questions([question_id], top_k, same_diagnosis_only)[0]
 
-        # Get diagnosis type if filtering
-        diagnosis_type = None
-        if same_diagnosis_only:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "SELECT diagnosis_type FROM questions WHERE question_id = ?",
-                (question_id,)
-            )
-            row = cursor.fetchone()
-            if row:
-                diagnosis_type = row[0]
-
-        # Search
-        similar = self.search_similar(
-            query_emb,
-            top_k=top_k + 1,  # +1 because query itself will be in results
-            exclude_ids=[question_id],
-            diagnosis_type=diagnosis_type,
-        )
+    def search_by_questions(
+        self,
+        question_ids: list,
+        top_k: int = 10,
+        same_diagnosis_only: bool = False,
+    ) -> list:
+        """
+        search_by_question for many questions in batched searches.
 
-        # Get question details
-        cursor = self.conn.cursor()
-        results = []
-        for qid, score in similar[:top_k]:
-            cursor.execute(
-                "SELECT question_text, diagnosis_type FROM questions WHERE question_id = ?",
-                (qid,)
-            )
-            row = cursor.fetchone()
-            if row:
-                results.append((qid, row[0], score, row[1]))
+        With same_diagnosis_only, questions are searched in one
+        search_similar_many call per diagnosis type.
 
+        Returns:
+            One result list (as for search_by_question) per question ID
+        """
+        self._load_embeddings()
+        if self.auto_refresh:
+            self.refresh()
+
+        # Question IDs with an embedding, grouped by their search filter
+        groups = {}
+        for i, question_id in enumerate(question_ids):
+            row = self._row_index.get(question_id)
+            if row is None:
+                continue
+            diagnosis_type = None
+            if same_diagnosis_only:
+                diagnosis_type = self._column_value("diagnosis_type", row)
+            groups.setdefault(diagnosis_type, []).append(i)
+
+        results = [[] for _ in question_ids]
+        for diagnosis_type, positions in groups.items():
+            # The query questions themselves are left out (exclude_self)
+            found = self.search_similar_many(
+                [question_ids[i] for i in positions], top_k=top_k,
+                diagnosis_type=diagnosis_type,
+            )
+            for i, similar in zip(positions, found):
+                for qid, score in similar:
+                    row = self._row_index[qid]
+                    results[i].append(
+                        (qid, self._texts[row], score, self._column_value("diagnosis_type", row))
+                    )
         return results
 
+    def question_similarities(
+        self,
+        question_ids: list,
+        other_ids: list,
+        same_diagnosis_only: bool = False,
+    ) -> np.ndarray:
+        """
+        Similarities between two lists of questions, as search_by_question scores them.
+
+        Args:
+            question_ids: Query question IDs
+            other_ids: Question IDs to score against
+            same_diagnosis_only: As for search_by_question (queries without
+                a diagnosis type are compared with every question)
+
+        Returns:
+            (len(question_ids), len(other_ids)) float64 array, NaN where a
+            question has no embedding or search_by_question wouldn't compare them
+        """
+        self._load_embeddings()
+        if self.auto_refresh:
+            self.refresh()
+
+        rows = np.array([self._row_index.get(qid, -1) for qid in question_ids], dtype=np.int64)
+        other_rows = np.array([self._row_index.get(qid, -1) for qid in other_ids], dtype=np.int64)
+        found, other_found = rows >= 0, other_rows >= 0
+        scores = np.full((len(rows), len(other_rows)), np.nan)
+        if not found.any() or not other_found.any():
+            return scores
+
+        rows, other_rows = rows[found], other_rows[other_found]
+        block = self._vectors(rows).astype(np.float64) @ self._vectors(other_rows).astype(np.float64).T
+        if same_diagnosis_only:
+            values, codes = self._metadata["diagnosis_type"]
+            query_codes = codes[rows]
+            filtered = np.array([values[code] is not None for code in query_codes], dtype=bool)
+            other_type = (query_codes[:, None] != codes[other_rows][None, :]) & filtered[:, None]
+            block[other_type] = np.nan
+        scores[np.ix_(found, other_found)] = block
+        return scores
+
     def find_cluster_members(self, master_id: str) -> list:
         """Find all questions in a cluster by master question ID."""
         cursor = self.conn.cursor()
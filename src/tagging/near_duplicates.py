@@ -0,0 +1,208 @@
+"""
+Near-Duplicate Question Detection
+
+Finds every pair of questions whose embedding cosine similarity is at
+least a threshold, over the whole question bank, and stores them in
+question_similarity (question_idx_a < question_idx_b).
+
+The n x n similarity matrix is never materialized: the upper triangle is
+computed in square tiles sized to a memory budget, one stripe of row
+blocks per task. Tasks run in a process pool; workers memory-map the
+embedding sidecar (see embedding_index), so the vectors are shared
+through the page cache instead of being copied to each process.
+
+Scores are computed in float32; pairs within FLOAT32_SLACK of the
+threshold are re-checked in float64 so the result doesn't depend on the
+tiling or worker count.
+
+Usage:
+    python src/tagging/near_duplicates.py --threshold 0.95 --workers 4
+"""
+
+import sys
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from db.connection import get_connection
+from tagging.embedding_index import EmbeddingIndex, read_embeddings
+
+DEFAULT_THRESHOLD = 0.95
+
+# Bytes of float32 scores per tile
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# float32 candidates this far below the threshold are re-checked in float64
+FLOAT32_SLACK = 1e-4
+
+# Vectors of the current process (set directly or by _init_worker)
+_vectors = None
+
+
+def _init_worker(path, shape):
+    global _vectors
+    _vectors = np.memmap(path, dtype=np.float32, mode="r", shape=shape)
+
+
+def _stripe_pairs(task):
+    """
+    Pairs above the threshold with the first row in one row block.
+
+    Args:
+        task: (row_start, row_stop, tile_size, threshold)
+
+    Returns:
+        (rows_a, rows_b, similarities) with rows_a < rows_b
+    """
+    start, stop, tile, threshold = task
+    vectors = _vectors
+    block = np.asarray(vectors[start:stop], dtype=np.float32)
+
+    rows_a, rows_b = [], []
+    for col_start in range(start, len(vectors), tile):
+        cols = np.asarray(vectors[col_start:col_start + tile], dtype=np.float32)
+        scores = block @ cols.T
+        if col_start == start:
+            # Diagonal tile: keep the strict upper triangle only
+            scores[np.tril_indices(len(block), 0, len(cols))] = -np.inf
+        a, b = np.nonzero(scores >= threshold - FLOAT32_SLACK)
+        rows_a.append(a + start)
+        rows_b.append(b + col_start)
+
+    rows_a = np.concatenate(rows_a).astype(np.int64)
+    rows_b = np.concatenate(rows_b).astype(np.int64)
+
+    # Exact check of the candidates
+    exact = np.einsum(
+        "ij,ij->i",
+        np.asarray(vectors[rows_a], dtype=np.float64),
+        np.asarray(vectors[rows_b], dtype=np.float64),
+    )
+    keep = exact >= threshold
+    return rows_a[keep], rows_b[keep], exact[keep]
+
+
+def find_pairs(
+    vectors,
+    threshold: float = DEFAULT_THRESHOLD,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    workers: int = None,
+    vectors_path=None,
+):
+    """
+    All row pairs with cosine similarity >= threshold.
+
+    Args:
+        vectors: Unit-normalized (n, dim) float32 matrix
+        threshold: Minimum similarity
+        memory_budget: Bytes of float32 scores per tile
+        workers: Processes (default: CPU count; 1 = in this process,
+            leaving parallelism to the BLAS library)
+        vectors_path: File vectors are memory-mapped from, needed to use
+            more than one process
+
+    Returns:
+        (rows_a, rows_b, similarities) sorted by (rows_a, rows_b)
+    """
+    global _vectors
+    n = len(vectors)
+    tile = max(1, int(np.sqrt(memory_budget / 4)))
+    tasks = [(start, min(start + tile, n), tile, threshold) for start in range(0, n, tile)]
+
+    workers = workers or os.cpu_count() or 1
+    if vectors_path is None or workers == 1 or len(tasks) <= 1:
+        _vectors = vectors
+        try:
+            results = [_stripe_pairs(task) for task in tasks]
+        finally:
+            _vectors = None
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)),
+            initializer=_init_worker,
+            initargs=(str(vectors_path), vectors.shape),
+        ) as pool:
+            results = list(pool.map(_stripe_pairs, tasks))
+
+    if not results:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float64)
+    rows_a = np.concatenate([r[0] for r in results])
+    rows_b = np.concatenate([r[1] for r in results])
+    similarities = np.concatenate([r[2] for r in results])
+    order = np.lexsort((rows_b, rows_a))
+    return rows_a[order], rows_b[order], similarities[order]
+
+
+def find_near_duplicates(
+    conn,
+    threshold: float = DEFAULT_THRESHOLD,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    workers: int = None,
+) -> int:
+    """
+    Recompute question_similarity for the whole question bank.
+
+    Args:
+        conn: Writable database connection
+        threshold: Minimum cosine similarity of a stored pair
+        memory_budget: Bytes of float32 scores per tile
+        workers: Processes (default: CPU count)
+
+    Returns:
+        Number of pairs stored
+    """
+    index = EmbeddingIndex.open_or_build(conn)
+    if index is not None:
+        question_idxs, vectors = index.question_idxs, index.vectors
+        vectors_path = index.index_dir / index.meta["vectors"]
+    else:
+        question_idxs, _, vectors = read_embeddings(conn)
+        vectors_path = None
+
+    rows_a, rows_b, similarities = find_pairs(
+        vectors, threshold, memory_budget, workers, vectors_path
+    )
+
+    question_idxs = np.asarray(question_idxs, dtype=np.int64)
+    idx_a = question_idxs[rows_a]
+    idx_b = question_idxs[rows_b]
+    swap = idx_a > idx_b
+    idx_a[swap], idx_b[swap] = idx_b[swap], idx_a[swap]
+
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM question_similarity")
+    cursor.executemany("""
+        INSERT INTO question_similarity (question_idx_a, question_idx_b, similarity)
+        VALUES (?, ?, ?)
+    """, zip(idx_a.tolist(), idx_b.tolist(), similarities.tolist()))
+    conn.commit()
+    return len(similarities)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate questions by embedding similarity")
+    parser.add_argument("--db", help="Database path (default: db/masterdb.sqlite)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--budget-mb", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="Tile memory budget in MB")
+    args = parser.parse_args()
+
+    conn = get_connection(args.db)
+    start = time.perf_counter()
+    count = find_near_duplicates(
+        conn, args.threshold, args.budget_mb * 1024 * 1024, args.workers
+    )
+    print(f"Stored {count:,} pairs with similarity >= {args.threshold} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
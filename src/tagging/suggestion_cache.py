@@ -0,0 +1,264 @@
+"""
+Tag Suggestion Cache
+
+Stored AutoTagger.suggest_tags results (tag_suggestions), so bulk tagging
+only recomputes questions whose inputs changed since the last run.
+
+A question's suggestions are derived from:
+- its own tags and cluster membership
+- its cluster representative's tags
+- its similar questions (embeddings of its diagnosis type) and their tags
+
+Each result is stored with the embedding and tag versions it was
+computed at (last embedding_changes / question_tag_changes seq) and its
+inputs (itself, representative and similar questions;
+tag_suggestion_inputs). A stored result is reused unless, since those
+versions:
+- a tag or cluster change was logged for one of its inputs,
+- an input's embedding or metadata changed, or
+- another question's embedding changed and now scores at least as high as
+  the last similar question found, so it would enter the search results.
+
+Results of an approximate (IVF) search are kept as found. Taxonomy edits
+(renamed or deleted terms) are not tracked: clear() after them.
+"""
+
+import sys
+import json
+from pathlib import Path
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from tagging.embedding_index import get_embedding_version
+from tagging.tag_matrix import get_tag_version
+
+# Similarities this close below the last similar question's count as entering
+SIMILARITY_SLACK = 1e-6
+
+# Bytes of float64 similarities computed per block when checking changed embeddings
+CHECK_MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+class SuggestionCache:
+    """Stored tag suggestions, stamped with the versions they were computed at."""
+
+    def __init__(self, conn, top_k: int, min_similarity: float):
+        """
+        Args:
+            conn: Database connection (reads)
+            top_k / min_similarity: Settings of the similarity suggestions;
+                results stored with other settings are recomputed
+        """
+        self.conn = conn
+        self.top_k = top_k
+        self.settings = json.dumps(
+            {"top_k": top_k, "min_similarity": min_similarity, "same_diagnosis_only": True},
+            sort_keys=True,
+        )
+
+    def versions(self) -> tuple:
+        """Current (embedding version, tag version), read before computing anything."""
+        return get_embedding_version(self.conn)["seq"], get_tag_version(self.conn)
+
+    # ============================================================
+    # LOOKUP
+    # ============================================================
+
+    def _stored(self, question_ids: list) -> dict:
+        """Stored rows of questions with the current settings: {question_id: entry}."""
+        cursor = self.conn.cursor()
+        entries = {}
+        for start in range(0, len(question_ids), 500):
+            chunk = question_ids[start:start + 500]
+            cursor.execute(f"""
+                SELECT q.question_id, s.question_idx, s.suggestions, s.neighbours,
+                       s.embedding_seq, s.tag_seq
+                FROM tag_suggestions s
+                JOIN questions q ON q.question_idx = s.question_idx
+                WHERE q.question_id IN ({', '.join('?' * len(chunk))})
+                AND s.settings = ?
+            """, [*chunk, self.settings])
+            for question_id, question_idx, suggestions, neighbours, embedding_seq, tag_seq in cursor:
+                entries[question_id] = {
+                    "question_idx": question_idx,
+                    "suggestions": suggestions,
+                    "neighbours": json.loads(neighbours),
+                    "embedding_seq": embedding_seq,
+                    "tag_seq": tag_seq,
+                }
+        return entries
+
+    def _changed_inputs(self, log: str, stamp_column: str, since: int) -> set:
+        """Stored questions with an input logged in log after their stamp."""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT DISTINCT i.question_idx
+            FROM {log} c
+            JOIN tag_suggestion_inputs i ON i.input_idx = c.question_idx
+            JOIN tag_suggestions s ON s.question_idx = i.question_idx
+            WHERE c.seq > ? AND c.seq > s.{stamp_column}
+        """, (since,))
+        return {row[0] for row in cursor.fetchall()}
+
+    def _entering(self, entries: dict, searcher) -> set:
+        """
+        Questions whose search results a changed embedding would enter.
+
+        Returns:
+            Question IDs of entries to recompute
+        """
+        since = min(entry["embedding_seq"] for entry in entries.values())
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT q.question_id, MAX(c.seq)
+            FROM embedding_changes c
+            JOIN questions q ON q.question_idx = c.question_idx
+            WHERE c.seq > ?
+            GROUP BY c.question_idx
+        """, (since,))
+        changed = cursor.fetchall()
+        if not changed:
+            return set()
+
+        changed_ids = [row[0] for row in changed]
+        changed_seqs = np.array([row[1] for row in changed], dtype=np.int64)
+        question_ids = list(entries)
+        block = max(1, CHECK_MEMORY_BUDGET // (8 * len(changed_ids)))
+        entering = set()
+
+        for start in range(0, len(question_ids), block):
+            chunk = question_ids[start:start + block]
+            scores = searcher.question_similarities(chunk, changed_ids, same_diagnosis_only=True)
+            # Fewer than top_k results: anything scoring above 0 would be found
+            thresholds = np.array([
+                entries[qid]["neighbours"][-1][1]
+                if len(entries[qid]["neighbours"]) >= self.top_k else 0.0
+                for qid in chunk
+            ])
+            stamps = np.array([entries[qid]["embedding_seq"] for qid in chunk], dtype=np.int64)
+            hit = (
+                (scores >= thresholds[:, None] - SIMILARITY_SLACK)
+                & (changed_seqs[None, :] > stamps[:, None])
+            )
+            entering.update(qid for qid, row_hit in zip(chunk, hit.any(axis=1)) if row_hit)
+        return entering
+
+    def load(self, question_ids: list, searcher) -> dict:
+        """
+        Stored suggestions of questions that are still valid.
+
+        Args:
+            question_ids: Questions to look up
+            searcher: EmbeddingSearch the suggestions would be computed with
+
+        Returns:
+            {question_id: entry} with suggestions (JSON), neighbours
+            ([question_id, similarity] pairs), question_idx and versions
+        """
+        entries = self._stored(question_ids)
+        if not entries:
+            return {}
+
+        stale = self._changed_inputs(
+            "question_tag_changes", "tag_seq", min(e["tag_seq"] for e in entries.values())
+        )
+        stale |= self._changed_inputs(
+            "embedding_changes", "embedding_seq", min(e["embedding_seq"] for e in entries.values())
+        )
+        entries = {qid: e for qid, e in entries.items() if e["question_idx"] not in stale}
+        if entries:
+            for qid in self._entering(entries, searcher):
+                del entries[qid]
+        return entries
+
+    # ============================================================
+    # STORAGE
+    # ============================================================
+
+    def store(self, conn, results: list, versions: tuple):
+        """
+        Store computed suggestions.
+
+        Args:
+            conn: Writable connection (inside the caller's transaction)
+            results: (question_id, suggestions, neighbours, representative
+                question_id or None) per question; neighbours are
+                (question_id, similarity) pairs, most similar first
+            versions: versions() read before the suggestions were computed
+        """
+        question_ids = {qid for result in results for qid in self._inputs(result)}
+        idxs = self._question_idxs(list(question_ids))
+        embedding_seq, tag_seq = versions
+
+        rows, inputs = [], []
+        for result in results:
+            question_idx = idxs.get(result[0])
+            if question_idx is None:
+                continue
+            rows.append((
+                question_idx, json.dumps(result[1]), json.dumps([list(n) for n in result[2]]),
+                self.settings, embedding_seq, tag_seq,
+            ))
+            inputs.extend(
+                (question_idx, idxs[qid]) for qid in set(self._inputs(result)) if qid in idxs
+            )
+
+        conn.executemany("""
+            INSERT INTO tag_suggestions
+            (question_idx, suggestions, neighbours, settings, embedding_seq, tag_seq)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(question_idx) DO UPDATE SET
+                suggestions = excluded.suggestions,
+                neighbours = excluded.neighbours,
+                settings = excluded.settings,
+                embedding_seq = excluded.embedding_seq,
+                tag_seq = excluded.tag_seq,
+                created_at = CURRENT_TIMESTAMP
+        """, rows)
+        conn.executemany(
+            "DELETE FROM tag_suggestion_inputs WHERE question_idx = ?",
+            [(row[0],) for row in rows],
+        )
+        conn.executemany(
+            "INSERT INTO tag_suggestion_inputs (question_idx, input_idx) VALUES (?, ?)",
+            inputs,
+        )
+
+    def restamp(self, conn, entries: list, versions: tuple):
+        """Move entries checked by load() to the versions read before loading them."""
+        embedding_seq, tag_seq = versions
+        conn.executemany("""
+            UPDATE tag_suggestions SET embedding_seq = ?, tag_seq = ?
+            WHERE question_idx = ?
+        """, [
+            (embedding_seq, tag_seq, entry["question_idx"]) for entry in entries
+            if (entry["embedding_seq"], entry["tag_seq"]) != versions
+        ])
+
+    def clear(self, conn):
+        """Drop all stored suggestions."""
+        conn.execute("DELETE FROM tag_suggestion_inputs")
+        conn.execute("DELETE FROM tag_suggestions")
+
+    @staticmethod
+    def _inputs(result) -> list:
+        question_id, _, neighbours, rep_question_id = result
+        inputs = [question_id] + [qid for qid, _ in neighbours]
+        if rep_question_id is not None:
+            inputs.append(rep_question_id)
+        return inputs
+
+    def _question_idxs(self, question_ids: list) -> dict:
+        """{question_id: question_idx}"""
+        cursor = self.conn.cursor()
+        idxs = {}
+        for start in range(0, len(question_ids), 500):
+            chunk = question_ids[start:start + 500]
+            cursor.execute(f"""
+                SELECT question_id, question_idx FROM questions
+                WHERE question_id IN ({', '.join('?' * len(chunk))})
+            """, chunk)
+            idxs.update(cursor.fetchall())
+        return idxs
@@ -0,0 +1,325 @@
+"""
+In-Memory Tag Matrix
+
+question_tags as sparse question × term matrices, one layer per tag type
+(themes, concepts, aspects):
+
+- confidence: tag confidence (CSR)
+- order: qt.id of the tag, so a question's tags come back in insertion
+  order (as get_question_tags returns them)
+
+Rows are all questions (by question_idx), columns all taxonomy terms (by
+term_id). The matrix is loaded once; tags applied through add() go to a
+small overlay that is merged into the CSR layers before the next bulk
+product. The load is re-done when question_tags changed behind its back
+(tag version, row count or last id differs from the loaded stamp).
+
+Neighbour voting (AutoTagger.suggest_from_similar) for many questions
+becomes one sparse product per neighbour rank and layer: see
+neighbour_votes.
+"""
+
+import sys
+from pathlib import Path
+import numpy as np
+from scipy import sparse
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from db.stats import get_stats
+
+TAG_TYPES = ("themes", "concepts", "aspects")
+
+
+def get_tag_version(conn) -> int:
+    """Current tag version: last question_tag_changes seq (see migration step 12)."""
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'question_tag_changes'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+class TagMatrix:
+    """Sparse question × term layers of question_tags."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._stamp = None
+        self.question_ids = []      # question_id of each row
+        self.term_ids = []          # term_id of each column
+        self.terms = []             # (term, term_type) of each column
+        self._rows = {}             # question_id -> row
+        self._cols = {}             # term_id -> column
+        self.confidence = {}        # tag_type -> CSR (n_questions, n_terms)
+        self.order = {}             # tag_type -> CSR of qt.id
+        self._pending = {}          # row -> {(tag_type, col): (confidence, order)}
+        self._next_order = 1
+
+    # ============================================================
+    # LOADING
+    # ============================================================
+
+    def _current_stamp(self):
+        """Identify the current question_tags content (tag version, count, last id)."""
+        max_id = self.conn.execute("SELECT MAX(id) FROM question_tags").fetchone()[0]
+        return get_tag_version(self.conn), get_stats(self.conn).count("question_tags"), max_id or 0
+
+    def refresh(self) -> bool:
+        """Reload if question_tags changed since the last load. Returns True if reloaded."""
+        stamp = self._current_stamp()
+        if self._stamp is not None and stamp == self._stamp:
+            return False
+        self.load(stamp)
+        return True
+
+    def load(self, stamp=None):
+        """Read questions, terms and question_tags."""
+        stamp = stamp or self._current_stamp()
+        cursor = self.conn.cursor()
+
+        cursor.execute("SELECT question_idx, question_id FROM questions ORDER BY question_idx")
+        row_by_idx = {}
+        self.question_ids = []
+        for question_idx, question_id in cursor.fetchall():
+            row_by_idx[question_idx] = len(self.question_ids)
+            self.question_ids.append(question_id)
+        self._rows = {qid: i for i, qid in enumerate(self.question_ids)}
+
+        cursor.execute("SELECT term_id, term, term_type FROM taxonomy ORDER BY term_id")
+        terms = cursor.fetchall()
+        self.term_ids = [row[0] for row in terms]
+        self.terms = [(row[1], row[2]) for row in terms]
+        self._cols = {term_id: i for i, term_id in enumerate(self.term_ids)}
+
+        cursor.execute("""
+            SELECT id, question_idx, term_id, tag_type, confidence
+            FROM question_tags
+            WHERE question_idx IS NOT NULL AND term_id IS NOT NULL
+        """)
+        entries = {tag_type: ([], [], [], []) for tag_type in TAG_TYPES}
+        for tag_id, question_idx, term_id, tag_type, confidence in cursor.fetchall():
+            row = row_by_idx.get(question_idx)
+            col = self._cols.get(term_id)
+            if row is None or col is None or tag_type not in entries:
+                continue
+            rows, cols, values, orders = entries[tag_type]
+            rows.append(row)
+            cols.append(col)
+            values.append(confidence if confidence is not None else np.nan)
+            orders.append(tag_id)
+
+        for tag_type, (rows, cols, values, orders) in entries.items():
+            self._set_layer(tag_type, rows, cols, values, orders)
+
+        self._pending = {}
+        self._next_order = stamp[2] + 1
+        self._stamp = stamp
+
+    def _ensure_loaded(self):
+        if self._stamp is None:
+            self.load()
+
+    def sync_stamp(self):
+        """Accept the current question_tags content as loaded (after writing through add())."""
+        self._stamp = self._current_stamp()
+        self._next_order = max(self._next_order, self._stamp[2] + 1)
+
+    @property
+    def shape(self):
+        return len(self.question_ids), len(self.term_ids)
+
+    # ============================================================
+    # UPDATES
+    # ============================================================
+
+    def invalidate(self):
+        """Force the next refresh() to reload."""
+        self._stamp = None
+
+    def row(self, question_id: str) -> int:
+        """Row of a question (None if unknown)."""
+        return self._rows.get(question_id)
+
+    def ensure_rows(self, question_ids):
+        """Add empty rows for questions created after the load (they have no tags yet)."""
+        self._ensure_loaded()
+        for question_id in question_ids:
+            if question_id not in self._rows:
+                self._rows[question_id] = len(self.question_ids)
+                self.question_ids.append(question_id)
+
+    def add(self, question_id: str, term_id: int, tag_type: str, confidence: float) -> bool:
+        """
+        Record an applied tag (insert, or confidence update of an existing tag).
+
+        Returns:
+            False if the question or term is unknown (nothing recorded)
+        """
+        self._ensure_loaded()
+        row = self._rows.get(question_id)
+        col = self._cols.get(term_id)
+        if row is None or col is None:
+            return False
+        if tag_type not in TAG_TYPES:
+            return True
+
+        pending = self._pending.get(row, {})
+        if (tag_type, col) in pending:
+            pending[tag_type, col] = (confidence, pending[tag_type, col][1])
+            return True
+
+        layer = self.confidence[tag_type]
+        if row < layer.shape[0]:
+            start, stop = layer.indptr[row], layer.indptr[row + 1]
+            hit = np.flatnonzero(layer.indices[start:stop] == col)
+            if len(hit):
+                layer.data[start + hit[0]] = np.nan if confidence is None else confidence
+                return True
+
+        self._pending.setdefault(row, {})[tag_type, col] = (confidence, self._next_order)
+        self._next_order += 1
+        return True
+
+    def _set_layer(self, tag_type, rows, cols, values, orders):
+        """Build both CSR layers of a tag type from the same coordinates.
+
+        Built from COO (not added up), so tags with confidence 0 keep their entry.
+        """
+        shape = self.shape
+        values = np.array(values, dtype=np.float64)
+        self.confidence[tag_type] = sparse.csr_matrix((values, (rows, cols)), shape=shape)
+        self.order[tag_type] = sparse.csr_matrix(
+            (np.array(orders, dtype=np.int64), (rows, cols)), shape=shape
+        )
+
+    def _consolidate(self):
+        """Merge the overlay of added tags into the CSR layers."""
+        self._ensure_loaded()
+        pending = {tag_type: ([], [], [], []) for tag_type in TAG_TYPES}
+        for row, entries in self._pending.items():
+            for (tag_type, col), (confidence, tag_order) in entries.items():
+                rows, cols, values, orders = pending[tag_type]
+                rows.append(row)
+                cols.append(col)
+                values.append(np.nan if confidence is None else confidence)
+                orders.append(tag_order)
+
+        for tag_type, (rows, cols, values, orders) in pending.items():
+            if not rows and self.confidence[tag_type].shape == self.shape:
+                continue
+            current = self.confidence[tag_type].tocoo()
+            current_orders = self.order[tag_type].tocoo()
+            self._set_layer(
+                tag_type,
+                np.concatenate((current.row, rows)).astype(np.int64),
+                np.concatenate((current.col, cols)).astype(np.int64),
+                np.concatenate((current.data, values)),
+                np.concatenate((current_orders.data, orders)),
+            )
+        self._pending = {}
+
+    # ============================================================
+    # LOOKUPS
+    # ============================================================
+
+    def question_tags(self, question_id: str) -> dict:
+        """Tags of a question, as returned by AutoTagger.get_question_tags."""
+        self._ensure_loaded()
+        tags = {tag_type: [] for tag_type in TAG_TYPES}
+        row = self._rows.get(question_id)
+        if row is None:
+            return tags
+
+        pending = self._pending.get(row, {})
+        for tag_type in TAG_TYPES:
+            entries = []
+            layer = self.confidence[tag_type]
+            if row < layer.shape[0]:
+                start, stop = layer.indptr[row:row + 2].tolist()
+                if start != stop:
+                    entries.extend(zip(
+                        self.order[tag_type].data[start:stop].tolist(),
+                        layer.indices[start:stop].tolist(),
+                        layer.data[start:stop].tolist(),
+                    ))
+            for (pending_type, col), (confidence, tag_order) in pending.items():
+                if pending_type == tag_type:
+                    entries.append((tag_order, col, confidence))
+
+            for _, col, confidence in sorted(entries):
+                term, term_type = self.terms[col]
+                tags[tag_type].append({
+                    "term_id": self.term_ids[col],
+                    "term": term,
+                    "term_type": term_type,
+                    "confidence": None if confidence != confidence else confidence,
+                })
+        return tags
+
+    def neighbour_votes(self, neighbours: np.ndarray, similarities: np.ndarray) -> dict:
+        """
+        Similarity-weighted tag votes of each target's neighbours.
+
+        Votes are added one neighbour rank at a time (most similar first),
+        in the same order as AutoTagger._similar_suggestions adds them, so
+        sums match it exactly.
+
+        Args:
+            neighbours: (m, k) rows of each target's voting neighbours, most
+                similar first, -1 where there is none
+            similarities: (m, k) similarity of each neighbour
+
+        Returns:
+            Dict of dense arrays (n_terms columns):
+            - scores[tag_type]: (m, n_terms) summed similarity of the votes
+            - votes[tag_type]: (m, n_terms) number of votes
+            - first[tag_type]: (rank, qt.id) of the first vote, as sort keys
+            - rank_votes: (k, m, n_terms) tag types in which each rank's
+              neighbour has the term
+        """
+        self._consolidate()
+        m, k = neighbours.shape
+        n_rows, n_terms = self.shape
+        targets = np.arange(m)
+
+        scores = {t: np.zeros((m, n_terms)) for t in TAG_TYPES}
+        votes = {t: np.zeros((m, n_terms), dtype=np.int64) for t in TAG_TYPES}
+        first_rank = {t: np.full((m, n_terms), k, dtype=np.int64) for t in TAG_TYPES}
+        first_order = {t: np.zeros((m, n_terms), dtype=np.int64) for t in TAG_TYPES}
+        rank_votes = np.zeros((k, m, n_terms), dtype=np.int8)
+
+        present = {}
+        for t in TAG_TYPES:
+            present[t] = self.confidence[t].copy()
+            present[t].data = np.ones_like(present[t].data)
+
+        for rank in range(k):
+            valid = neighbours[:, rank] >= 0
+            if not valid.any():
+                continue
+            cols = neighbours[valid, rank]
+            weighted = sparse.csr_matrix(
+                (similarities[valid, rank].astype(np.float64), (targets[valid], cols)),
+                shape=(m, n_rows),
+            )
+            picked = sparse.csr_matrix(
+                (np.ones(int(valid.sum())), (targets[valid], cols)), shape=(m, n_rows)
+            )
+            for t in TAG_TYPES:
+                # One neighbour per target and rank: each entry is a single product
+                hit = (picked @ present[t]).toarray() > 0
+                scores[t] += (weighted @ present[t]).toarray()
+                votes[t] += hit
+                rank_votes[rank] += hit
+
+                new = hit & (first_rank[t] == k)
+                first_rank[t][new] = rank
+                first_order[t][new] = (picked @ self.order[t]).toarray()[new]
+
+        return {
+            "scores": scores,
+            "votes": votes,
+            "first": {t: (first_rank[t], first_order[t]) for t in TAG_TYPES},
+            "rank_votes": rank_votes,
+        }
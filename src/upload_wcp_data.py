@@ -3,79 +3,21 @@
 W컨셉 신규 데이터 MasterDB 업로드 스크립트
 """
 import pandas as pd
-import sqlite3
 import sys
 import json
 
-def create_response_tables(cursor):
-    """응답 데이터 저장용 테이블 생성"""
-
-    # 응답자 테이블
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS respondents (
-            respondent_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            survey_id TEXT NOT NULL,
-            original_id TEXT,              -- 원본 ID
-
-            -- 인구통계
-            gender TEXT,                   -- 성별
-            age INTEGER,                   -- 나이
-            tenure INTEGER,                -- 근속연수
-            experience INTEGER,            -- 경력연수
-            rank TEXT,                     -- 직급
-            position TEXT,                 -- 직책
-            job_group TEXT,                -- 직군
-            job_function TEXT,             -- 직무
-
-            -- 조직 정보
-            org_level_1 TEXT,
-            org_level_2 TEXT,
-            org_level_3 TEXT,
-            org_level_4 TEXT,
-            org_level_5 TEXT,
-
-            -- MA 전용 (피평가자 정보)
-            target_info TEXT,              -- 피평가자 정보
-            target_name TEXT,              -- 피평가자 이름
-            target_org TEXT,               -- 피평가자 조직
-            target_position TEXT,          -- 피평가자 직책
-            evaluator_type TEXT,           -- 평가 유형 (본인/상향/하향/동료)
-
-            -- 유효성
-            is_valid INTEGER DEFAULT 1,
-
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-            FOREIGN KEY (survey_id) REFERENCES surveys(survey_id)
-        )
-    """)
-
-    # 응답 데이터 테이블 (Long format - 정규화)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS responses (
-            response_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            respondent_id INTEGER NOT NULL,
-            question_no TEXT NOT NULL,     -- r001, r002, ...
-            response_value TEXT,           -- 응답값 (문자열로 저장)
-
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-            FOREIGN KEY (respondent_id) REFERENCES respondents(respondent_id)
-        )
-    """)
-
-    # 인덱스 생성
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_respondents_survey ON respondents(survey_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_responses_respondent ON responses(respondent_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_responses_question ON responses(question_no)")
+from db.connection import get_connection
+from db.migrations import migrate
+from db.responses import ResponseWriter, delete_survey_responses
+from query.response_matrix import ResponseMatrixCache
+from tagging.embedding_pipeline import embed_missing
 
 def main():
-    conn = sqlite3.connect('db/masterdb.sqlite')
+    conn = get_connection('db/masterdb.sqlite', profile='bulk')
     cursor = conn.cursor()
 
-    # 응답 테이블 생성
-    create_response_tables(cursor)
-    conn.commit()
+    # 스키마 최신화 (응답 테이블 포함, 기존 데이터 유지)
+    migrate(conn)
 
     # =====================================================
     # 1. OD Survey 업로드
@@ -89,9 +31,21 @@ def main():
     survey_year = 2025
     survey_month = 12
 
-    # 기존 데이터 삭제
-    cursor.execute(f"DELETE FROM surveys WHERE survey_id = ?", (survey_id,))
-    cursor.execute(f"DELETE FROM survey_questions WHERE survey_id = ?", (survey_id,))
+    # 회사 등록 (FK 검사용, 이미 있으면 유지)
+    cursor.execute("""
+        INSERT OR IGNORE INTO companies (company_id, company_name, company_name_short)
+        VALUES (?, ?, ?)
+    """, (company_id, '더블유컨셉코리아', 'W컨셉'))
+
+    # 기존 데이터 삭제 (응답 → 응답자 → survey_questions → surveys 순서)
+    # 카운터 트리거가 삭제되는 survey 행을 갱신하도록 surveys를 마지막에 삭제
+    delete_survey_responses(cursor, survey_id)
+    cursor.execute("DELETE FROM respondents WHERE survey_id = ?", (survey_id,))
+    cursor.execute("""
+        DELETE FROM survey_questions
+        WHERE survey_idx = (SELECT survey_idx FROM surveys WHERE survey_id = ?)
+    """, (survey_id,))
+    cursor.execute("DELETE FROM surveys WHERE survey_id = ?", (survey_id,))
 
     # Survey 등록
     cursor.execute("""
@@ -145,9 +99,11 @@ def main():
         section_name = row.get('category_1')
 
         cursor.execute("""
-            INSERT INTO survey_questions (survey_id, question_id, question_order, is_required, scale_type, section_name)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (survey_id, q_id, idx + 1, is_required, scale_type, section_name))
+            INSERT INTO survey_questions (survey_idx, question_idx, question_order, is_required, scale_type, section_name)
+            SELECT s.survey_idx, q.question_idx, ?, ?, ?, ?
+            FROM surveys s, questions q
+            WHERE s.survey_id = ? AND q.question_id = ?
+        """, (idx + 1, is_required, scale_type, section_name, survey_id, q_id))
         linked_questions += 1
 
     print(f'  신규 문항: {new_questions}개')
@@ -157,8 +113,7 @@ def main():
     print('  RawData 업로드 중...')
     df_od_raw = pd.read_excel('ExcelTable/SurveyRawData/IG202512WCPOD_RawData.xlsx', sheet_name='Sheet1')
 
-    # 기존 응답 데이터 삭제
-    cursor.execute("DELETE FROM respondents WHERE survey_id = ?", (survey_id,))
+    response_writer = ResponseWriter(conn.cursor())
 
     # 응답 컬럼 식별
     response_cols = [c for c in df_od_raw.columns if str(c).startswith('r')]
@@ -193,20 +148,19 @@ def main():
         ))
         respondent_id = cursor.lastrowid
 
-        # 응답 데이터 저장
+        # 응답 데이터 저장 (정수 응답 / 텍스트 응답 분리)
         for col in response_cols:
             val = row.get(col)
             if pd.notna(val):
-                cursor.execute("""
-                    INSERT INTO responses (respondent_id, question_no, response_value)
-                    VALUES (?, ?, ?)
-                """, (respondent_id, col, str(val)))
+                response_writer.add(respondent_id, col, val)
+
+    response_writer.flush()
 
-    # Survey 테이블에 응답자 수 업데이트
+    # Survey 테이블에 문항 수 업데이트 (응답자 수는 트리거가 갱신)
     cursor.execute("""
-        UPDATE surveys SET question_count = ?, actual_respondent_count = ?
+        UPDATE surveys SET question_count = ?
         WHERE survey_id = ?
-    """, (len(df_od), len(df_od_raw), survey_id))
+    """, (len(df_od), survey_id))
 
     conn.commit()
     print(f'  응답자 수: {len(df_od_raw)}명')
@@ -237,9 +191,14 @@ def main():
         survey_id_ma = f'IG202512WCPMA_{subtype_code}'
         survey_name_ma = f'IG202512_더블유컨셉코리아 다면평가 ({sheet_name})'
 
-        # 기존 데이터 삭제
+        # 기존 데이터 삭제 (응답 → 응답자 → survey_questions → surveys 순서)
+        delete_survey_responses(cursor, survey_id_ma)
+        cursor.execute("DELETE FROM respondents WHERE survey_id = ?", (survey_id_ma,))
+        cursor.execute("""
+            DELETE FROM survey_questions
+            WHERE survey_idx = (SELECT survey_idx FROM surveys WHERE survey_id = ?)
+        """, (survey_id_ma,))
         cursor.execute("DELETE FROM surveys WHERE survey_id = ?", (survey_id_ma,))
-        cursor.execute("DELETE FROM survey_questions WHERE survey_id = ?", (survey_id_ma,))
 
         # Survey 등록
         cursor.execute("""
@@ -303,9 +262,11 @@ def main():
             section_name = row.get('분류', sheet_name)
 
             cursor.execute("""
-                INSERT INTO survey_questions (survey_id, question_id, question_order, is_required, scale_type, section_name)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (survey_id_ma, q_id, idx + 1, is_required, scale_type, section_name))
+                INSERT INTO survey_questions (survey_idx, question_idx, question_order, is_required, scale_type, section_name)
+                SELECT s.survey_idx, q.question_idx, ?, ?, ?, ?
+                FROM surveys s, questions q
+                WHERE s.survey_id = ? AND q.question_id = ?
+            """, (idx + 1, is_required, scale_type, section_name, survey_id_ma, q_id))
             linked_questions_ma += 1
 
         # Survey 테이블에 문항 수 업데이트
@@ -339,9 +300,8 @@ def main():
         506: 'IG202512WCPMA_JO',
     }
 
-    # 기존 MA 응답 데이터 삭제
-    for sid in survey_type_mapping.values():
-        cursor.execute("DELETE FROM respondents WHERE survey_id = ?", (sid,))
+    # 기존 MA 응답 데이터는 2단계에서 survey와 함께 삭제됨
+    response_writer = ResponseWriter(conn.cursor())
 
     # 응답 컬럼 식별
     response_cols_ma = [c for c in df_ma_raw.columns if str(c).startswith('r')]
@@ -394,25 +354,20 @@ def main():
         ))
         respondent_id = cursor.lastrowid
 
-        # 응답 데이터 저장
+        # 응답 데이터 저장 (정수 응답 / 텍스트 응답 분리)
         for col in response_cols_ma:
             val = row.get(col)
             if pd.notna(val):
-                cursor.execute("""
-                    INSERT INTO responses (respondent_id, question_no, response_value)
-                    VALUES (?, ?, ?)
-                """, (respondent_id, col, str(val)))
+                response_writer.add(respondent_id, col, val)
 
+    # 서브타입별 응답자 수(actual_respondent_count)는 트리거가 갱신
+    response_writer.flush()
     conn.commit()
 
-    # 서브타입별 응답자 수 업데이트
-    for survey_id_ma, count in subtype_counts.items():
-        cursor.execute("""
-            UPDATE surveys SET actual_respondent_count = ?
-            WHERE survey_id = ?
-        """, (count, survey_id_ma))
-
-    conn.commit()
+    # 재업로드된 설문의 응답 행렬 캐시 삭제 (다음 조회 시 재생성)
+    matrix_cache = ResponseMatrixCache(conn)
+    for sid in [survey_id, *survey_type_mapping.values()]:
+        matrix_cache.invalidate(sid)
 
     print(f'  MA RawData 업로드 완료:')
     for sid, count in sorted(subtype_counts.items()):
@@ -421,7 +376,20 @@ def main():
     print()
 
     # =====================================================
-    # 4. 결과 확인
+    # 4. 신규 문항 임베딩 생성
+    # =====================================================
+    # 임베딩이 없는 문항만 인코딩 (동일 텍스트는 embedding_cache 재사용)
+    print('=== 신규 문항 임베딩 생성 ===')
+    try:
+        embedded = embed_missing(conn)
+        print(f"  임베딩 생성: {embedded['questions']}개 문항 "
+              f"(인코딩 {embedded['encoded']}건, 캐시 {embedded['cached']}건)")
+    except ImportError:
+        print('  sentence_transformers 미설치: python src/tagging/embedding_pipeline.py 로 별도 실행')
+    print()
+
+    # =====================================================
+    # 5. 결과 확인
     # =====================================================
     print('=== 업로드 결과 ===')
     surveys = pd.read_sql("""
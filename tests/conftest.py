@@ -0,0 +1,47 @@
+"""Shared test setup: modules are imported from src/, as the scripts do."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from db.connection import get_connection
+from db.migrations import migrate
+
+DIAGNOSIS_TYPES = ["OD", "LD", "MA", "DD"]
+
+
+@pytest.fixture
+def question_bank(tmp_path):
+    """
+    Factory for a file database of questions with clustered random embeddings.
+
+    Question i (Q_00000, ...) belongs to cluster i % clusters, and its
+    diagnosis type follows the cluster.
+    """
+    def build(n=500, dim=32, clusters=20, seed=0):
+        rng = np.random.default_rng(seed)
+        centers = rng.normal(size=(clusters, dim))
+        conn = get_connection(tmp_path / "masterdb.sqlite")
+        migrate(conn)
+        for i in range(n):
+            cluster = i % clusters
+            question_idx = conn.execute("""
+                INSERT INTO questions (question_id, question_text, diagnosis_type, cluster_id)
+                VALUES (?, ?, ?, ?)
+            """, (
+                f"Q_{i:05d}", f"question {i}", DIAGNOSIS_TYPES[cluster % len(DIAGNOSIS_TYPES)], cluster,
+            )).lastrowid
+            vector = centers[cluster] + rng.normal(scale=0.5, size=dim)
+            conn.execute(
+                "INSERT INTO embeddings (question_idx, embedding) VALUES (?, ?)",
+                (question_idx, vector.astype(np.float32).tobytes()),
+            )
+        conn.commit()
+        return conn
+
+    return build
@@ -0,0 +1,26 @@
+"""IVF index: recall@k of approximate search against exact search."""
+
+import pytest
+
+from tagging.ann_index import benchmark
+from tagging.embedding_search import EmbeddingSearch
+
+TOP_K = 10
+
+
+@pytest.fixture
+def searcher(question_bank, tmp_path):
+    conn = question_bank(n=2000, dim=32, clusters=40)
+    return EmbeddingSearch(conn, index_dir=tmp_path / "embedding_index", ann=True)
+
+
+def test_recall_at_k(searcher):
+    results = benchmark(searcher, n_queries=100, top_k=TOP_K, nprobes=(8,))
+    assert results[1]["nprobe"] == 8
+    assert results[1]["recall"] >= 0.95
+
+
+def test_probing_every_cell_is_exact(searcher):
+    n_lists = searcher.load_ann_index().n_lists
+    [_, result] = benchmark(searcher, n_queries=50, top_k=TOP_K, nprobes=(n_lists,))
+    assert result["recall"] == 1.0
@@ -0,0 +1,142 @@
+"""Bulk tag suggestions match the per-question path."""
+
+import random
+
+import pytest
+
+from db.connection import get_connection
+from db.migrations import migrate
+from migration.init_taxonomy import ASPECT_GROUPS, CONCEPT_MAPPINGS, create_question_tags, init_taxonomy
+from tagging import auto_tagger
+from tagging.auto_tagger import AutoTagger
+from tagging.embedding_pipeline import HashingEncoder, embed_missing
+
+N_QUESTIONS = 300
+N_CLUSTERS = 15
+TOPICS = ["비전", "전략", "리더", "소통", "보상", "평가", "몰입", "협업", "성장", "문화", "제도", "목표"]
+FILLER = ["우리", "회사", "팀", "구성원", "업무", "충분히", "잘", "항상", "명확하게", "적극적으로"]
+QUESTION_TAGS_SQL = """
+    SELECT question_idx, term_id, tag_type, confidence, is_auto_tagged
+    FROM question_tags ORDER BY question_idx, tag_type, term_id
+"""
+
+
+@pytest.fixture(scope="module")
+def source_db(tmp_path_factory):
+    """Question bank with HashingEncoder embeddings, clusters and partial tags."""
+    path = tmp_path_factory.mktemp("source") / "masterdb.sqlite"
+    conn = get_connection(path)
+    migrate(conn)
+
+    rng = random.Random(0)
+    concepts = list(CONCEPT_MAPPINGS)
+    aspects = [sub for subs in ASPECT_GROUPS.values() for sub in subs]
+    for i in range(N_QUESTIONS):
+        cluster = i % N_CLUSTERS
+        words = [TOPICS[cluster % len(TOPICS)], TOPICS[(cluster * 5 + 1) % len(TOPICS)]]
+        words += rng.sample(FILLER, 3)
+        rng.shuffle(words)
+        conn.execute("""
+            INSERT INTO questions (
+                question_id, question_text, diagnosis_type, cluster_id, master_question_id,
+                is_representative, legacy_mid_category, legacy_sub_category
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            f"Q_{i:05d}", " ".join(words) + f" {i}", ["OD", "LD"][cluster % 2], cluster,
+            f"OD_{cluster:04d}", int(i < N_CLUSTERS),
+            concepts[cluster % len(concepts)] if rng.random() < 0.8 else None,
+            aspects[(cluster + i % 2) % len(aspects)] if rng.random() < 0.5 else None,
+        ))
+    conn.executemany("""
+        INSERT INTO master_questions (master_id, question_idx, diagnosis_type)
+        VALUES (?, ?, 'OD')
+    """, [(f"OD_{c:04d}", c + 1) for c in range(N_CLUSTERS)])
+    conn.commit()
+
+    embed_missing(conn, HashingEncoder(64))
+    create_question_tags(conn, init_taxonomy(conn))
+    conn.execute("DELETE FROM question_tags WHERE tag_type = 'themes' AND question_idx % 4 = 0")
+    conn.commit()
+    return conn
+
+
+@pytest.fixture
+def copy_db(source_db, tmp_path):
+    """Independent copies of the source database (each with its own sidecar)."""
+    count = 0
+
+    def copy():
+        nonlocal count
+        count += 1
+        path = tmp_path / f"copy{count}" / "masterdb.sqlite"
+        path.parent.mkdir()
+        conn = get_connection(path)
+        source_db.backup(conn)
+        return conn
+
+    return copy
+
+
+@pytest.fixture(autouse=True)
+def small_shards(monkeypatch):
+    # Several shards per run, so shard boundaries are exercised
+    monkeypatch.setattr(auto_tagger, "SHARD_SIZE", 8)
+
+
+def per_question_auto_tag(tagger, tag_type, min_confidence, limit):
+    """auto_tag_untagged as done one question at a time before the bulk engine."""
+    questions = [row[0] for row in tagger.conn.execute("""
+        SELECT q.question_id FROM questions q
+        WHERE q.question_idx NOT IN (SELECT question_idx FROM question_tags WHERE tag_type = ?)
+        LIMIT ?
+    """, (tag_type, limit))]
+
+    tagged = 0
+    for qid in questions:
+        suggestions = tagger.suggest_tags(qid)
+        if suggestions.get(tag_type):
+            best = suggestions[tag_type][0]
+            if best["confidence"] >= min_confidence:
+                tagger.apply_tag(qid, best["term_id"], tag_type, best["confidence"], is_auto=True)
+                tagged += 1
+    return tagged
+
+
+def question_tags(conn):
+    return [tuple(row) for row in conn.execute(QUESTION_TAGS_SQL)]
+
+
+def test_suggest_tags_many_matches_suggest_tags(copy_db):
+    conn = copy_db()
+    question_ids = [f"Q_{i:05d}" for i in range(N_QUESTIONS)]
+    expected = [AutoTagger(conn).suggest_tags(qid) for qid in question_ids]
+
+    assert AutoTagger(conn).suggest_tags_many(question_ids, use_cache=False) == expected
+    assert AutoTagger(conn).suggest_tags_many(question_ids, workers=2, use_cache=False) == expected
+
+    # First run stores the suggestions, the second serves them from the cache
+    assert AutoTagger(conn).suggest_tags_many(question_ids) == expected
+    stored = conn.execute("SELECT COUNT(*) FROM tag_suggestions").fetchone()[0]
+    assert stored == N_QUESTIONS
+    assert AutoTagger(conn).suggest_tags_many(question_ids) == expected
+
+
+@pytest.mark.parametrize("workers, use_cache", [(1, False), (2, False), (1, True), (2, True)])
+@pytest.mark.parametrize("tag_type, min_confidence", [("themes", 0.5), ("aspects", 0.3)])
+def test_auto_tag_untagged_matches_per_question(copy_db, workers, use_cache, tag_type, min_confidence):
+    reference, bulk = copy_db(), copy_db()
+    if use_cache:
+        # Stored suggestions for every question, then tags that make some stale
+        AutoTagger(bulk).suggest_tags_many([f"Q_{i:05d}" for i in range(N_QUESTIONS)])
+        for conn in (reference, bulk):
+            conn.execute("DELETE FROM question_tags WHERE question_idx IN (2, 3, 20)")
+            conn.commit()
+
+    expected = per_question_auto_tag(AutoTagger(reference), tag_type, min_confidence, limit=1000)
+    tagged = AutoTagger(bulk).auto_tag_untagged(
+        tag_type, min_confidence, limit=1000, workers=workers, use_cache=use_cache
+    )
+
+    assert expected > 0
+    assert tagged == expected
+    assert question_tags(bulk) == question_tags(reference)
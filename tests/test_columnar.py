@@ -0,0 +1,107 @@
+"""Columnar export/import: a survey survives the Parquet round trip."""
+
+import pytest
+
+from db.connection import get_connection
+from db.migrations import migrate
+from db.responses import ResponseWriter
+from migration.columnar import export_surveys, import_surveys, read_table
+
+# respondent original_id -> {question_no: answer}
+ANSWERS = {
+    "A01": {"r001": 5, "r002": 3, "r003": "좋은 회사입니다"},
+    "A02": {"r001": 4, "r002": 1},
+    "A03": {"r001": 2, "r002": 5, "r003": "2.5"},
+}
+
+
+def add_survey(conn, survey_id, answers):
+    """Insert a WCP survey of 2025 with its questions, respondents and answers."""
+    conn.execute(
+        "INSERT OR IGNORE INTO companies (company_id, company_name) VALUES ('WCP', 'WCP 주식회사')"
+    )
+    survey_idx = conn.execute("""
+        INSERT INTO surveys (survey_id, survey_name, company_id, diagnosis_type, survey_year)
+        VALUES (?, ?, 'WCP', 'OD', 2025)
+    """, (survey_id, f"{survey_id} 조직진단")).lastrowid
+    for order, question_no in enumerate(("r001", "r002", "r003"), 1):
+        question_idx = conn.execute("""
+            INSERT INTO questions (question_id, question_text, diagnosis_type)
+            VALUES (?, ?, 'OD')
+        """, (f"{survey_id}_{question_no}", f"문항 {question_no}")).lastrowid
+        conn.execute("""
+            INSERT INTO survey_questions (survey_idx, question_idx, question_order)
+            VALUES (?, ?, ?)
+        """, (survey_idx, question_idx, order))
+
+    writer = ResponseWriter(conn.cursor())
+    for original_id, row in answers.items():
+        respondent_id = conn.execute(
+            "INSERT INTO respondents (survey_id, original_id, gender) VALUES (?, ?, 'F')",
+            (survey_id, original_id),
+        ).lastrowid
+        for question_no, value in row.items():
+            writer.add(respondent_id, question_no, value)
+    writer.flush()
+    conn.commit()
+
+
+def stored_answers(conn, survey_id):
+    """{original_id: {question_no: response_value}} of a survey."""
+    answers = {}
+    for original_id, question_no, value in conn.execute("""
+        SELECT r.original_id, v.question_no, v.response_value
+        FROM respondents r JOIN responses v ON v.respondent_id = r.respondent_id
+        WHERE r.survey_id = ?
+    """, (survey_id,)):
+        answers.setdefault(original_id, {})[question_no] = value
+    return answers
+
+
+@pytest.fixture
+def export_root(tmp_path):
+    conn = get_connection(tmp_path / "source.sqlite")
+    migrate(conn)
+    add_survey(conn, "IG202512WCPOD", ANSWERS)
+    root = tmp_path / "columnar"
+    counts = export_surveys(conn, root, company_id="WCP")
+    assert counts["respondents"] == 3 and counts["responses"] == 8
+    return root
+
+
+def test_round_trip(export_root, tmp_path):
+    conn = get_connection(tmp_path / "target.sqlite")
+    migrate(conn)
+    # Respondents already in the target shift the ids the import assigns
+    add_survey(conn, "IG202401WCPLD", {"B01": {"r001": 1}, "B02": {"r001": 2}})
+
+    expected = {
+        original_id: {question_no: str(value) for question_no, value in row.items()}
+        for original_id, row in ANSWERS.items()
+    }
+    for _ in range(2):  # re-import replaces the survey's respondents
+        totals = import_surveys(conn, export_root, survey_ids=["IG202512WCPOD"])
+        assert totals["respondents"] == 3 and totals["responses"] == 8
+        assert stored_answers(conn, "IG202512WCPOD") == expected
+
+    assert conn.execute(
+        "SELECT COUNT(*) FROM respondents WHERE survey_id = 'IG202512WCPOD'"
+    ).fetchone()[0] == 3
+    assert conn.execute(
+        "SELECT COUNT(*) FROM survey_questions sq JOIN surveys s USING (survey_idx) "
+        "WHERE s.survey_id = 'IG202512WCPOD'"
+    ).fetchone()[0] == 3
+    assert stored_answers(conn, "IG202401WCPLD") == {"B01": {"r001": "1"}, "B02": {"r001": "2"}}
+
+
+def test_read_table_projection(export_root):
+    table = read_table(export_root, "responses", columns=["question_no", "value", "survey_id"])
+    assert table.column_names == ["question_no", "value", "survey_id"]
+    assert table.num_rows == 8
+    assert sorted(
+        value for value in table.column("value").to_pylist() if value is not None
+    ) == [1, 2, 3, 4, 5, 5]
+
+    texts = read_table(export_root, "responses", columns=["response_text"], company_id="WCP")
+    assert sorted(filter(None, texts.column("response_text").to_pylist())) == ["2.5", "좋은 회사입니다"]
+    assert read_table(export_root, "responses", survey_year=2024).num_rows == 0
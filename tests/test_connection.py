@@ -0,0 +1,88 @@
+"""Connection pool: per-thread readers and a single serialized writer."""
+
+import threading
+import time
+
+import pytest
+
+from db import connection
+from db.connection import ConnectionPool, get_connection, get_pool
+from db.migrations import migrate
+
+
+@pytest.fixture
+def pool(tmp_path):
+    conn = get_connection(tmp_path / "masterdb.sqlite")
+    migrate(conn)
+    conn.execute("CREATE TABLE counter (n INTEGER)")
+    conn.execute("INSERT INTO counter VALUES (0)")
+    conn.commit()
+    conn.close()
+
+    pool = ConnectionPool(tmp_path / "masterdb.sqlite")
+    yield pool
+    pool.close_all()
+
+
+def test_threads_share_the_writer_and_keep_their_reader(pool):
+    increments = 50
+    barrier = threading.Barrier(2)
+    seen = {}
+    errors = []
+
+    def work(name):
+        try:
+            reader = pool.reader()
+            barrier.wait()
+            for _ in range(increments):
+                with pool.write() as conn:
+                    n = conn.execute("SELECT n FROM counter").fetchone()[0]
+                    time.sleep(0.001)  # let the other thread run
+                    conn.execute("UPDATE counter SET n = ?", (n + 1,))
+                assert reader.execute("SELECT n FROM counter").fetchone()[0] >= 1
+            seen[name] = (reader, pool.reader(), pool.writer())
+        except Exception as e:  # surfaced in the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # Read-modify-write under the write lock: no increment is lost
+    assert pool.reader().execute("SELECT n FROM counter").fetchone()[0] == 2 * increments
+
+    (reader_a, again_a, writer_a), (reader_b, again_b, writer_b) = seen["a"], seen["b"]
+    assert reader_a is again_a and reader_b is again_b
+    assert reader_a is not reader_b
+    assert writer_a is writer_b
+
+
+def test_pooled_close_is_a_no_op(pool):
+    reader = pool.reader()
+    reader.close()
+    assert pool.reader() is reader
+    assert reader.execute("SELECT n FROM counter").fetchone()[0] == 0
+
+    with pool.write() as conn:
+        conn.close()
+    with pool.write() as conn:
+        conn.execute("UPDATE counter SET n = 1")
+
+    pool.close_all()
+    with pytest.raises(Exception, match="closed"):
+        reader.execute("SELECT 1")
+    assert pool.reader() is not reader
+
+
+def test_get_pool_rejects_conflicting_create_if_missing(tmp_path, monkeypatch):
+    monkeypatch.setattr(connection, "_pools", {})
+    path = tmp_path / "masterdb.sqlite"
+
+    pool = get_pool(path, create_if_missing=False)
+    assert get_pool(path) is pool
+    assert get_pool(path, create_if_missing=False) is pool
+    with pytest.raises(ValueError, match="create_if_missing"):
+        get_pool(path, create_if_missing=True)
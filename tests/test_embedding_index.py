@@ -0,0 +1,46 @@
+"""Embedding sidecar: readers survive concurrent rebuilds."""
+
+import numpy as np
+import pytest
+
+from tagging.embedding_index import EmbeddingIndex
+
+
+@pytest.fixture
+def conn(question_bank):
+    return question_bank(n=50, dim=16)
+
+
+def change_embedding(conn, seed):
+    vector = np.random.default_rng(seed).normal(size=16).astype(np.float32)
+    conn.execute("UPDATE embeddings SET embedding = ? WHERE question_idx = 1", (vector.tobytes(),))
+    conn.commit()
+
+
+def test_precision_switch_after_rebuilds(conn, tmp_path):
+    index_dir = tmp_path / "embedding_index"
+    reader = EmbeddingIndex.open_or_build(conn, index_dir)
+    expected = {p: np.array(reader.quantized(p)[0]) for p in ("float16", "int8")}
+
+    # Two rebuilds remove the reader's build from disk
+    for seed in (1, 2):
+        change_embedding(conn, seed)
+        EmbeddingIndex.build(conn, index_dir)
+
+    for precision, values in expected.items():
+        assert np.array_equal(reader.quantized(precision)[0], values)
+
+
+def test_previous_build_stays_on_disk(conn, tmp_path):
+    index_dir = tmp_path / "embedding_index"
+    old_meta = EmbeddingIndex.build(conn, index_dir).meta
+
+    change_embedding(conn, 1)
+    new = EmbeddingIndex.build(conn, index_dir)
+    for key in ("vectors", "float16", "int8", "int8_scales", "rows"):
+        assert (index_dir / old_meta[key]).exists()
+
+    change_embedding(conn, 2)
+    EmbeddingIndex.build(conn, index_dir)
+    assert not (index_dir / old_meta["vectors"]).exists()
+    assert (index_dir / new.meta["vectors"]).exists()
@@ -0,0 +1,106 @@
+"""Embedding pipeline: text cache and change log."""
+
+import numpy as np
+import pytest
+
+from db.connection import get_connection
+from db.migrations import migrate
+from tagging.embedding_index import get_embedding_version
+from tagging.embedding_pipeline import HashingEncoder, embed_missing
+
+TEXTS = [
+    "조직의 비전을 이해하고 있다",
+    "조직의  비전을 이해하고 있다 ",    # same normalized text
+    "리더는 구성원의 의견을 경청한다",
+    "업무에 필요한 자원이 충분하다",
+]
+
+
+class CountingEncoder(HashingEncoder):
+    """HashingEncoder that records the texts it encodes."""
+
+    def __init__(self, dim=64):
+        super().__init__(dim)
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return super().encode(texts)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = get_connection(tmp_path / "masterdb.sqlite")
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO questions (question_id, question_text, diagnosis_type) VALUES (?, ?, 'OD')",
+        [(f"Q_{i:05d}", text) for i, text in enumerate(TEXTS)],
+    )
+    conn.commit()
+    return conn
+
+
+def changes(conn, since=0):
+    rows = conn.execute(
+        "SELECT question_idx, change_type FROM embedding_changes WHERE seq > ? ORDER BY seq",
+        (since,),
+    )
+    return [tuple(row) for row in rows]
+
+
+def test_cache_miss_then_hit(conn):
+    encoder = CountingEncoder()
+    result = embed_missing(conn, encoder, batch_size=2)
+    assert result == {"questions": 4, "encoded": 3, "cached": 0}
+    assert len(encoder.encoded) == 3
+
+    stored = conn.execute(
+        "SELECT embedding, embedding_f16, embedding_i8 FROM embeddings ORDER BY question_idx"
+    ).fetchall()
+    assert stored[0][0] == stored[1][0]
+    assert all(f16 is not None and i8 is not None for _, f16, i8 in stored)
+    expected = HashingEncoder(64).encode([TEXTS[2]])[0]
+    assert np.array_equal(np.frombuffer(stored[2][0], dtype=np.float32), expected)
+
+    # Re-embedding the same texts is served from embedding_cache
+    conn.execute("DELETE FROM embeddings")
+    conn.commit()
+    encoder = CountingEncoder()
+    assert embed_missing(conn, encoder) == {"questions": 4, "encoded": 0, "cached": 3}
+    assert encoder.encoded == []
+
+    # Another model doesn't share the cache
+    conn.execute("DELETE FROM embeddings")
+    conn.commit()
+    encoder = CountingEncoder(dim=32)
+    assert embed_missing(conn, encoder) == {"questions": 4, "encoded": 3, "cached": 0}
+
+
+def test_nothing_missing(conn):
+    embed_missing(conn, HashingEncoder(64))
+    encoder = CountingEncoder()
+    assert embed_missing(conn, encoder) == {"questions": 0, "encoded": 0, "cached": 0}
+    assert encoder.encoded == []
+
+
+def test_re_embedding_is_logged(conn):
+    embed_missing(conn, HashingEncoder(64))
+    assert changes(conn) == [(idx, "I") for idx in (1, 2, 3, 4)]
+    version = get_embedding_version(conn)
+
+    # Text edits of embedded questions are logged; re-embedding logs D then I
+    conn.execute("UPDATE questions SET question_text = '조직의 비전에 공감한다' WHERE question_idx = 1")
+    conn.execute("DELETE FROM embeddings WHERE question_idx = 1")
+    conn.commit()
+    embed_missing(conn, HashingEncoder(64))
+    assert changes(conn, version["seq"]) == [(1, "M"), (1, "D"), (1, "I")]
+
+    new_version = get_embedding_version(conn)
+    assert new_version["seq"] > version["seq"]
+    assert new_version["count"] == version["count"]
+
+
+def test_questions_without_embedding_are_not_logged(conn):
+    conn.execute("UPDATE questions SET question_text = '새 문항' WHERE question_idx = 1")
+    conn.commit()
+    assert changes(conn) == []
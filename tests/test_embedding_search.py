@@ -0,0 +1,76 @@
+"""Embedding search: batched queries and quantized scans."""
+
+import numpy as np
+import pytest
+
+from db.connection import get_connection
+from tagging.embedding_search import EmbeddingSearch
+
+
+@pytest.fixture
+def conn(question_bank):
+    return question_bank(n=2000, dim=32, clusters=40)
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_quantized_scan_matches_float32(conn, tmp_path, precision):
+    index_dir = tmp_path / "embedding_index"
+    exact = EmbeddingSearch(conn, index_dir=index_dir, ann=False)
+    quantized = EmbeddingSearch(conn, index_dir=index_dir, ann=False, precision=precision)
+    queries = [f"Q_{i:05d}" for i in range(0, 2000, 7)]
+
+    assert quantized.search_similar_many(queries, top_k=10) == exact.search_similar_many(queries, top_k=10)
+    assert (
+        quantized.search_similar_many(queries, top_k=10, diagnosis_type="LD")
+        == exact.search_similar_many(queries, top_k=10, diagnosis_type="LD")
+    )
+
+
+def test_empty_query_batch(conn, tmp_path):
+    searcher = EmbeddingSearch(conn, index_dir=tmp_path / "embedding_index")
+    assert searcher.search_similar_many([]) == []
+    assert searcher.search_similar_many(np.empty((0, 32), dtype=np.float32)) == []
+    assert searcher.search_by_questions([]) == []
+
+
+def test_refresh_matches_reload(conn, tmp_path):
+    searcher = EmbeddingSearch(conn, index_dir=tmp_path / "embedding_index", auto_refresh=False)
+    queries = [f"Q_{i:05d}" for i in range(0, 2000, 50)]
+    searcher.search_similar_many(queries)
+    assert searcher.refresh() == {"added": 0, "updated": 0, "deleted": 0}
+
+    # Changes committed by another connection (PRAGMA data_version gate)
+    writer = get_connection(tmp_path / "masterdb.sqlite")
+    rng = np.random.default_rng(1)
+    new_idx = writer.execute("""
+        INSERT INTO questions (question_id, question_text, diagnosis_type, cluster_id)
+        VALUES ('Q_NEW', 'new question', 'LD', 3)
+    """).lastrowid
+    writer.execute(
+        "INSERT INTO embeddings (question_idx, embedding) VALUES (?, ?)",
+        (new_idx, rng.normal(size=32).astype(np.float32).tobytes()),
+    )
+    writer.execute("""
+        DELETE FROM embeddings
+        WHERE question_idx = (SELECT question_idx FROM questions WHERE question_id = 'Q_00100')
+    """)
+    writer.execute("""
+        UPDATE embeddings SET embedding = ?
+        WHERE question_idx = (SELECT question_idx FROM questions WHERE question_id = 'Q_00200')
+    """, (rng.normal(size=32).astype(np.float32).tobytes(),))
+    writer.execute("UPDATE questions SET diagnosis_type = 'LD' WHERE question_id = 'Q_00300'")
+    writer.commit()
+
+    assert searcher.refresh() == {"added": 1, "updated": 2, "deleted": 1}
+    assert searcher._embeddings_cache is not None and searcher._delta_vectors is not None
+
+    fresh = EmbeddingSearch(conn, use_index=False)
+    queries += ["Q_NEW"]
+    for filters in ({}, {"diagnosis_type": "LD"}):
+        refreshed = searcher.search_similar_many(queries, top_k=10, **filters)
+        expected = fresh.search_similar_many(queries, top_k=10, **filters)
+        assert [[qid for qid, _ in r] for r in refreshed] == [[qid for qid, _ in r] for r in expected]
+        for got, want in zip(refreshed, expected):
+            assert [score for _, score in got] == pytest.approx([score for _, score in want])
+    assert searcher.search_similar_many(["Q_00100"]) == [[]]
+    assert "Q_00300" in [qid for qid, _ in searcher.search_similar_many(["Q_00500"], diagnosis_type="LD")[0]]
@@ -0,0 +1,85 @@
+"""Migration runner: per-step foreign key check."""
+
+import re
+import sqlite3
+
+import pytest
+
+from db import migrations
+
+
+@pytest.fixture
+def extra_step():
+    """Register a temporary step after the latest one."""
+    added = []
+
+    def register(func):
+        version = migrations.get_latest_version() + 1
+        migrations.migration(version, "test step")(func)
+        added.append(version)
+        return version
+
+    yield register
+    migrations.MIGRATIONS[:] = [m for m in migrations.MIGRATIONS if m[0] not in added]
+
+
+def test_fresh_database_has_no_violations():
+    conn = sqlite3.connect(":memory:")
+    applied = migrations.migrate(conn)
+    assert applied == [m[0] for m in migrations.MIGRATIONS]
+    assert migrations.foreign_key_violations(conn.cursor()) == []
+
+
+def test_schema_reference_recreates_the_schema():
+    from db.schema import schema_sql
+
+    reference = schema_sql()
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(reference)
+    assert schema_sql(conn) == reference
+
+
+def rebuild_tags(then=None):
+    """Step rebuilding question_tags as is, then running the statement then."""
+    def step(cursor):
+        create_sql = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'question_tags'"
+        ).fetchone()[0]
+        migrations.rebuild_table(
+            cursor, "question_tags",
+            re.sub(r'^CREATE TABLE "?question_tags"?', "CREATE TABLE IF NOT EXISTS question_tags", create_sql),
+            "SELECT * FROM question_tags",
+        )
+        if then:
+            cursor.execute(then)
+    return step
+
+
+@pytest.fixture
+def tagged_db():
+    conn = sqlite3.connect(":memory:")
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO questions (question_id, question_text, diagnosis_type) VALUES ('Q1', 'q', 'OD')")
+    conn.execute("INSERT INTO taxonomy (term, term_type) VALUES ('비전', 'THEME')")
+    conn.execute("INSERT INTO question_tags (question_idx, term_id, tag_type) VALUES (1, 1, 'themes')")
+    conn.commit()
+    return conn
+
+
+def test_step_leaving_orphans_is_rolled_back(tagged_db, extra_step):
+    latest = migrations.get_schema_version(tagged_db)
+    extra_step(rebuild_tags("UPDATE question_tags SET question_idx = 999"))
+
+    with pytest.raises(sqlite3.IntegrityError, match="question_tags rowid 1 -> questions"):
+        migrations.migrate(tagged_db)
+
+    assert migrations.get_schema_version(tagged_db) == latest
+    assert tagged_db.execute("SELECT question_idx FROM question_tags").fetchall() == [(1,)]
+
+
+def test_existing_orphans_are_tolerated(tagged_db, extra_step):
+    tagged_db.execute("INSERT INTO question_tags (question_idx, term_id, tag_type) VALUES (999, 1, 'themes')")
+    tagged_db.commit()
+    version = extra_step(rebuild_tags())
+
+    assert migrations.migrate(tagged_db) == [version]
@@ -0,0 +1,60 @@
+"""Near-duplicate pairs: tiled (and multi-process) search against brute force."""
+
+import numpy as np
+import pytest
+
+from tagging.embedding_index import read_embeddings
+from tagging.near_duplicates import find_near_duplicates, find_pairs
+
+THRESHOLD = 0.9
+N = 300
+
+# float32 scores per tile: 64 x 64, so N rows take 5 row blocks
+TILE_BUDGET = 4 * 64 * 64
+
+
+@pytest.fixture
+def conn(question_bank):
+    return question_bank(n=N, dim=32, clusters=10)
+
+
+def brute_force_pairs(vectors, threshold):
+    """{(row_a, row_b)} with row_a < row_b from the dense similarity matrix."""
+    exact = vectors.astype(np.float64)
+    scores = exact @ exact.T
+    rows_a, rows_b = np.nonzero(np.triu(scores >= threshold, 1))
+    return set(zip(rows_a.tolist(), rows_b.tolist())), scores
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_find_pairs_matches_brute_force(conn, tmp_path, workers):
+    _, _, vectors = read_embeddings(conn)
+    expected, scores = brute_force_pairs(vectors, THRESHOLD)
+    assert expected
+
+    vectors_path = None
+    if workers > 1:
+        vectors_path = tmp_path / "vectors.f32"
+        vectors.astype(np.float32).tofile(vectors_path)
+
+    rows_a, rows_b, similarities = find_pairs(
+        vectors, THRESHOLD, memory_budget=TILE_BUDGET, workers=workers, vectors_path=vectors_path,
+    )
+    pairs = list(zip(rows_a.tolist(), rows_b.tolist()))
+    assert pairs == sorted(expected)
+    assert similarities == pytest.approx(scores[rows_a, rows_b])
+
+
+def test_find_near_duplicates_stores_pairs(conn):
+    question_idxs, _, vectors = read_embeddings(conn)
+    expected, _ = brute_force_pairs(vectors, THRESHOLD)
+    expected = {
+        tuple(sorted((question_idxs[a], question_idxs[b]))) for a, b in expected
+    }
+
+    assert find_near_duplicates(conn, THRESHOLD, memory_budget=TILE_BUDGET, workers=2) == len(expected)
+    rows = conn.execute(
+        "SELECT question_idx_a, question_idx_b, similarity FROM question_similarity"
+    ).fetchall()
+    assert {(row[0], row[1]) for row in rows} == expected
+    assert all(row[0] < row[1] and row[2] >= THRESHOLD for row in rows)
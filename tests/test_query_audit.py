@@ -0,0 +1,68 @@
+"""Query audit: executemany streams its parameters; scan sizes come from table_stats."""
+
+import sqlite3
+
+import pytest
+
+from db.connection import get_connection
+from db.migrations import migrate
+from db.query_audit import AuditCursor, disable_query_audit, enable_query_audit
+
+
+@pytest.fixture
+def auditor():
+    yield enable_query_audit()
+    disable_query_audit()
+
+
+def test_executemany_consumes_parameters_lazily(auditor):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    inserted_before = []
+
+    def rows():
+        for i in range(1000):
+            inserted_before.append(conn.total_changes)
+            yield (i,)
+
+    conn.cursor(AuditCursor).executemany("INSERT INTO t VALUES (?)", rows())
+    assert conn.execute("SELECT COUNT(*), SUM(x) FROM t").fetchone() == (1000, 499500)
+    # Each row was pulled after the previous one was inserted, not all up front
+    assert inserted_before == list(range(inserted_before[0], inserted_before[0] + 1000))
+
+    [statement] = [s for s in auditor.report()["statements"] if "INSERT" in s["sql"]]
+    assert statement["calls"] == 1
+
+
+def test_executemany_with_no_parameters(auditor):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.cursor(AuditCursor).executemany("INSERT INTO t VALUES (?)", iter([]))
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_scanned_table_rows_come_from_table_stats(auditor, tmp_path):
+    conn = get_connection(tmp_path / "masterdb.sqlite")
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO questions (question_id, question_text, diagnosis_type) VALUES (?, ?, 'OD')",
+        [(f"Q_{i:05d}", f"question {i}") for i in range(3)],
+    )
+    # Not tracked in table_stats: counted with COUNT(*)
+    conn.execute("CREATE TABLE notes (note TEXT)")
+    conn.executemany("INSERT INTO notes VALUES (?)", [("a",), ("b",)])
+    conn.execute(
+        "UPDATE table_stats SET row_count = 5000 WHERE table_name = 'questions' AND dimension = ''"
+    )
+    conn.commit()
+    auditor.reset()
+    auditor.large_table_rows = 2
+
+    conn.execute("SELECT * FROM questions WHERE question_text LIKE '%1%'").fetchall()
+    conn.execute("SELECT note FROM notes WHERE note LIKE 'b%'").fetchall()
+
+    scans = {s["sql"].split()[3]: s["full_scans"] for s in auditor.report()["full_scans"]}
+    assert scans == {
+        "questions": [{"table": "questions", "rows": 5000}],
+        "notes": [{"table": "notes", "rows": 2}],
+    }
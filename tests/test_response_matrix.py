@@ -0,0 +1,53 @@
+"""Response matrix cache: rebuilds never break readers of the previous meta."""
+
+import sqlite3
+
+import pytest
+
+from db.migrations import migrate
+from db.responses import ResponseWriter
+from query.response_matrix import ResponseMatrixCache
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "masterdb.sqlite")
+    migrate(conn)
+    add_respondents(conn, 5)
+    return conn
+
+
+def add_respondents(conn, n):
+    writer = ResponseWriter(conn.cursor())
+    for _ in range(n):
+        respondent_id = conn.execute(
+            "INSERT INTO respondents (survey_id) VALUES ('S1')"
+        ).lastrowid
+        for q in range(3):
+            writer.add(respondent_id, f"r{q + 1:03d}", (respondent_id + q) % 5 + 1)
+    writer.flush()
+    conn.commit()
+
+
+def test_rebuild_keeps_previous_build_readable(conn):
+    cache = ResponseMatrixCache(conn)
+    first = cache.get("S1")
+    old_meta = cache._read_meta("S1")
+
+    add_respondents(conn, 2)
+    assert cache.get("S1").shape == (7, 3)
+
+    # A reader that loaded the old meta before the switch
+    reopened = cache._open("S1", old_meta)
+    assert reopened.shape == (5, 3)
+    assert reopened.means() == first.means()
+
+
+def test_only_current_and_previous_builds_are_kept(conn):
+    cache = ResponseMatrixCache(conn)
+    for _ in range(3):
+        cache.build("S1")
+    assert len(cache._builds("S1")) == 4
+
+    cache.invalidate("S1")
+    assert list(cache.cache_dir.iterdir()) == []
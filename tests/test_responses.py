@@ -0,0 +1,81 @@
+"""Response value splitting: only lossless integers are stored as integers."""
+
+import sqlite3
+
+import pytest
+
+from db.migrations import migrate
+from db.responses import ResponseWriter, split_response_value
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("5", (5, None)),
+    ("-3", (-3, None)),
+    ("0", (0, None)),
+    (5, (5, None)),
+    (5.0, (5, None)),
+    (True, (1, None)),
+    ("9223372036854775807", (2 ** 63 - 1, None)),
+    ("007", (None, "007")),
+    ("-0", (None, "-0")),
+    ("1e3", (None, "1e3")),
+    ("5.0", (None, "5.0")),
+    ("3.5", (None, "3.5")),
+    ("12345678901234567", (12345678901234567, None)),
+    ("99999999999999999999", (None, "99999999999999999999")),
+    (2 ** 63, (None, str(2 ** 63))),
+    (1e30, (None, "1e+30")),
+    ("좋음", (None, "좋음")),
+    ("", (None, None)),
+    (None, (None, None)),
+    (float("nan"), (None, None)),
+])
+def test_split_response_value(value, expected):
+    assert split_response_value(value) == expected
+
+
+def test_writer_round_trips_raw_answers():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    respondent_id = conn.execute(
+        "INSERT INTO respondents (survey_id, original_id) VALUES ('S1', 'R1')"
+    ).lastrowid
+
+    answers = {"r001": "007", "r002": "99999999999999999999", "r003": "42", "r004": "1e3"}
+    writer = ResponseWriter(conn.cursor())
+    for question_no, value in answers.items():
+        writer.add(respondent_id, question_no, value)
+    writer.flush()
+
+    stored = dict(conn.execute(
+        "SELECT question_no, response_value FROM responses WHERE respondent_id = ?",
+        (respondent_id,),
+    ).fetchall())
+    assert stored == {"r001": "007", "r002": "99999999999999999999", "r003": "42", "r004": "1e3"}
+
+
+def test_legacy_float_answers_migrate_to_values():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn, target=3)
+    respondent_id = conn.execute(
+        "INSERT INTO respondents (survey_id, original_id) VALUES ('S1', 'R1')"
+    ).lastrowid
+    # Written by the old upload script as str() of pandas values
+    conn.executemany(
+        "INSERT INTO responses (respondent_id, question_no, response_value) VALUES (?, ?, ?)",
+        [(respondent_id, "r001", "3.0"), (respondent_id, "r002", "5"),
+         (respondent_id, "r003", "좋아요"), (respondent_id, "r004", "2.5")],
+    )
+    conn.commit()
+    migrate(conn)
+
+    values = dict(conn.execute("""
+        SELECT i.question_no, v.value FROM response_values v
+        JOIN response_items i ON i.item_idx = v.item_idx
+    """).fetchall())
+    texts = dict(conn.execute("""
+        SELECT i.question_no, t.response_text FROM response_texts t
+        JOIN response_items i ON i.item_idx = t.item_idx
+    """).fetchall())
+    assert values == {"r001": 3, "r002": 5}
+    assert texts == {"r003": "좋아요", "r004": "2.5"}
@@ -0,0 +1,28 @@
+"""Statistics from table_stats match direct counts."""
+
+from db.connection import get_connection
+from db.migrations import migrate
+from db.schema import ALL_TABLES, get_table_counts
+from db.stats import get_stats
+
+
+def test_counts_match_group_by(tmp_path):
+    conn = get_connection(tmp_path / "masterdb.sqlite")
+    migrate(conn)
+    conn.execute("INSERT INTO questions (question_id, question_text, diagnosis_type) VALUES ('Q1', 'q', 'OD')")
+    conn.execute("INSERT INTO taxonomy (term, term_type) VALUES ('비전', 'THEME')")
+    conn.execute("INSERT INTO taxonomy (term, term_type) VALUES ('리더십', 'CONCEPT')")
+    conn.executemany(
+        "INSERT INTO question_tags (question_idx, term_id, tag_type) VALUES (1, ?, ?)",
+        [(1, "themes"), (2, None)],
+    )
+
+    expected = dict(conn.execute(
+        "SELECT tag_type, COUNT(*) FROM question_tags GROUP BY tag_type"
+    ).fetchall())
+    assert None in expected
+    assert get_stats(conn).counts_by("question_tags", "tag_type") == expected
+
+    counts = get_table_counts(conn)
+    assert set(counts) == set(ALL_TABLES)
+    assert counts["question_tags"] == 2